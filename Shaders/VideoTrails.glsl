@@ -0,0 +1,28 @@
+#version 330
+
+// Light trails behind everything bright in the video. The trails are kept
+// in Buffer A (Shaders/buffers/VideoTrails_BufferA.glsl) from frame to frame.
+uniform float iTime;
+uniform vec2 iResolution;
+uniform sampler2D iChannel0;    // Input video
+uniform sampler2D iChannel1;    // Buffer A: accumulated trails
+
+uniform float trebleLevel;      // 0.0 to 1.0, treble frequency energy
+
+uniform float trailMix;         // Mix between original and trails (0.0 = original, 1.0 = trails only)
+uniform float trailTint;        // How strongly trails are tinted, pulsing with the treble
+
+in vec2 v_text;
+out vec4 fragColor;
+
+void main()
+{
+    vec3 video = texture(iChannel0, vec2(v_text.x, 1.0 - v_text.y)).rgb;
+    // Buffers are stored the right way up, no flip needed
+    vec3 trails = texture(iChannel1, v_text).rgb;
+
+    vec3 tint = vec3(1.0, 0.6 + 0.4 * trebleLevel, 1.3);
+    trails = mix(trails, trails * tint, trailTint);
+
+    fragColor = vec4(clamp(mix(video, trails, trailMix), 0.0, 1.0), 1.0);
+}
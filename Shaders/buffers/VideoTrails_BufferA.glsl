@@ -0,0 +1,37 @@
+#version 330
+
+// Buffer A of VideoTrails.glsl: accumulates the video over time.
+// iChannel1 is this buffer's own output from the previous frame.
+uniform float iTime;
+uniform float iTimeDelta;
+uniform int iFrame;
+uniform vec2 iResolution;
+uniform sampler2D iChannel0;    // Input video
+uniform sampler2D iChannel1;    // Buffer A, previous frame
+
+uniform float bassLevel;        // 0.0 to 1.0, bass frequency energy
+uniform float beatLevel;        // 0.0 to 1.0, beat strength
+
+uniform float trailLength;      // Seconds for a trail to fade out
+uniform float trailDrift;       // How fast trails stream outwards from the centre
+
+in vec2 v_text;
+out vec4 fragColor;
+
+void main()
+{
+    vec4 video = texture(iChannel0, vec2(v_text.x, 1.0 - v_text.y));
+    if (iFrame == 0) {
+        fragColor = video;
+        return;
+    }
+
+    // Sample the previous frame slightly zoomed in so trails drift outwards, faster on bass
+    float zoom = 1.0 - trailDrift * (0.5 + bassLevel) * iTimeDelta;
+    vec4 previous = texture(iChannel1, (v_text - 0.5) * zoom + 0.5);
+
+    // Fade per second rather than per frame so previews at a lower frame rate look the same;
+    // beats shorten the trails so the picture snaps back on the hit
+    float keep = pow(0.05, iTimeDelta / max(trailLength, 0.01)) * (1.0 - 0.5 * beatLevel);
+    fragColor = mix(video, max(previous, video), keep);
+}
@@ -0,0 +1,441 @@
+# audio_analysis.py
+import librosa
+import numpy as np
+from pathlib import Path
+import logging
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import re
+
+from workspace import directory_size
+
+logger = logging.getLogger(__name__)
+
+# Per-frame features provided to shaders as float uniforms
+AUDIO_FEATURE_NAMES = [
+    'bassLevel', 'midLevel', 'trebleLevel', 'beatLevel', 'kickLevel',
+    'rmsLevel', 'brightnessLevel', 'energyLevel', 'percussiveLevel', 'tempoBeatLevel',
+]
+
+# Frequency bands (in Hz) used for bass/mid/treble separation
+FREQUENCY_BANDS = {
+    'bass': (20, 250),
+    'mid': (250, 4000),
+    'treble': (4000, None),  # Up to Nyquist
+}
+
+
+def _safe_normalize(arr):
+    if arr.max() > arr.min():
+        return np.interp(arr, (arr.min(), arr.max()), (0, 1))
+    return np.zeros_like(arr)
+
+
+def _pulse_train(event_frames, length, pulse_frames, decay_rate):
+    """Turn detected event frames into decaying pulses"""
+    pulses = np.zeros(length)
+    for event_frame in event_frames:
+        if event_frame < length:
+            for i in range(min(pulse_frames, length - event_frame)):
+                pulses[event_frame + i] = max(pulses[event_frame + i], np.exp(-i * decay_rate))
+    return pulses
+
+
+def analyze_audio(audio_file, frame_rate=30, duration=None, features=None):
+    """
+    Extract per-frame audio features for a whole track, or its first
+    duration seconds.
+
+    Features are normalized to 0-1 but not scaled by user reactivity settings,
+    so one analysis can be reused with any preset (see apply_audio_settings).
+    features optionally limits the analysis to some of AUDIO_FEATURE_NAMES;
+    the others are returned as zeros.
+
+    Returns:
+        (features, summary): dict of feature name -> np.ndarray (one value per
+        video frame at frame_rate), and a JSON-serialisable summary dict.
+    """
+    logger.info(f"Performing advanced audio analysis: {audio_file}")
+    y, sr = librosa.load(str(audio_file), sr=None, duration=duration)
+    return analyze_signal(y, sr, frame_rate, features)
+
+
+def analyze_signal(y, sr, frame_rate=30, features=None):
+    """Per-frame audio features of mono samples y at sample rate sr; see analyze_audio()"""
+    wanted = set(AUDIO_FEATURE_NAMES if features is None else features)
+
+    # Calculate hop length to match video frame rate
+    hop_length = int(sr / frame_rate)
+    # Frames per feature, as librosa's centred framing produces them
+    length = 1 + len(y) // hop_length
+    results = {}
+
+    # 1. FREQUENCY BAND SEPARATION
+    band_ranges = {name: (low, high if high is not None else sr // 2)
+                   for name, (low, high) in FREQUENCY_BANDS.items()}
+    bands = [name for name in FREQUENCY_BANDS if f'{name}Level' in wanted]
+    if bands:
+        # One spectrogram serves every band
+        power = np.abs(librosa.stft(librosa.effects.preemphasis(y), hop_length=hop_length)) ** 2
+        freqs = librosa.fft_frequencies(sr=sr)
+        for name in bands:
+            low, high = band_ranges[name]
+            freq_mask = (freqs >= low) & (freqs <= high)
+            results[f'{name}Level'] = np.mean(power[freq_mask, :], axis=0)
+
+    # 2. BEAT DETECTION
+    onset_frames = None
+    if 'beatLevel' in wanted:
+        onset_frames = librosa.onset.onset_detect(
+            y=y, sr=sr, hop_length=hop_length,
+            units='frames', backtrack=True
+        )
+        results['beatLevel'] = _pulse_train(onset_frames, length, 10, 0.3)
+
+    # 3. ENHANCED BEAT DETECTION FOR LOW FREQUENCIES
+    bass_onset_frames = None
+    if 'kickLevel' in wanted:
+        bass_onset_frames = librosa.onset.onset_detect(
+            y=librosa.effects.preemphasis(y), sr=sr,
+            hop_length=hop_length, units='frames',
+            pre_max=3, post_max=3, pre_avg=3, post_avg=5, delta=0.1, wait=10
+        )
+        # Stronger, shorter kick pulses
+        results['kickLevel'] = _pulse_train(bass_onset_frames, length, 5, 0.5)
+
+    # 4. ADDITIONAL SPECTRAL FEATURES
+    if 'brightnessLevel' in wanted:
+        results['brightnessLevel'] = librosa.feature.spectral_centroid(y=y, sr=sr, hop_length=hop_length)[0]
+    if 'energyLevel' in wanted:
+        results['energyLevel'] = librosa.feature.spectral_rolloff(y=y, sr=sr, hop_length=hop_length)[0]
+    if 'percussiveLevel' in wanted:
+        results['percussiveLevel'] = librosa.feature.zero_crossing_rate(y, hop_length=hop_length)[0]
+    if 'rmsLevel' in wanted:
+        results['rmsLevel'] = librosa.feature.rms(y=y, hop_length=hop_length)[0]
+
+    # 5. TEMPO AND BEAT TRACKING
+    tempo, beat_frames = None, None
+    if 'tempoBeatLevel' in wanted:
+        tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr, hop_length=hop_length, units='frames')
+        tempo = float(np.atleast_1d(tempo)[0])
+        results['tempoBeatLevel'] = _pulse_train(beat_frames, length, 8, 0.4)
+
+    features = {name: _safe_normalize(results[name]) if name in results else np.zeros(length)
+                for name in AUDIO_FEATURE_NAMES}
+
+    summary = {
+        'duration': len(y) / sr,
+        'sample_rate': int(sr),
+        'frame_rate': frame_rate,
+        'frame_count': length,
+        'tempo': tempo,
+        'beat_count': int(len(onset_frames)) if onset_frames is not None else None,
+        'kick_count': int(len(bass_onset_frames)) if bass_onset_frames is not None else None,
+        'tempo_beat_count': int(len(beat_frames)) if beat_frames is not None else None,
+        'bands': {
+            name: {
+                'hz': list(band_ranges[name]),
+                'min': float(features[f'{name}Level'].min()),
+                'max': float(features[f'{name}Level'].max()),
+                'mean': float(features[f'{name}Level'].mean()),
+            }
+            for name in bands
+        },
+    }
+
+    logger.info(f"Extracted audio features: {sorted(results)}")
+    if onset_frames is not None or bass_onset_frames is not None:
+        logger.info(f"Detected {summary['beat_count']} beats, {summary['kick_count']} kicks")
+    if tempo is not None:
+        logger.info(f"Estimated tempo: {tempo:.1f} BPM, {len(beat_frames)} tempo beats")
+
+    return features, summary
+
+
+def apply_audio_settings(features, audio_settings):
+    """Scale normalized features by the user's reactivity settings"""
+    bass_response = audio_settings.get('bass_response', 1.0)
+    mid_response = audio_settings.get('mid_response', 1.0)
+    treble_response = audio_settings.get('treble_response', 1.0)
+    beat_sensitivity = audio_settings.get('beat_sensitivity', 1.0)
+
+    scaling = {
+        'bassLevel': bass_response,
+        'midLevel': mid_response,
+        'trebleLevel': treble_response,
+        'beatLevel': beat_sensitivity,
+        'kickLevel': beat_sensitivity,
+    }
+
+    # Apply scaling (clamp to reasonable ranges)
+    return {
+        name: np.clip(values * scaling[name], 0, 2.0) if name in scaling else values
+        for name, values in features.items()
+    }
+
+
+def resample_features(features, source_rate, target_rate):
+    """Resample per-frame features analysed at source_rate to target_rate"""
+    if source_rate == target_rate:
+        return features
+
+    resampled = {}
+    for name, values in features.items():
+        source_times = np.arange(len(values)) / source_rate
+        target_count = int(len(values) * target_rate / source_rate)
+        target_times = np.arange(target_count) / target_rate
+        resampled[name] = np.interp(target_times, source_times, values)
+    return resampled
+
+
+def compute_fft_rows(audio_file, frame_rate=30, bins=256, duration=None):
+    """Per-frame FFT magnitudes (frames x bins), each bin normalized to 0-1 over the track"""
+    logger.info(f"Performing FFT audio analysis: {audio_file}")
+    y, sr = librosa.load(str(audio_file), sr=None, duration=duration)
+    return fft_rows_from_signal(y, sr, frame_rate, bins)
+
+
+def fft_rows_from_signal(y, sr, frame_rate=30, bins=256):
+    """Per-frame FFT magnitudes of mono samples y at sample rate sr; see compute_fft_rows()"""
+    hop_length = int(sr / frame_rate)
+
+    # 512 FFT size gives us 256 frequency bins
+    magnitude = np.abs(librosa.stft(y, hop_length=hop_length, n_fft=bins * 2))[:bins, :]
+    peaks = magnitude.max(axis=1, keepdims=True)
+    magnitude = np.divide(magnitude, peaks, out=np.zeros_like(magnitude), where=peaks > 0)
+    return np.clip(magnitude, 0.0, 1.0).T
+
+
+def encode_timeline(features, fft_rows=None, fmt='uint8', scale=2.0):
+    """
+    Pack per-frame features (and optional FFT rows) into a compact binary blob.
+
+    Layout is row-major and little-endian: frames x len(AUDIO_FEATURE_NAMES)
+    feature values, followed by frames x bins FFT values when fft_rows is
+    given. uint8 values map 0-255 onto 0-scale for features and 0-1 for FFT.
+
+    Returns:
+        (data, metadata): the blob and a dict describing its layout.
+    """
+    frame_count = min(len(features[name]) for name in AUDIO_FEATURE_NAMES)
+    levels = np.stack([features[name][:frame_count] for name in AUDIO_FEATURE_NAMES], axis=1)
+    fft = fft_rows[:frame_count] if fft_rows is not None else None
+
+    if fmt == 'uint8':
+        parts = [np.round(np.clip(levels / scale, 0, 1) * 255).astype(np.uint8)]
+        if fft is not None:
+            parts.append(np.round(np.clip(fft, 0, 1) * 255).astype(np.uint8))
+    elif fmt == 'float16':
+        parts = [levels.astype('<f2')]
+        if fft is not None:
+            parts.append(fft.astype('<f2'))
+    else:
+        raise ValueError(f"Unsupported timeline format: {fmt}")
+
+    metadata = {
+        'format': fmt,
+        'frames': frame_count,
+        'features': AUDIO_FEATURE_NAMES,
+        'scale': scale,
+        'fft_bins': fft.shape[1] if fft is not None else 0,
+    }
+    return b''.join(part.tobytes() for part in parts), metadata
+
+
+def match_video_length(arr, target_frames):
+    """Pad with zeros or trim so there is exactly one value per video frame"""
+    if len(arr) < target_frames:
+        return np.pad(arr, (0, target_frames - len(arr)), constant_values=0)
+    elif len(arr) > target_frames:
+        return arr[:target_frames]
+    return arr
+
+
+class AudioAnalysisStore:
+    """Uploaded tracks and their analyses, addressable by analysis ID"""
+
+    ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+    def __init__(self, root, frame_rate=30, ttl_seconds=24 * 3600):
+        """
+        Analyses unused for ttl_seconds are removed by evict_expired(), unless
+        a job holds them (see acquire()). The last use is the directory's mtime.
+        """
+        self.root = Path(root)
+        self.frame_rate = frame_rate
+        self.ttl_seconds = ttl_seconds
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.refs = {}
+
+    def __getstate__(self):
+        # Store methods run in the analysis pool; references stay with the API process
+        return {key: value for key, value in self.__dict__.items() if key not in ('lock', 'refs')}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, lock=threading.Lock(), refs={})
+
+    def _touch(self, analysis_id):
+        try:
+            os.utime(self.root / analysis_id)
+        except OSError:
+            pass
+
+    def _analysis_dir(self, analysis_id):
+        if not self.ID_PATTERN.match(analysis_id or ''):
+            return None
+        return self.root / analysis_id
+
+    def create(self, source_path, filename, sha256=None):
+        """
+        Store an uploaded track under a new analysis ID and analyze it.
+
+        When the track's sha256 is given the ID is derived from it, so
+        uploading the same track again reuses the existing analysis.
+        """
+        analysis_id = sha256[:32] if sha256 else uuid.uuid4().hex
+        if self.exists(analysis_id):
+            Path(source_path).unlink(missing_ok=True)
+            self._touch(analysis_id)
+            logger.info(f"Reusing audio analysis {analysis_id} for {filename}")
+            return analysis_id, self.get_summary(analysis_id)
+
+        analysis_dir = self.root / analysis_id
+        analysis_dir.mkdir(parents=True)
+
+        try:
+            audio_path = analysis_dir / f"audio{Path(filename).suffix.lower()}"
+            shutil.move(str(source_path), audio_path)
+
+            features, summary = analyze_audio(audio_path, self.frame_rate)
+            summary['filename'] = filename
+
+            np.savez_compressed(analysis_dir / "features.npz", **features)
+            with open(analysis_dir / "summary.json", 'w', encoding='utf-8') as f:
+                json.dump(summary, f)
+        except Exception:
+            shutil.rmtree(analysis_dir, ignore_errors=True)
+            raise
+
+        logger.info(f"Stored audio analysis {analysis_id} for {filename}")
+        return analysis_id, summary
+
+    def exists(self, analysis_id):
+        analysis_dir = self._analysis_dir(analysis_id)
+        return analysis_dir is not None and (analysis_dir / "summary.json").exists()
+
+    def get_summary(self, analysis_id):
+        if not self.exists(analysis_id):
+            return None
+        with open(self._analysis_dir(analysis_id) / "summary.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def acquire(self, analysis_id):
+        """
+        Mark an analysis as used by a job so it can't be evicted; release() it when done.
+
+        Returns:
+            Whether the analysis exists.
+        """
+        with self.lock:
+            if not self.exists(analysis_id):
+                return False
+            self.refs[analysis_id] = self.refs.get(analysis_id, 0) + 1
+            self._touch(analysis_id)
+            return True
+
+    def release(self, analysis_id):
+        with self.lock:
+            if self.refs.get(analysis_id, 0) > 1:
+                self.refs[analysis_id] -= 1
+            else:
+                self.refs.pop(analysis_id, None)
+            self._touch(analysis_id)
+
+    def _unreferenced(self):
+        """(last used, analysis ID, size) of every analysis no job holds, oldest first"""
+        entries = []
+        for analysis_dir in self.root.iterdir():
+            if not analysis_dir.is_dir() or analysis_dir.name in self.refs:
+                continue
+            try:
+                last_used = analysis_dir.stat().st_mtime
+            except OSError:
+                continue
+            if not (analysis_dir / "summary.json").exists() and time.time() - last_used < self.ttl_seconds:
+                continue  # Still being analyzed
+            entries.append((last_used, analysis_dir.name, directory_size(analysis_dir)))
+        return sorted(entries)
+
+    def evict_expired(self):
+        """Remove unreferenced analyses unused for longer than the TTL"""
+        cutoff = time.time() - self.ttl_seconds
+        evicted = 0
+        with self.lock:
+            for last_used, analysis_id, _ in self._unreferenced():
+                if last_used < cutoff:
+                    shutil.rmtree(self.root / analysis_id, ignore_errors=True)
+                    evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} expired audio analyses")
+        return evicted
+
+    def evict_unreferenced(self, bytes_needed):
+        """
+        Remove least recently used unreferenced analyses until bytes_needed are freed.
+
+        Returns:
+            Number of bytes freed.
+        """
+        freed = 0
+        with self.lock:
+            for _, analysis_id, size in self._unreferenced():
+                if freed >= bytes_needed:
+                    break
+                shutil.rmtree(self.root / analysis_id, ignore_errors=True)
+                freed += size
+        if freed:
+            logger.info(f"Evicted {freed / 1024 ** 2:.1f} MB of unused audio analyses to stay within the disk budget")
+        return freed
+
+    def stats(self):
+        analysis_dirs = [path for path in self.root.iterdir() if path.is_dir()]
+        return {
+            "analyses": len(analysis_dirs),
+            "total_bytes": sum(directory_size(path) for path in analysis_dirs),
+            "referenced": len(self.refs),
+        }
+
+    def get_audio_path(self, analysis_id):
+        if not self.exists(analysis_id):
+            return None
+        self._touch(analysis_id)
+        return next(self._analysis_dir(analysis_id).glob("audio*"), None)
+
+    def load_fft(self, analysis_id):
+        """Per-frame FFT rows for a stored track, computed on first use"""
+        if not self.exists(analysis_id):
+            return None
+        self._touch(analysis_id)
+        fft_path = self._analysis_dir(analysis_id) / "fft.npy"
+        if not fft_path.exists():
+            fft_rows = compute_fft_rows(self.get_audio_path(analysis_id), self.frame_rate)
+            np.save(fft_path, fft_rows.astype(np.float32))
+        return np.load(fft_path)
+
+    def load(self, analysis_id):
+        """Load a stored analysis in the form processors accept as audio_analysis"""
+        if not self.exists(analysis_id):
+            return None
+        self._touch(analysis_id)
+        with np.load(self._analysis_dir(analysis_id) / "features.npz") as data:
+            features = {name: data[name] for name in data.files}
+        return {
+            'frame_rate': self.frame_rate,
+            'features': features,
+            'summary': self.get_summary(analysis_id),
+        }
@@ -0,0 +1,232 @@
+# batch_video_processor.py
+"""
+Render one video/audio pair with several shaders in a single pass.
+
+Frames are extracted once and audio is analysed once; each input frame is
+uploaded to a single shared texture and every variant's program renders
+from it into its own framebuffer and its own encoder. Comparing N shaders
+costs one decode and one analysis plus N renders, instead of N full jobs.
+"""
+
+import logging
+import shutil
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from gl_backend import create_context
+from metrics import FRAMES_RENDERED, set_texture_bytes
+from render_profiler import record_stage, timed_stage
+from shader_video_processor import ShaderVideoProcessor, texture_size
+from video_encoder import FfmpegPipeEncoder
+
+logger = logging.getLogger(__name__)
+
+
+class BatchVideoProcessor:
+    def __init__(self, video_path, audio_path, variants, progress_tracker=None,
+                 audio_settings=None, max_frames=None, audio_analysis=None, work_dir=None,
+                 output_mode="mp4", job_control=None, base_resolution=(1280, 720),
+                 frame_rate=30, encoder_preset=None, crf=18, profiler=None, frames=None):
+        """
+        Args:
+            video_path: Input video
+            audio_path: Audio track, shared by all variants
+            variants: List of dicts with shader_path, output_path and
+                      optionally uniforms and textures
+            output_mode: video_encoder.OUTPUT_MODES value used for every variant
+            frames: Optional in-memory input frames used instead of decoding
+                    video_path, see ShaderVideoProcessor
+
+        The remaining arguments are as for ShaderVideoProcessor and apply to
+        every variant.
+        """
+        self.video_path = Path(video_path) if video_path is not None else None
+        self.audio_path = Path(audio_path) if audio_path is not None else None
+        self.max_frames = max_frames
+        self.frames = frames
+        self.progress_tracker = progress_tracker
+        self.output_mode = output_mode
+        self.job_control = job_control
+        self.base_resolution = tuple(base_resolution)
+        self.frame_rate = frame_rate
+        self.profiler = profiler
+
+        self.processors = [
+            ShaderVideoProcessor(
+                video_path=video_path,
+                audio_path=audio_path,
+                shader_path=variant['shader_path'],
+                output_path=variant['output_path'],
+                extra_uniforms=variant.get('uniforms', {}),
+                audio_settings=audio_settings,
+                max_frames=max_frames,
+                audio_analysis=audio_analysis,
+                texture_overrides=variant.get('textures'),
+                work_dir=work_dir,
+                output_mode=output_mode,
+                base_resolution=base_resolution,
+                frame_rate=frame_rate,
+                encoder_preset=encoder_preset,
+                crf=crf,
+                job_control=job_control,
+                profiler=profiler
+            )
+            for variant in variants
+        ]
+        self.errors = {}
+
+    def _update(self, **kwargs):
+        if self.progress_tracker:
+            self.progress_tracker.update(**kwargs)
+
+    def _fail(self, index, error):
+        processor = self.processors[index]
+        logger.error(f"Variant {processor.shader_path.name} failed: {error}")
+        self.errors[index] = str(error)
+        if processor.encoder is not None:
+            processor.encoder.abort()
+            processor.encoder = None
+
+    def run(self):
+        """
+        Render every variant.
+
+        Returns:
+            List with one dict per variant: shader, output_path and error
+            (None when the variant rendered).
+
+        Raises:
+            Exception: if no variant could be rendered.
+        """
+        lead = self.processors[0]
+        temp_dirs = []
+        ctx = None
+
+        try:
+            self._update(progress=10, stage="extracting", message="Extracting video frames...",
+                         details="Decoding the input once for all shaders")
+            if self.frames is not None:
+                input_frames = self.frames[:self.max_frames]
+            else:
+                input_frames, frames_dir = lead.extract_frames(resolution=self.base_resolution)
+                temp_dirs.append(frames_dir)
+            total_frames = len(input_frames)
+
+            # Compile every variant first, so the one shared audio analysis only
+            # covers the features some variant reads
+            ctx = create_context()
+            for index, processor in enumerate(self.processors):
+                processor.ctx = ctx
+                try:
+                    processor.compile_programs()
+                except Exception as e:
+                    self._fail(index, e)
+
+            # Audio features are the same for every variant, analyse them once
+            audio_features = None
+            used_features = set().union(*(processor.used_features for index, processor
+                                          in enumerate(self.processors) if index not in self.errors))
+            if used_features:
+                self._update(progress=20, stage="analyzing", message="Analyzing audio frequencies...",
+                             details="Extracting bass, mid, treble, and beat information")
+                with timed_stage(self.profiler, "audio_analysis", "batch"):
+                    audio_features = lead.get_advanced_audio_analysis(self.audio_path, total_frames,
+                                                                      used_features)
+
+            for index, processor in enumerate(self.processors):
+                if index in self.errors:
+                    continue
+                try:
+                    processor.setup_render(total_frames, audio_features)
+                    processor.encoder = FfmpegPipeEncoder(
+                        processor.output_path, processor.resolution, self.frame_rate, self.audio_path,
+                        mode=self.output_mode, output_size=self.base_resolution,
+                        preset=processor.encoder_preset, crf=processor.crf
+                    ).start()
+                except Exception as e:
+                    self._fail(index, e)
+
+            if len(self.errors) == len(self.processors):
+                raise Exception("No shader in the batch could be set up")
+
+            self._update(progress=25, stage="rendering", message="Rendering shader effects...",
+                         details=f"Rendering {len(self.processors) - len(self.errors)} shaders",
+                         total_frames=total_frames)
+
+            frame_texture = ctx.texture(self.base_resolution, 3)
+            for i, frame_path in enumerate(input_frames):
+                if self.job_control:
+                    self.job_control.checkpoint(i)
+
+                with timed_stage(self.profiler, "frame_load", "batch", i):
+                    img = lead._load_frame(frame_path)
+                    if img.size != self.base_resolution:
+                        img = img.resize(self.base_resolution)
+                with timed_stage(self.profiler, "texture_upload", "batch", i):
+                    frame_texture.write(img.tobytes())
+
+                for index, processor in enumerate(self.processors):
+                    if index in self.errors:
+                        continue
+                    try:
+                        data = processor.render_frame(i, img, frame_texture)
+                    except Exception as e:
+                        logger.error(f"Error rendering frame {i} of {processor.shader_path.name}: {e}")
+                        # Fall back to the original frame, as a single render does
+                        data = img.resize(processor.resolution).transpose(Image.FLIP_TOP_BOTTOM).tobytes()
+                    try:
+                        encode_start = time.perf_counter()
+                        processor.encoder.write(data)
+                        record_stage(self.profiler, "encode", processor.shader_path.name, encode_start, i)
+                        FRAMES_RENDERED.inc(shader=processor.shader_path.name)
+                    except Exception as e:
+                        self._fail(index, e)
+
+                if i % 10 == 0 or i == total_frames - 1:
+                    self._update(progress=25 + (70 * (i + 1) / total_frames), frame_count=i + 1,
+                                 total_frames=total_frames,
+                                 details=f"Rendering frame {i+1} of {total_frames}")
+                    set_texture_bytes(texture_size(frame_texture) + sum(
+                        processor.texture_memory() for processor in self.processors))
+
+            self._update(progress=95, stage="combining", message="Finishing videos...",
+                         details="Flushing the last encoded frames")
+            # Let every encoder drain at once, then wait for each
+            active = [index for index in range(len(self.processors)) if index not in self.errors]
+            with timed_stage(self.profiler, "mux", "batch"):
+                for index in active:
+                    self.processors[index].encoder.end_input()
+                for index in active:
+                    try:
+                        self.processors[index].encoder.close()
+                    except Exception as e:
+                        self._fail(index, e)
+
+            if len(self.errors) == len(self.processors):
+                raise Exception(f"Every shader in the batch failed: {self.errors}")
+
+            logger.info(f"Batch complete: {len(self.processors) - len(self.errors)} of "
+                        f"{len(self.processors)} shaders rendered")
+            return [
+                {
+                    "shader": processor.shader_path.name,
+                    "output_path": str(processor.output_path) if index not in self.errors else None,
+                    "error": self.errors.get(index),
+                }
+                for index, processor in enumerate(self.processors)
+            ]
+
+        except Exception:
+            for processor in self.processors:
+                if processor.encoder is not None:
+                    processor.encoder.abort()
+            raise
+        finally:
+            if ctx is not None:
+                if self.profiler:
+                    self.profiler.finish()
+                ctx.release()
+            for temp_dir in temp_dirs:
+                shutil.rmtree(temp_dir, ignore_errors=True)
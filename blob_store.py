@@ -0,0 +1,171 @@
+# blob_store.py
+"""
+Content-addressed storage for uploaded inputs.
+
+Uploads are stored once under their sha256, so re-rendering one clip with
+many shaders reuses the same file and clients can skip uploading content
+the server already has. Blobs in use by a job are reference counted;
+unreferenced blobs are evicted once they have not been used for the TTL.
+"""
+
+import json
+import logging
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+    def __init__(self, root, ttl_seconds=24 * 3600):
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / "index.json"
+        self.lock = threading.Lock()
+        self.index = self._load_index()
+
+    def _load_index(self):
+        index = {}
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            except Exception as e:
+                logger.warning(f"Failed to load blob index, starting empty: {e}")
+
+        # Drop entries whose files are gone; references don't survive a restart
+        index = {sha: entry for sha, entry in index.items()
+                 if (self.root / sha[:2] / f"{sha}{entry['suffix']}").exists()}
+        for entry in index.values():
+            entry['refs'] = 0
+        return index
+
+    def _save_index(self):
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        tmp_path.replace(self.index_path)
+
+    def _blob_path(self, sha256, suffix):
+        return self.root / sha256[:2] / f"{sha256}{suffix}"
+
+    def has(self, sha256):
+        return sha256 in self.index
+
+    def get_path(self, sha256):
+        """Path of a stored blob, or None"""
+        with self.lock:
+            entry = self.index.get(sha256)
+            if entry is None:
+                return None
+            entry['last_used'] = time.time()
+            return self._blob_path(sha256, entry['suffix'])
+
+    def put(self, source_path, sha256, acquire=False):
+        """
+        Move a file into the store, or discard it if the content is already stored.
+
+        With acquire, the blob is also referenced (see acquire()) before the
+        lock is released, so eviction can't remove it in between.
+
+        Returns:
+            Path of the stored blob.
+        """
+        if not self.HASH_PATTERN.match(sha256 or ''):
+            raise ValueError(f"Invalid sha256: {sha256}")
+
+        source_path = Path(source_path)
+        with self.lock:
+            entry = self.index.get(sha256)
+            if entry is not None:
+                source_path.unlink(missing_ok=True)
+                entry['last_used'] = time.time()
+                logger.info(f"Deduplicated upload {sha256[:12]}")
+            else:
+                entry = {
+                    'suffix': source_path.suffix.lower(),
+                    'size': source_path.stat().st_size,
+                    'refs': 0,
+                    'last_used': time.time(),
+                }
+                blob_path = self._blob_path(sha256, entry['suffix'])
+                blob_path.parent.mkdir(exist_ok=True)
+                shutil.move(str(source_path), blob_path)
+                self.index[sha256] = entry
+                self._save_index()
+            if acquire:
+                entry['refs'] += 1
+            return self._blob_path(sha256, entry['suffix'])
+
+    def acquire(self, sha256):
+        """
+        Mark a blob as used by a job so it can't be evicted; release() it when done.
+
+        Returns:
+            Path of the blob, or None if it isn't stored (e.g. already evicted).
+        """
+        with self.lock:
+            entry = self.index.get(sha256)
+            if entry is None:
+                return None
+            entry['refs'] += 1
+            entry['last_used'] = time.time()
+            return self._blob_path(sha256, entry['suffix'])
+
+    def release(self, sha256):
+        with self.lock:
+            entry = self.index.get(sha256)
+            if entry is not None:
+                entry['refs'] = max(0, entry['refs'] - 1)
+                entry['last_used'] = time.time()
+
+    def evict_expired(self):
+        """Remove unreferenced blobs unused for longer than the TTL"""
+        cutoff = time.time() - self.ttl_seconds
+        evicted = 0
+        with self.lock:
+            for sha256, entry in list(self.index.items()):
+                if entry['refs'] == 0 and entry['last_used'] < cutoff:
+                    self._blob_path(sha256, entry['suffix']).unlink(missing_ok=True)
+                    del self.index[sha256]
+                    evicted += 1
+            if evicted:
+                self._save_index()
+                logger.info(f"Evicted {evicted} expired blobs")
+        return evicted
+
+    def evict_unreferenced(self, bytes_needed):
+        """
+        Remove least recently used unreferenced blobs until bytes_needed are freed.
+
+        Returns:
+            Number of bytes freed.
+        """
+        freed = 0
+        with self.lock:
+            candidates = sorted((entry['last_used'], sha256) for sha256, entry in self.index.items()
+                                if entry['refs'] == 0)
+            for _, sha256 in candidates:
+                if freed >= bytes_needed:
+                    break
+                entry = self.index.pop(sha256)
+                self._blob_path(sha256, entry['suffix']).unlink(missing_ok=True)
+                freed += entry['size']
+            if freed:
+                self._save_index()
+                logger.info(f"Evicted {freed / 1024 ** 2:.1f} MB of unused blobs to stay within the disk budget")
+        return freed
+
+    def stats(self):
+        with self.lock:
+            return {
+                "blobs": len(self.index),
+                "total_bytes": sum(entry['size'] for entry in self.index.values()),
+                "referenced": sum(1 for entry in self.index.values() if entry['refs'] > 0),
+            }
@@ -0,0 +1,145 @@
+# buffer_passes.py
+"""
+ShaderToy-style Buffer A-D passes with feedback between frames.
+
+A shader's entry in shader_config.json can declare buffer passes:
+
+    "buffers": {
+        "BufferA": {"shader": "MyShader_BufferA.glsl",
+                    "channels": {"iChannel0": "video", "iChannel1": "BufferA"}}
+    },
+    "bufferChannels": {"iChannel3": "BufferA"}
+
+Buffer shaders live in Shaders/buffers/ and use the same vertex stage and
+uniforms as image shaders, plus iFrame and iTimeDelta. Each frame the
+buffers render in A-D order, each into one half of a ping-pong pair of
+float textures, before the image pass. A channel naming a buffer reads its
+latest output: this frame's for buffers that already ran, the previous
+frame's for the buffer itself and later ones. bufferChannels binds buffers
+to the image pass. Buffer contents never leave the GPU; only the image
+pass is read back.
+
+Buffer textures are in render orientation, so sample them at v_text
+directly (the video is flipped, see the image shaders).
+"""
+
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+BUFFER_NAMES = ("BufferA", "BufferB", "BufferC", "BufferD")
+BUFFER_SHADER_DIR = Path("Shaders/buffers")
+
+# Encoding for shaders that aren't UTF-8, as Windows editors save them
+LEGACY_SHADER_ENCODING = "cp1252"
+
+# Channel source that binds the input video frame
+VIDEO_CHANNEL = "video"
+
+
+class BufferPass:
+    def __init__(self, ctx, name, program, vao, resolution, channels):
+        """
+        Args:
+            ctx: ModernGL context
+            name: One of BUFFER_NAMES
+            program: Compiled buffer shader
+            vao: Full-screen quad for program
+            resolution: (width, height) of the buffer
+            channels: Dict of iChannelN -> "video" or a buffer name
+        """
+        self.name = name
+        self.program = program
+        self.vao = vao
+        self.channels = {int(channel.replace('iChannel', '')): source for channel, source in channels.items()}
+
+        # Half floats so accumulated feedback doesn't band; cleared like ShaderToy buffers
+        self.textures = [ctx.texture(resolution, 4, dtype='f2') for _ in range(2)]
+        self.framebuffers = [ctx.framebuffer(color_attachments=[texture]) for texture in self.textures]
+        for texture in self.textures:
+            texture.filter = (ctx.LINEAR, ctx.LINEAR)
+            texture.repeat_x = texture.repeat_y = False
+        for framebuffer in self.framebuffers:
+            framebuffer.clear()
+        self.current = 0
+
+    @property
+    def texture(self):
+        """Texture holding the latest output of this buffer"""
+        return self.textures[self.current]
+
+    def render(self, sources, set_uniforms):
+        """
+        Render the next frame of this buffer and make it the latest output.
+
+        Args:
+            sources: Dict of channel source name -> texture
+            set_uniforms: Callable setting the per-frame uniforms on a program
+        """
+        for unit, source in self.channels.items():
+            sources[source].use(unit)
+            channel_name = f'iChannel{unit}'
+            if channel_name in self.program:
+                self.program[channel_name].value = unit
+        set_uniforms(self.program)
+
+        self.framebuffers[1 - self.current].use()
+        self.vao.render()
+        self.current = 1 - self.current
+
+
+def read_shader_source(path):
+    """
+    GLSL source of a shader file, for everything that compiles or serves it.
+
+    Most shaders are UTF-8, but some were saved as Windows-1252 (non-ASCII
+    characters in comments); those are decoded as such so they render the
+    same on every platform, whatever the locale's default encoding.
+    """
+    data = Path(path).read_bytes()
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode(LEGACY_SHADER_ENCODING, errors="replace")
+
+
+def buffer_shader_paths(shader_config):
+    """Source files of the buffer passes a shader config declares"""
+    return [BUFFER_SHADER_DIR / buffer['shader']
+            for _, buffer in sorted(shader_config.get('buffers', {}).items())]
+
+
+def create_buffer_passes(ctx, shader_config, resolution, vertex_shader, vbo):
+    """
+    Compile the buffer passes declared in a shader config.
+
+    Returns:
+        List of BufferPass in render order (empty if none are declared).
+
+    Raises:
+        ValueError: if the config names an unknown buffer or channel source.
+    """
+    buffers = shader_config.get('buffers', {})
+    unknown = set(buffers) - set(BUFFER_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown buffer passes {sorted(unknown)}, expected {list(BUFFER_NAMES)}")
+    for source in shader_config.get('bufferChannels', {}).values():
+        if source not in buffers:
+            raise ValueError(f"bufferChannels reads undeclared buffer {source!r}")
+
+    passes = []
+    for name in BUFFER_NAMES:
+        if name not in buffers:
+            continue
+        buffer = buffers[name]
+        for source in buffer.get('channels', {}).values():
+            if source != VIDEO_CHANNEL and source not in buffers:
+                raise ValueError(f"{name} reads unknown channel source {source!r}")
+
+        source_code = read_shader_source(BUFFER_SHADER_DIR / buffer['shader'])
+        program = ctx.program(vertex_shader=vertex_shader, fragment_shader=source_code)
+        vao = ctx.simple_vertex_array(program, vbo, 'in_vert')
+        passes.append(BufferPass(ctx, name, program, vao, resolution, buffer.get('channels', {})))
+        logger.info(f"Compiled {name} pass from {buffer['shader']}")
+    return passes
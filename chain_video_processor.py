@@ -0,0 +1,126 @@
+# chain_video_processor.py
+"""
+Apply several shaders one after another within a single job.
+
+Each stage renders into a texture-backed framebuffer that becomes the next
+stage's iChannel0, so stacking effects never leaves the GPU: there is one
+decode, one audio analysis shared by all stages, and only the last stage is
+read back and encoded. Stacking effects through separate /process jobs
+instead costs a full render, encode and re-decode per stage, with
+generation loss each time.
+"""
+
+import logging
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from shader_video_processor import ShaderVideoProcessor, QUAD_VERTEX_SHADER, texture_size
+
+logger = logging.getLogger(__name__)
+
+# Shaders sample iChannel0 with v_text.y flipped (uploaded frames are top
+# row first), so a stage's output is flipped back before the next stage
+# samples it; the pass also scales to the next stage's resolution.
+HANDOFF_FRAGMENT_SHADER = """#version 330
+uniform sampler2D source;
+in vec2 v_text;
+out vec4 fragColor;
+void main() {
+    fragColor = texture(source, vec2(v_text.x, 1.0 - v_text.y));
+}"""
+
+
+class ChainVideoProcessor(ShaderVideoProcessor):
+    def __init__(self, video_path, audio_path, stages, output_path, **kwargs):
+        """
+        Args:
+            video_path: Input video
+            audio_path: Audio track, shared by all stages
+            stages: List of dicts with shader_path and optionally uniforms and
+                    textures, in the order they are applied
+            output_path: Output video
+
+        The remaining arguments are as for ShaderVideoProcessor. The last
+        stage is rendered by this processor itself, so run(), the output
+        modes and progress reporting work as for a single shader.
+        """
+        final = stages[-1]
+        super().__init__(video_path, audio_path, final['shader_path'], output_path,
+                         extra_uniforms=final.get('uniforms', {}),
+                         texture_overrides=final.get('textures'), **kwargs)
+
+        stage_kwargs = {key: value for key, value in kwargs.items()
+                        if key not in ('progress_tracker', 'output_mode', 'job_control')}
+        self.stages = [
+            ShaderVideoProcessor(video_path, audio_path, stage['shader_path'], output_path,
+                                 extra_uniforms=stage.get('uniforms', {}),
+                                 texture_overrides=stage.get('textures'), **stage_kwargs)
+            for stage in stages[:-1]
+        ]
+        self.handoffs = []
+
+    def setup_render(self, total_frames, audio_features=None, render_to_texture=False):
+        """Set up every stage with one shared audio analysis, plus the passes between them"""
+        if not hasattr(self, 'ctx'):
+            self._init_opengl_context()
+
+        # Compile every stage first, so the one shared audio analysis only
+        # covers the features some stage reads
+        processors = self.stages + [self]
+        for stage in self.stages:
+            stage.ctx = self.ctx
+            stage.compile_programs(render_to_texture=True)
+        self.compile_programs(render_to_texture)
+
+        used_features = set().union(*(p.used_features for p in processors))
+        if audio_features is None and used_features:
+            if self.progress_tracker:
+                self.progress_tracker.update(progress=20, stage="analyzing",
+                                             message="Analyzing audio frequencies...",
+                                             details="Extracting bass, mid, treble, and beat information")
+            with self._timed("audio_analysis"):
+                audio_features = self.get_advanced_audio_analysis(self.audio_path, total_frames,
+                                                                  used_features)
+
+        for stage in self.stages:
+            stage.setup_render(total_frames, audio_features, render_to_texture=True)
+        super().setup_render(total_frames, audio_features, render_to_texture)
+
+        # One handoff pass per stage boundary, into a texture sized for the next stage
+        quad = self.ctx.buffer(np.array([-1.0, -1.0, 1.0, -1.0, -1.0, 1.0,
+                                         -1.0, 1.0, 1.0, -1.0, 1.0, 1.0], dtype='f4'))
+        program = self.ctx.program(vertex_shader=QUAD_VERTEX_SHADER,
+                                   fragment_shader=HANDOFF_FRAGMENT_SHADER)
+        vao = self.ctx.simple_vertex_array(program, quad, 'in_vert')
+        for stage, next_stage in zip(self.stages, processors[1:]):
+            texture = self.ctx.texture(next_stage.resolution, 3)
+            self.handoffs.append((vao, self.ctx.framebuffer(color_attachments=[texture]), texture))
+            stage.color_texture.filter = (self.ctx.LINEAR if stage.resolution != next_stage.resolution
+                                          else self.ctx.NEAREST,) * 2
+
+        logger.info(f"Shader chain: {' -> '.join(p.shader_path.name for p in processors)}")
+
+    def texture_memory(self):
+        return (super().texture_memory() + sum(stage.texture_memory() for stage in self.stages)
+                + sum(texture_size(texture) for _, _, texture in self.handoffs))
+
+    def draw_frame(self, i, img, frame_texture=None):
+        """Render frame i through every stage; only the last stage's framebuffer holds the result"""
+        texture = frame_texture
+        for stage, (vao, fbo, handoff_texture), next_stage in zip(self.stages, self.handoffs,
+                                                                 self.stages[1:] + [self]):
+            stage.draw_frame(i, img, texture)
+
+            fbo.use()
+            stage.color_texture.use(0)
+            vao.render()
+            texture = handoff_texture
+
+            # Shaders that take the video on another channel or flipped need an image
+            img = None
+            if next_stage.needs_frame_image():
+                img = Image.frombytes('RGB', texture.size, texture.read())
+
+        super().draw_frame(i, img, texture)
@@ -0,0 +1,49 @@
+# event_bus.py
+"""
+In-process publish/subscribe for job events.
+
+Publishers push events for a topic (a job ID) and every subscriber gets
+its own bounded queue, so a slow client drops its oldest events instead of
+holding up the publisher or other subscribers. Must be used from the event
+loop thread.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus:
+    def __init__(self, max_queued=32):
+        self.max_queued = max_queued
+        self.subscribers = defaultdict(set)
+
+    @contextmanager
+    def subscribe(self, topic):
+        """Yield a queue receiving the topic's events until the block exits"""
+        queue = asyncio.Queue(maxsize=self.max_queued)
+        self.subscribers[topic].add(queue)
+        try:
+            yield queue
+        finally:
+            self.subscribers[topic].discard(queue)
+            if not self.subscribers[topic]:
+                del self.subscribers[topic]
+
+    def publish(self, topic, event):
+        for queue in self.subscribers.get(topic, ()):
+            if queue.full():
+                queue.get_nowait()  # Drop the oldest, the latest state matters most
+            queue.put_nowait(event)
+
+    def has_subscribers(self, topic):
+        return topic in self.subscribers
+
+    def stats(self):
+        return {
+            "topics": len(self.subscribers),
+            "subscribers": sum(len(queues) for queues in self.subscribers.values()),
+        }
@@ -0,0 +1,116 @@
+# gl_backend.py
+"""
+Headless OpenGL context creation for render, test and validation workers.
+
+DISCO_GL_BACKEND picks how contexts are created:
+- egl: EGL without a display server. On nodes without a GPU Mesa's EGL
+  exposes a software device backed by llvmpipe; DISCO_GL_DEVICE selects
+  another EGL device and DISCO_GL_SOFTWARE=1 forces llvmpipe even when a
+  GPU is present.
+- x11: GLX on the X display in DISPLAY (e.g. Xvfb).
+- auto (default): x11 first when DISPLAY is set, otherwise egl first,
+  falling back to the other one.
+
+llvmpipe rasterizes on LP_NUM_THREADS threads, all cores by default. With
+several workers rendering at once that oversubscribes the CPU, so worker
+initializers call configure_worker() with the number of concurrent workers
+and each gets an equal share of the cores. DISCO_LP_THREADS, or an
+LP_NUM_THREADS already in the environment, overrides the share.
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('auto', 'egl', 'x11')
+
+GL_BACKEND = os.environ.get("DISCO_GL_BACKEND", "auto").lower()
+GL_DEVICE = os.environ.get("DISCO_GL_DEVICE")
+GL_SOFTWARE = os.environ.get("DISCO_GL_SOFTWARE", "0") == "1"
+LP_THREADS = os.environ.get("DISCO_LP_THREADS")
+
+# Backend that worked in this process, and the renderer it reported
+_backend = None
+_renderer = None
+
+
+def available_cpus():
+    """CPUs this process may run on, respecting affinity masks and container cpusets"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def llvmpipe_threads(concurrent_workers):
+    """llvmpipe threads per worker so concurrent workers share the CPUs without oversubscribing them"""
+    return max(1, available_cpus() // max(1, concurrent_workers))
+
+
+def configure_worker(concurrent_workers):
+    """
+    Set up this process's GL environment; call from a worker initializer
+    before any context is created, since Mesa reads it only once.
+    """
+    if GL_SOFTWARE:
+        os.environ['LIBGL_ALWAYS_SOFTWARE'] = '1'
+        os.environ['GALLIUM_DRIVER'] = 'llvmpipe'
+    if LP_THREADS:
+        os.environ['LP_NUM_THREADS'] = LP_THREADS
+    elif 'LP_NUM_THREADS' not in os.environ:
+        os.environ['LP_NUM_THREADS'] = str(llvmpipe_threads(concurrent_workers))
+
+
+def _candidates():
+    if GL_BACKEND not in BACKENDS:
+        raise ValueError(f"DISCO_GL_BACKEND must be one of {', '.join(BACKENDS)}, not {GL_BACKEND!r}")
+    if _backend is not None:
+        return [_backend]
+    if GL_BACKEND != 'auto':
+        return [GL_BACKEND]
+    return ['x11', 'egl'] if os.environ.get('DISPLAY') else ['egl', 'x11']
+
+
+def _create(backend):
+    import moderngl
+
+    if backend == 'egl':
+        kwargs = {'backend': 'egl'}
+        if GL_DEVICE is not None:
+            kwargs['device_index'] = int(GL_DEVICE)
+        return moderngl.create_standalone_context(**kwargs)
+    return moderngl.create_standalone_context()
+
+
+def create_context():
+    """
+    Standalone moderngl context on the configured backend.
+
+    The first context of a process tries the candidate backends in order
+    and logs the renderer it got; later ones reuse that backend.
+
+    Raises:
+        RuntimeError: if no backend can create a context.
+    """
+    global _backend, _renderer
+
+    errors = []
+    for backend in _candidates():
+        try:
+            ctx = _create(backend)
+        except Exception as e:
+            errors.append(f"{backend}: {str(e).strip()}")
+            continue
+        if _backend is None:
+            _backend = backend
+            _renderer = ctx.info['GL_RENDERER']
+            threads = os.environ.get('LP_NUM_THREADS', 'all cores')
+            logger.info(f"OpenGL context via {backend}: {_renderer} ({ctx.info['GL_VERSION']})"
+                        + (f", llvmpipe threads: {threads}" if 'llvmpipe' in _renderer.lower() else ""))
+        return ctx
+    raise RuntimeError(f"No OpenGL backend could create a context ({'; '.join(errors)})")
+
+
+def renderer():
+    """GL_RENDERER of this process's contexts, or None before the first one"""
+    return _renderer
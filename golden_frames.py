@@ -0,0 +1,103 @@
+# golden_frames.py
+"""
+Golden-frame regression checks for shaders.
+
+A few frames per shader are rendered from synthetic inputs straight to
+arrays (no decode, no encode) and compared with reference PNGs stored
+under golden_frames/<shader>/. Renders from different GL implementations
+differ in rounding, so frames are compared with SSIM, a perceptual
+similarity score that tolerates small per-pixel noise but not shifted or
+missing features; a frame passes when its score is at least the
+tolerance. Diff images are only written for frames that fail.
+"""
+
+import logging
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from scipy.ndimage import gaussian_filter
+
+logger = logging.getLogger(__name__)
+
+GOLDEN_DIR = Path("golden_frames")
+
+# Seconds into the synthetic inputs that are rendered and compared
+DEFAULT_GOLDEN_TIMES = (0.0, 1.0, 3.0, 6.0)
+
+# Minimum SSIM for a frame to match its golden image
+DEFAULT_TOLERANCE = 0.98
+
+# SSIM constants for 8-bit values (Wang et al. 2004)
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+
+def golden_path(golden_dir, shader_name, frame):
+    """Where the golden image of one frame of a shader is stored"""
+    return Path(golden_dir) / shader_name.replace('.glsl', '') / f"frame_{frame:05d}.png"
+
+
+def frame_similarity(actual, expected, sigma=1.5):
+    """
+    SSIM of two RGB uint8 arrays of the same shape: 1.0 when identical.
+
+    Each channel is scored separately and the worst one is returned, so a
+    pure colour shift isn't hidden by unchanged brightness.
+    """
+    if actual.shape != expected.shape:
+        return 0.0
+
+    scores = []
+    for channel in range(actual.shape[-1]):
+        a = actual[..., channel].astype(np.float64)
+        b = expected[..., channel].astype(np.float64)
+        mu_a, mu_b = gaussian_filter(a, sigma), gaussian_filter(b, sigma)
+        var_a = gaussian_filter(a * a, sigma) - mu_a ** 2
+        var_b = gaussian_filter(b * b, sigma) - mu_b ** 2
+        covariance = gaussian_filter(a * b, sigma) - mu_a * mu_b
+        ssim = (((2 * mu_a * mu_b + SSIM_C1) * (2 * covariance + SSIM_C2))
+                / ((mu_a ** 2 + mu_b ** 2 + SSIM_C1) * (var_a + var_b + SSIM_C2)))
+        scores.append(float(ssim.mean()))
+    return min(scores)
+
+
+def diff_image(actual, expected, gain=4.0):
+    """Absolute difference of two RGB uint8 arrays, amplified so small errors are visible"""
+    if actual.shape != expected.shape:
+        return actual
+    difference = np.abs(actual.astype(np.int16) - expected.astype(np.int16)) * gain
+    return np.clip(difference, 0, 255).astype(np.uint8)
+
+
+def compare_frame(actual, shader_name, frame, golden_dir=GOLDEN_DIR, diff_dir=None,
+                  tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare one rendered frame (RGB uint8 array, top row first) with its golden image.
+
+    Returns:
+        Dict with frame, similarity (None without a golden image) and passed.
+        On failure the actual frame and a diff are written to diff_dir.
+    """
+    path = golden_path(golden_dir, shader_name, frame)
+    if not path.exists():
+        logger.error(f"No golden image for {shader_name} frame {frame}: {path}")
+        return {'frame': frame, 'similarity': None, 'passed': False}
+
+    expected = np.asarray(Image.open(path).convert("RGB"))
+    similarity = frame_similarity(actual, expected)
+    passed = similarity >= tolerance
+    if not passed and diff_dir is not None:
+        prefix = Path(diff_dir) / shader_name.replace('.glsl', '')
+        prefix.mkdir(parents=True, exist_ok=True)
+        Image.fromarray(actual).save(prefix / f"frame_{frame:05d}_actual.png")
+        Image.fromarray(diff_image(actual, expected)).save(prefix / f"frame_{frame:05d}_diff.png")
+    return {'frame': frame, 'similarity': round(similarity, 4), 'passed': passed}
+
+
+def save_golden(actual, shader_name, frame, golden_dir=GOLDEN_DIR):
+    """Store a rendered frame as the golden image"""
+    path = golden_path(golden_dir, shader_name, frame)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(actual).save(path)
+    return path
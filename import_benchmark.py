@@ -0,0 +1,121 @@
+# import_benchmark.py
+"""
+Import-time benchmark for the API server.
+
+Imports main (or another module) in fresh interpreters with
+`python -X importtime`, reports the median wall time and the slowest
+modules, and checks that none of the render stack (cv2, moderngl,
+librosa's analysis code, scipy, PIL) was loaded: those belong in the
+render and analysis worker processes, and pulling one into the API
+process makes every restart slower and every instance larger.
+
+    python import_benchmark.py [--runs 5] [--budget-ms 1500] [--top 15]
+
+Exits with status 1 when a heavy module is imported or the median is
+over the budget.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Modules only render and analysis workers should import
+HEAVY_MODULES = ('cv2', 'moderngl', 'librosa.core', 'scipy', 'numba', 'PIL', 'ffmpeg',
+                 'shader_video_processor', 'streaming_video_processor', 'batch_video_processor')
+
+DEFAULT_BUDGET_MS = 1500
+
+# Prints the modules loaded by the import, after the -X importtime report on stderr
+IMPORT_SCRIPT = "import json, sys; import {module}; print(json.dumps(sorted(sys.modules)))"
+
+
+def parse_importtime(stderr, module):
+    """
+    Cumulative microseconds of each module imported directly by module,
+    from an -X importtime report (which lists imports before their importer).
+    """
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, total, name = line.split("|")
+        if not total.strip().isdigit():
+            continue  # Header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == module:
+                return children
+            children = {}
+        elif depth == 1:
+            children[name.strip()] = int(total)
+    return {}
+
+
+def import_once(module, cwd):
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+        (wall_ms, cumulative, loaded): wall time of the interpreter run in
+        milliseconds, cumulative microseconds of each module's direct
+        imports, and the names of every module loaded.
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_SCRIPT.format(module=module)],
+                            cwd=cwd, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return wall_ms, parse_importtime(result.stderr, module), json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how long importing the API server takes')
+    parser.add_argument('--module', default='main', help='Module to import (default: main)')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to time (default: 5)')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help=f'Fail when the median import takes longer (default: {DEFAULT_BUDGET_MS})')
+    parser.add_argument('--top', type=int, default=15, help='Slowest imports to list (default: 15)')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    cwd = Path(__file__).resolve().parent
+    # The first run warms the OS file cache and __pycache__, so it isn't counted
+    import_once(args.module, cwd)
+    runs = [import_once(args.module, cwd) for _ in range(args.runs)]
+
+    wall_ms = statistics.median(run[0] for run in runs)
+    slowest = {}
+    for name in runs[0][1]:
+        slowest[name] = statistics.median(run[1].get(name, 0) for run in runs) / 1000
+    slowest = dict(sorted(slowest.items(), key=lambda item: item[1], reverse=True)[:args.top])
+    heavy = sorted(name for name in HEAVY_MODULES if name in runs[0][2])
+
+    results = {
+        'module': args.module,
+        'runs': args.runs,
+        'median_ms': round(wall_ms, 1),
+        'budget_ms': args.budget_ms,
+        'modules_loaded': len(runs[0][2]),
+        'slowest_imports_ms': {name: round(ms, 1) for name, ms in slowest.items()},
+        'heavy_modules': heavy,
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"import {args.module}: median {wall_ms:.0f} ms over {args.runs} runs "
+              f"(budget {args.budget_ms:.0f} ms), {len(runs[0][2])} modules loaded")
+        for name, ms in slowest.items():
+            print(f"  {ms:8.1f} ms  {name}")
+        for name in heavy:
+            print(f"❌ {name} is imported by {args.module}; import it in the worker that needs it")
+
+    sys.exit(1 if heavy or wall_ms > args.budget_ms else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# job_control.py
+"""
+Pause and cancel requests for running render jobs.
+
+The scheduler writes a job's requested state ("run", "pause" or "cancel")
+into a dict shared with the worker processes; the render loop calls
+JobControl.checkpoint() at every frame boundary, so a paused job stops
+between two frames and carries on from the same frame index once resumed.
+FFmpeg subprocesses run through run_subprocess() so a cancel kills them
+instead of waiting for them to finish.
+"""
+
+import logging
+import subprocess
+import time
+
+logger = logging.getLogger(__name__)
+
+RUN = "run"
+PAUSE = "pause"
+CANCEL = "cancel"
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job has been cancelled"""
+
+
+class JobControl:
+    def __init__(self, job_id, controls, progress_tracker=None, poll_interval=0.2):
+        """
+        Args:
+            job_id: Job this control belongs to
+            controls: Shared dict of job ID -> requested state
+            progress_tracker: Optional tracker told about pauses and resumes
+            poll_interval: Seconds between state checks while paused or
+                           waiting on a subprocess
+        """
+        self.job_id = job_id
+        self.controls = controls
+        self.progress_tracker = progress_tracker
+        self.poll_interval = poll_interval
+
+    def state(self):
+        return self.controls.get(self.job_id, RUN)
+
+    def checkpoint(self, frame_index=None):
+        """
+        Call between frames: blocks while the job is paused.
+
+        Raises:
+            JobCancelled: if the job was cancelled.
+        """
+        state = self.state()
+        if state == PAUSE:
+            logger.info(f"Job {self.job_id} paused at frame {frame_index}")
+            if self.progress_tracker:
+                self.progress_tracker.update(stage="paused", message="Paused for an interactive preview",
+                                             details=f"Will resume at frame {frame_index + 1}"
+                                             if frame_index is not None else "")
+            while state == PAUSE:
+                time.sleep(self.poll_interval)
+                state = self.state()
+            if state != CANCEL:
+                logger.info(f"Job {self.job_id} resumed at frame {frame_index}")
+                if self.progress_tracker:
+                    self.progress_tracker.update(stage="rendering", message="Rendering shader effects...",
+                                                 details="Resumed")
+
+        if state == CANCEL:
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def run_subprocess(self, cmd):
+        """
+        subprocess.run(cmd, capture_output=True, text=True, check=True) that
+        kills the process if the job is cancelled while it runs.
+        """
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=self.poll_interval)
+                break
+            except subprocess.TimeoutExpired:
+                if self.state() == CANCEL:
+                    process.kill()
+                    process.communicate()
+                    raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+        return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
@@ -0,0 +1,141 @@
+# job_registry.py
+"""
+Job state with bounded memory and restart recovery.
+
+Recent jobs are kept in an in-memory LRU; finished jobs beyond the limit
+are evicted and read back from a local SQLite file when asked for again.
+Updates only mark a job dirty, and dirty jobs are written to SQLite in one
+batch by flush(), so per-frame progress updates don't each cost a disk write.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STAGES = ("complete", "error", "cancelled")
+
+
+class JobRegistry:
+    def __init__(self, db_path, max_entries=500):
+        """
+        Args:
+            db_path: SQLite file jobs are persisted to
+            max_entries: Number of jobs kept in memory; only finished jobs are
+                         evicted, so running jobs can push past this briefly
+        """
+        self.max_entries = max_entries
+        self.jobs = OrderedDict()
+        self.dirty = set()
+
+        # Created at import but used from the event loop thread
+        self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    def __contains__(self, job_id):
+        return self.get(job_id) is not None
+
+    def get(self, job_id):
+        """Job state dict, loading it from disk if it was evicted; None if unknown"""
+        if job_id in self.jobs:
+            self.jobs.move_to_end(job_id)
+            return self.jobs[job_id]
+
+        row = self.db.execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        # Trimming may evict the loaded job itself when every other one is running
+        state = self.jobs[job_id] = json.loads(row[0])
+        self._evict()
+        return state
+
+    def update(self, job_id, fields):
+        """Merge fields into a job's state; written to disk on the next flush"""
+        state = self.get(job_id)
+        if state is None:
+            state = self.jobs[job_id] = {}
+        state.update(fields)
+        self.jobs[job_id] = state
+        self.jobs.move_to_end(job_id)
+        self.dirty.add(job_id)
+        self._evict()
+
+    def remove(self, job_id):
+        self.jobs.pop(job_id, None)
+        self.dirty.discard(job_id)
+        self.db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        self.db.commit()
+
+    def flush(self):
+        """Write all dirty jobs in a single transaction"""
+        if not self.dirty:
+            return 0
+        now = time.time()
+        rows = [(job_id, json.dumps(self.jobs[job_id]), now) for job_id in self.dirty if job_id in self.jobs]
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO jobs (job_id, state, updated_at) VALUES (?, ?, ?)", rows
+            )
+        self.dirty.clear()
+        return len(rows)
+
+    def _evict(self):
+        """Drop least recently used finished jobs from memory once over the limit"""
+        if len(self.jobs) <= self.max_entries:
+            return
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.max_entries:
+                break
+            if self.jobs[job_id].get("stage") in FINISHED_STAGES:
+                if job_id in self.dirty:
+                    self.flush()
+                del self.jobs[job_id]
+
+    def recover(self):
+        """
+        Mark jobs left unfinished by a previous server process as failed.
+
+        Returns:
+            IDs of the interrupted jobs.
+        """
+        interrupted = []
+        for job_id, state_json in self.db.execute("SELECT job_id, state FROM jobs").fetchall():
+            state = json.loads(state_json)
+            if state.get("stage") not in FINISHED_STAGES:
+                state.update(stage="error", message="Processing failed",
+                             details="The server restarted before this job finished")
+                self.jobs[job_id] = state
+                self.dirty.add(job_id)
+                interrupted.append(job_id)
+        self.flush()
+        self.jobs.clear()
+        if interrupted:
+            logger.warning(f"Marked {len(interrupted)} interrupted jobs as failed")
+        return interrupted
+
+    def prune(self, max_age_seconds):
+        """Delete persisted jobs not updated for max_age_seconds"""
+        cutoff = time.time() - max_age_seconds
+        with self.db:
+            deleted = self.db.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,)).rowcount
+        return deleted
+
+    def stats(self):
+        return {
+            "in_memory": len(self.jobs),
+            "max_in_memory": self.max_entries,
+            "persisted": self.db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0],
+            "pending_writes": len(self.dirty),
+        }
+
+    def close(self):
+        self.flush()
+        self.db.close()
@@ -0,0 +1,285 @@
+# job_scheduler.py
+"""
+Bounded render job queue backed by a process pool.
+
+Renders (audio analysis, the GL render loop and ffmpeg) run in worker
+processes so the FastAPI event loop stays free to serve /progress and
+other requests while jobs are running.
+
+Waiting jobs are started in priority order. When an interactive job (a
+preview) is waiting and every worker is busy, a running batch render is
+paused at its next frame boundary to make room, and resumed from the same
+frame once the interactive work is done. Paused jobs keep their worker
+process, so the pool has room for one paused job per worker.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from job_control import RUN, PAUSE, CANCEL, JobCancelled
+from render_worker import init_worker, run_render_job
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class ScheduledJob:
+    def __init__(self, job_id, spec, tracker, on_complete=None, on_finish=None,
+                 priority=PRIORITY_BATCH, sequence=0):
+        self.job_id = job_id
+        self.spec = spec
+        self.tracker = tracker
+        self.on_complete = on_complete
+        self.on_finish = on_finish
+        self.priority = priority
+        self.sequence = sequence
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.paused = False
+
+    def __lt__(self, other):
+        # Lower priority value first, then first come first served
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class JobScheduler:
+    def __init__(self, max_workers=1, max_queue=8):
+        """
+        Args:
+            max_workers: Number of jobs rendered concurrently (one process each)
+            max_queue: Number of jobs allowed to wait for a worker before
+                       submissions are rejected
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+
+        self.pending = []  # Heap of ScheduledJob
+        self.sequence = itertools.count()
+        self.active = {}
+        self.wait_times = deque(maxlen=50)
+        self.preemptions = 0
+
+        self.loop = None
+        self.pool = None
+        self.manager = None
+        self.progress_queue = None
+        self.controls = None
+        self.relay_thread = None
+
+    def start(self):
+        """Start the worker pool; must be called from the running event loop"""
+        self.loop = asyncio.get_running_loop()
+
+        # Spawn rather than fork: GL contexts and threads don't survive fork
+        mp_context = multiprocessing.get_context("spawn")
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers * 2, mp_context=mp_context,
+                                        initializer=init_worker, initargs=(self.max_workers,))
+        self.manager = mp_context.Manager()
+        self.progress_queue = self.manager.Queue()
+        self.controls = self.manager.dict()
+
+        self.relay_thread = threading.Thread(target=self._relay_progress, daemon=True)
+        self.relay_thread.start()
+
+        logger.info(f"Job scheduler started: {self.max_workers} workers, queue limit {self.max_queue}")
+
+    def shutdown(self):
+        # Paused workers would otherwise wait forever
+        for job_id in self.active:
+            self.controls[job_id] = CANCEL
+        if self.progress_queue is not None:
+            self.progress_queue.put(None)
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        if self.manager is not None:
+            self.manager.shutdown()
+
+    def is_full(self):
+        return len(self.pending) >= self.max_queue
+
+    def submit(self, job_id, spec, tracker, on_complete=None, on_finish=None, priority=PRIORITY_BATCH):
+        """
+        Queue a render job.
+
+        on_complete is called with the worker's result when the render
+        succeeds; on_finish is called once the job ends either way.
+
+        Returns:
+            The job's 1-based position in the queue (0 if it started immediately).
+
+        Raises:
+            QueueFullError: if max_queue jobs are already waiting.
+        """
+        if self.is_full():
+            raise QueueFullError(f"Render queue is full ({len(self.pending)} jobs waiting)")
+
+        heapq.heappush(self.pending, ScheduledJob(job_id, spec, tracker, on_complete, on_finish,
+                                                  priority, next(self.sequence)))
+        self._dispatch()
+        return self.queue_position(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancel a waiting or running job. A running job stops at its next frame
+        boundary, and any ffmpeg process it is waiting on is killed.
+
+        Returns:
+            False if the job is neither waiting nor running.
+        """
+        for job in self.pending:
+            if job.job_id == job_id:
+                self.pending.remove(job)
+                heapq.heapify(self.pending)
+                logger.info(f"Cancelled queued job {job_id}")
+                self._mark_cancelled(job)
+                metrics.JOBS.inc(status="cancelled")
+                if job.on_finish:
+                    job.on_finish()
+                self._dispatch()
+                return True
+
+        if job_id in self.active:
+            logger.info(f"Cancelling running job {job_id}")
+            self.controls[job_id] = CANCEL
+            return True
+        return False
+
+    def job_ids(self):
+        """IDs of all running and waiting jobs"""
+        return set(self.active) | {job.job_id for job in self.pending}
+
+    def queue_position(self, job_id):
+        """1-based position of a waiting job, 0 if running, None if unknown"""
+        if job_id in self.active:
+            return 0
+        for position, job in enumerate(sorted(self.pending), 1):
+            if job.job_id == job_id:
+                return position
+        return None
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "queue_depth": len(self.pending),
+            "active_jobs": len(self.active),
+            "paused_jobs": sum(1 for job in self.active.values() if job.paused),
+            "preemptions": self.preemptions,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "oldest_wait_seconds": now - min(job.submitted_at for job in self.pending) if self.pending else 0.0,
+            "avg_wait_seconds": sum(self.wait_times) / len(self.wait_times) if self.wait_times else 0.0,
+        }
+
+    def _dispatch(self):
+        """Resume or start jobs while workers are free, preempting batch jobs for interactive ones"""
+        while True:
+            running = [job for job in self.active.values() if not job.paused]
+            paused = [job for job in self.active.values() if job.paused]
+            waiting = self.pending[0] if self.pending else None
+
+            if len(running) < self.max_workers:
+                # A paused job goes first unless a more urgent job is waiting
+                resumable = min(paused, default=None)
+                if resumable is not None and (waiting is None or resumable < waiting):
+                    self._resume(resumable)
+                elif waiting is not None:
+                    self._start(heapq.heappop(self.pending))
+                else:
+                    break
+            elif waiting is not None and len(paused) < self.max_workers:
+                batch = [job for job in running if job.priority > waiting.priority]
+                if not batch:
+                    break
+                # Pause the most recently started job, it has the least work to lose
+                self._pause(max(batch, key=lambda job: job.started_at))
+            else:
+                break
+
+        # Let waiting jobs know where they are in line
+        for position, job in enumerate(sorted(self.pending), 1):
+            job.tracker.update(stage="queued", message="Waiting for a render worker...",
+                               details=f"Position {position} in queue")
+
+    def _start(self, job):
+        job.started_at = time.monotonic()
+        self.wait_times.append(job.started_at - job.submitted_at)
+        self.active[job.job_id] = job
+        self.controls[job.job_id] = RUN
+        asyncio.create_task(self._run(job))
+
+    def _pause(self, job):
+        logger.info(f"Pausing job {job.job_id} for higher priority work")
+        job.paused = True
+        self.preemptions += 1
+        self.controls[job.job_id] = PAUSE
+
+    def _resume(self, job):
+        logger.info(f"Resuming job {job.job_id}")
+        job.paused = False
+        if self.controls.get(job.job_id) == PAUSE:
+            self.controls[job.job_id] = RUN
+
+    def _mark_cancelled(self, job):
+        job.tracker.update(progress=0, stage="cancelled", message="Processing cancelled",
+                           details="The job was cancelled")
+
+    async def _run(self, job):
+        try:
+            logger.info(f"Starting job {job.job_id} after {job.started_at - job.submitted_at:.1f}s in queue")
+            result = await self.loop.run_in_executor(
+                self.pool, run_render_job, job.job_id, job.spec, self.progress_queue, self.controls
+            )
+            if job.on_complete:
+                job.on_complete(result)
+            metrics.JOBS.inc(status="complete")
+        except JobCancelled:
+            logger.info(f"Job {job.job_id} cancelled")
+            self._mark_cancelled(job)
+            metrics.JOBS.inc(status="cancelled")
+        except Exception as e:
+            metrics.JOBS.inc(status="error")
+            logger.error(f"Error in background processing: {str(e)}")
+            job.tracker.update(progress=0, stage="error", message="Processing failed",
+                               details=f"Error: {str(e)}")
+        finally:
+            del self.active[job.job_id]
+            self.controls.pop(job.job_id, None)
+            if job.on_finish:
+                job.on_finish()
+            self._dispatch()
+
+    def _relay_progress(self):
+        """Apply progress updates sent by worker processes (runs in a thread)"""
+        while True:
+            try:
+                item = self.progress_queue.get()
+            except (EOFError, OSError):
+                break
+            if item is None:
+                break
+            job_id, update = item
+            self.loop.call_soon_threadsafe(self._apply_progress, job_id, update)
+
+    def _apply_progress(self, job_id, update):
+        # Metrics from a worker count even if its job has just finished
+        ops = update.pop("metrics", None)
+        if ops:
+            metrics.REGISTRY.apply(ops)
+            return
+        job = self.active.get(job_id)
+        if job is not None:
+            job.tracker.update(**update)
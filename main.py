@@ -1,6 +1,7 @@
 from fastapi import FastAPI, UploadFile, File, Form, Request
-from fastapi.responses import FileResponse, JSONResponse, HTMLResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, HTMLResponse, StreamingResponse, Response, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from pathlib import Path
 import shutil
 import tempfile
@@ -8,24 +9,66 @@ import json
 import logging
 import asyncio
 import uuid
+import os
+import re
+import math
+import time
+import hashlib
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import aiofiles
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-try:
-    from streaming_video_processor import StreamingVideoProcessor
-    # Temporarily disable streaming until sync issues are resolved
-    USE_STREAMING = False  # Set to True to test streaming processor
-    logger.info("Streaming processor available but disabled for stability")
-except ImportError as e:
-    logger.warning(f"Streaming processor not available: {e}")
-    USE_STREAMING = False
-
-# Always import legacy processor as fallback
-from shader_video_processor import ShaderVideoProcessor
-
-app = FastAPI()
+# Temporarily disable streaming until sync issues are resolved. Render workers
+# import the processors themselves; the API process never loads cv2, moderngl
+# or librosa (python import_benchmark.py checks this).
+USE_STREAMING = False  # Set to True to test streaming processor
+
+from audio_analysis import AudioAnalysisStore, apply_audio_settings, encode_timeline
+from blob_store import BlobStore
+from buffer_passes import buffer_shader_paths, read_shader_source
+from event_bus import EventBus
+from job_registry import JobRegistry, FINISHED_STAGES
+from job_scheduler import JobScheduler, QueueFullError, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+import metrics
+from result_cache import ResultCache, cache_key, link_or_copy
+from shader_validation import ShaderIndex, DEFAULT_WORKERS as DEFAULT_VALIDATION_WORKERS
+from upload_ingest import ingest_multipart, probe_media, UploadError
+from video_encoder import OUTPUT_MODES, HLS_PLAYLIST
+from workspace import WorkspaceManager
+
+# Render job scheduling - renders run in worker processes, off the event loop
+MAX_WORKERS = int(os.environ.get("DISCO_MAX_WORKERS", "1"))
+MAX_QUEUE = int(os.environ.get("DISCO_MAX_QUEUE", "8"))
+scheduler = JobScheduler(max_workers=MAX_WORKERS, max_queue=MAX_QUEUE)
+JOB_PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "batch": PRIORITY_BATCH}
+MAX_BATCH_VARIANTS = 32
+MAX_CHAIN_STAGES = 8
+
+@asynccontextmanager
+async def lifespan(app):
+    # Jobs that were running when the server last stopped can't resume
+    for job_id in job_registry.recover():
+        WORKSPACES.mark_finished(job_id)
+
+    scheduler.start()
+    gc_task = asyncio.create_task(collect_garbage())
+    flush_task = asyncio.create_task(flush_job_registry())
+    validation_task = asyncio.create_task(validate_shaders())
+    yield
+    gc_task.cancel()
+    flush_task.cancel()
+    validation_task.cancel()
+    if analysis_pool is not None:
+        analysis_pool.shutdown(wait=False, cancel_futures=True)
+    scheduler.shutdown()
+    job_registry.close()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -35,11 +78,55 @@ app.add_middleware(
 )
 
 SHADER_DIR = Path("./Shaders")  # Fixed path to match your structure
+TEXTURE_DIR = Path("./Textures")
 TEMP_DIR = Path(tempfile.gettempdir())
 CONFIG_FILE = SHADER_DIR / "shader_config.json"
 
-# Progress tracking
-progress_store = {}
+# Per-job workspaces for uploads in flight, intermediate frames and the output
+OUTPUT_TTL_HOURS = float(os.environ.get("DISCO_OUTPUT_TTL_HOURS", "24"))
+DISK_BUDGET_GB = float(os.environ.get("DISCO_DISK_BUDGET_GB", "20"))
+GC_INTERVAL_SECONDS = 300
+WORKSPACES = WorkspaceManager(TEMP_DIR / "disco_jobs", ttl_seconds=OUTPUT_TTL_HOURS * 3600,
+                              disk_budget_bytes=int(DISK_BUDGET_GB * 1024 ** 3))
+UPLOADS_DIR = TEMP_DIR / "disco_uploads"
+
+# Uploaded tracks analysed once via /audio/analyze and reused by /process
+AUDIO_TTL_HOURS = float(os.environ.get("DISCO_AUDIO_TTL_HOURS", "24"))
+AUDIO_STORE = AudioAnalysisStore(TEMP_DIR / "disco_audio", ttl_seconds=AUDIO_TTL_HOURS * 3600)
+
+# Preview proxy tier - lower resolution and frame rate with a fast encode
+PROXY_HEIGHT = int(os.environ.get("DISCO_PROXY_HEIGHT", "480"))
+PROXY_FRAME_RATE = int(os.environ.get("DISCO_PROXY_FPS", "15"))
+FULL_FRAME_RATE = 30
+PROXY_QUALITY = {
+    "base_resolution": [PROXY_HEIGHT * 16 // 9 // 2 * 2, PROXY_HEIGHT],
+    "frame_rate": PROXY_FRAME_RATE,
+    "encoder_preset": "ultrafast",
+    "crf": 28,
+}
+
+# Uploaded inputs stored once by sha256 and shared between jobs
+BLOB_TTL_HOURS = float(os.environ.get("DISCO_BLOB_TTL_HOURS", "24"))
+BLOB_STORE = BlobStore(TEMP_DIR / "disco_blobs", ttl_seconds=BLOB_TTL_HOURS * 3600)
+TEXTURE_FIELD = re.compile(r'^texture_(iChannel[0-3])$')
+
+# Finished renders reused when the same render is submitted again
+RESULT_CACHE_GB = float(os.environ.get("DISCO_RESULT_CACHE_GB", "5"))
+RESULT_CACHE = ResultCache(TEMP_DIR / "disco_results", max_bytes=int(RESULT_CACHE_GB * 1024 ** 3))
+
+# Progress tracking - recent jobs in memory, all jobs persisted for restarts
+MAX_TRACKED_JOBS = int(os.environ.get("DISCO_MAX_TRACKED_JOBS", "500"))
+JOB_FLUSH_INTERVAL_SECONDS = 1.0
+job_registry = JobRegistry(TEMP_DIR / "disco_jobs.db", max_entries=MAX_TRACKED_JOBS)
+
+# Following a growing output for /stream
+STREAM_CHUNK_BYTES = 256 * 1024
+STREAM_POLL_SECONDS = 0.5
+
+# Progress events pushed to /progress/stream subscribers
+PROGRESS_EVENT_INTERVAL_SECONDS = 0.5
+SSE_KEEPALIVE_SECONDS = 15
+event_bus = EventBus()
 
 # Load shader config
 try:
@@ -49,6 +136,42 @@ except Exception as e:
     logger.error(f"Error loading shader config: {e}")
     SHADER_CONFIG = {}
 
+# Startup compile check of the shader library; broken shaders are hidden and rejected
+VALIDATE_SHADERS = os.environ.get("DISCO_VALIDATE_SHADERS", "1") != "0"
+VALIDATION_WORKERS = int(os.environ.get("DISCO_VALIDATION_WORKERS", str(DEFAULT_VALIDATION_WORKERS)))
+SHADER_INDEX = ShaderIndex(SHADER_DIR, TEMP_DIR / "disco_shader_index.json", workers=VALIDATION_WORKERS)
+
+async def validate_shaders():
+    """Build the shader index in worker processes; requests that need it wait until it's ready"""
+    try:
+        if VALIDATE_SHADERS:
+            await asyncio.to_thread(SHADER_INDEX.build, SHADER_CONFIG)
+        else:
+            logger.info("Shader validation disabled")
+    except Exception as e:
+        logger.error(f"Shader validation failed, serving shaders unchecked: {e}")
+    finally:
+        SHADER_INDEX.ready.set()
+
+async def shader_index_ready():
+    if not SHADER_INDEX.ready.is_set():
+        await asyncio.to_thread(SHADER_INDEX.ready.wait)
+
+# Audio analysis runs in its own worker processes so the API process never
+# imports the librosa/scipy stack; started on the first /audio/analyze
+ANALYSIS_WORKERS = 2
+analysis_pool = None
+
+def run_audio_analysis(function, *args):
+    """Run an AUDIO_STORE method that analyzes audio in the analysis pool"""
+    global analysis_pool
+    if analysis_pool is None:
+        # Spawn rather than fork, like the render workers
+        analysis_pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=functools.partial(logging.basicConfig, level=logging.INFO))
+    return asyncio.wrap_future(analysis_pool.submit(function, *args))
+
 class ProgressTracker:
     def __init__(self, job_id):
         self.job_id = job_id
@@ -60,224 +183,885 @@ class ProgressTracker:
         self.total_frames = 0
         self.start_time = None
 
+        # Throughput and timing, sent along with every update
+        self.fps = 0.0
+        self.stage_started = time.monotonic()
+        self.stage_elapsed = {}
+        self.run_started = None
+        self.frame_sample = None
+        self.last_published = 0.0
+
     def update(self, progress=None, stage=None, message=None, details=None, frame_count=None, total_frames=None):
+        now = time.monotonic()
+        stage_changed = stage is not None and stage != self.stage
+
         if progress is not None:
             self.progress = progress
-        if stage is not None:
+        if stage_changed:
+            self.stage_elapsed[self.stage] = self.stage_elapsed.get(self.stage, 0) + now - self.stage_started
+            self.stage_started = now
             self.stage = stage
+            if self.run_started is None and stage != "queued":
+                self.run_started = now
         if message is not None:
             self.message = message
         if details is not None:
             self.details = details
         if frame_count is not None:
+            self._sample_fps(now, frame_count)
             self.frame_count = frame_count
         if total_frames is not None:
             self.total_frames = total_frames
 
-        progress_store[self.job_id] = {
+        state = {
             "progress": self.progress,
             "stage": self.stage,
             "message": self.message,
             "details": self.details,
             "frame_count": self.frame_count,
             "total_frames": self.total_frames,
-            "start_time": self.start_time
+            "start_time": self.start_time,
+            "fps": round(self.fps, 2),
+            "eta_seconds": self._eta(now),
+            "stage_elapsed": {**self.stage_elapsed,
+                              self.stage: self.stage_elapsed.get(self.stage, 0) + now - self.stage_started},
         }
+        job_registry.update(self.job_id, state)
+
+        # Subscribers get at most a few events a second, but never miss a stage change
+        if stage_changed or self.stage in FINISHED_STAGES or \
+                now - self.last_published >= PROGRESS_EVENT_INTERVAL_SECONDS:
+            self.last_published = now
+            event_bus.publish(self.job_id, state)
+
+    def _sample_fps(self, now, frame_count):
+        """Smoothed frames/sec from successive frame counts"""
+        if self.frame_sample is not None:
+            sample_time, sample_frames = self.frame_sample
+            if frame_count > sample_frames and now > sample_time:
+                rate = (frame_count - sample_frames) / (now - sample_time)
+                self.fps = rate if self.fps == 0 else 0.7 * self.fps + 0.3 * rate
+        self.frame_sample = (now, frame_count)
+
+    def _eta(self, now):
+        """Seconds until the job finishes, or None when there's nothing to go on"""
+        if self.stage in FINISHED_STAGES or self.run_started is None:
+            return None
+        if self.stage in ("rendering", "processing") and self.fps > 0 and self.total_frames:
+            return round((self.total_frames - self.frame_count) / self.fps, 1)
+        if 0 < self.progress < 100:
+            elapsed = now - self.run_started
+            return round(elapsed * (100 - self.progress) / self.progress, 1)
+        return None
 
 @app.get("/shaders/list")
 async def list_shaders():
-    """Return list of available GLSL shaders"""
+    """Return list of available GLSL shaders, leaving out those that don't compile"""
     try:
-        shader_files = [f.name for f in SHADER_DIR.glob("*.glsl")]
+        await shader_index_ready()
+        shader_files = [f.name for f in SHADER_DIR.glob("*.glsl") if not SHADER_INDEX.error(f.name)]
         logger.info(f"Found shaders: {shader_files}")
         return JSONResponse(shader_files)
     except Exception as e:
         logger.error(f"Error listing shaders: {e}")
         return JSONResponse([])
 
+@app.get("/shaders/index")
+async def get_shader_index():
+    """Validation result of every shader: compile status, error, compile time, uniforms and samplers"""
+    await shader_index_ready()
+    return JSONResponse(SHADER_INDEX.entries)
+
 @app.get("/shaders/config")
 async def get_config():
     """Return shader configuration for UI"""
     return JSONResponse(SHADER_CONFIG)
 
+@app.get("/shaders/source/{shader_name}")
+async def get_shader_source(shader_name: str):
+    """Return GLSL source for the browser preview"""
+    shader_path = SHADER_DIR / Path(shader_name).name
+    if shader_path.suffix != ".glsl" or not shader_path.exists():
+        return JSONResponse({"error": "Shader not found"}, status_code=404)
+    return PlainTextResponse(read_shader_source(shader_path))
+
+@app.get("/textures/{filename}")
+async def get_texture(filename: str):
+    """Serve static shader textures for the browser preview"""
+    texture_path = TEXTURE_DIR / Path(filename).name
+    if not texture_path.is_file():
+        return JSONResponse({"error": "Texture not found"}, status_code=404)
+    return FileResponse(texture_path)
+
 @app.get("/progress/{job_id}")
 async def get_progress(job_id: str):
     """Get processing progress for a job"""
-    if job_id in progress_store:
-        return JSONResponse(progress_store[job_id])
+    job = job_registry.get(job_id)
+    if job is not None:
+        return JSONResponse({**job, "queue_position": scheduler.queue_position(job_id)})
     else:
         return JSONResponse({"error": "Job not found"}, status_code=404)
 
 @app.get("/progress/stream/{job_id}")
-async def stream_progress(job_id: str):
-    """Stream processing progress updates"""
+async def stream_progress(job_id: str, request: Request):
+    """Push progress updates as Server-Sent Events until the job finishes"""
+    job = job_registry.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+
     async def generate():
-        while job_id in progress_store:
-            data = progress_store[job_id]
-            yield f"data: {json.dumps(data)}\n\n"
+        with event_bus.subscribe(job_id) as events:
+            # Current state first, then every published update
+            data = {**job_registry.get(job_id), "queue_position": scheduler.queue_position(job_id)}
+            while True:
+                yield f"event: progress\ndata: {json.dumps(data)}\n\n"
+                if data.get("stage") in FINISHED_STAGES:
+                    break
 
-            # If processing is complete, stop streaming
-            if data.get("progress", 0) >= 100:
-                break
+                try:
+                    data = await asyncio.wait_for(events.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                    data = {**(job_registry.get(job_id) or {}), **data,
+                            "queue_position": scheduler.queue_position(job_id)}
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
 
-            await asyncio.sleep(1)  # Update every second
+    return StreamingResponse(generate(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/audio/analyze")
+async def analyze_audio_upload(request: Request):
+    """Analyze an audio track once and return a reusable analysis ID"""
+    upload_dir = UPLOADS_DIR / uuid.uuid4().hex
+    try:
+        fields, files = await ingest_multipart(request, upload_dir)
+        audio = files.get('audio')
 
-    return StreamingResponse(generate(), media_type="text/plain")
+        if not audio:
+            return JSONResponse({"error": "Missing required file: audio"}, status_code=400)
+
+        # Analysis is CPU-heavy, keep it off the event loop and out of the API process
+        analysis_id, summary = await run_audio_analysis(
+            AUDIO_STORE.create, audio.path, audio.filename, audio.sha256
+        )
+
+        return JSONResponse({"analysis_id": analysis_id, "summary": summary})
+
+    except UploadError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error(f"Error analyzing audio: {str(e)}")
+        return JSONResponse(
+            {"error": f"Audio analysis failed: {str(e)}"},
+            status_code=500
+        )
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+@app.get("/audio/stats")
+async def get_audio_stats():
+    """Stored analysis count, total size and analyses in use by jobs"""
+    loop = asyncio.get_event_loop()
+    return JSONResponse(await loop.run_in_executor(None, AUDIO_STORE.stats))
+
+@app.get("/audio/{analysis_id}")
+async def get_audio_analysis(analysis_id: str):
+    """Return the summary of a stored audio analysis"""
+    summary = AUDIO_STORE.get_summary(analysis_id)
+    if summary is None:
+        return JSONResponse({"error": "Analysis not found"}, status_code=404)
+    return JSONResponse({"analysis_id": analysis_id, "summary": summary})
+
+@app.get("/audio/{analysis_id}/timeline")
+async def get_audio_timeline(analysis_id: str, format: str = "uint8", fft: bool = False,
+                             beat_sensitivity: float = 1.0, bass_response: float = 1.0,
+                             mid_response: float = 1.0, treble_response: float = 1.0):
+    """
+    Return the per-frame feature timeline as a compact binary blob.
+
+    The body holds frames x features values (plus frames x FFT bins when
+    fft=true) in the requested format; the layout is described by the
+    X-Timeline-* response headers (see audio_analysis.encode_timeline).
+    """
+    if format not in ("uint8", "float16"):
+        return JSONResponse({"error": "format must be uint8 or float16"}, status_code=400)
+    audio_settings = {
+        'beat_sensitivity': beat_sensitivity,
+        'bass_response': bass_response,
+        'mid_response': mid_response,
+        'treble_response': treble_response,
+    }
+    for name, value in audio_settings.items():
+        if not math.isfinite(value):
+            return JSONResponse({"error": f"{name} must be a finite number"}, status_code=400)
+
+    analysis = await asyncio.to_thread(AUDIO_STORE.load, analysis_id)
+    if analysis is None:
+        return JSONResponse({"error": "Analysis not found"}, status_code=404)
+
+    features = apply_audio_settings(analysis['features'], audio_settings)
+
+    fft_rows = None
+    if fft:
+        fft_rows = await run_audio_analysis(AUDIO_STORE.load_fft, analysis_id)
+
+    data, metadata = encode_timeline(features, fft_rows, format)
+
+    return Response(data, media_type="application/octet-stream", headers={
+        "X-Timeline-Format": metadata['format'],
+        "X-Timeline-Frames": str(metadata['frames']),
+        "X-Timeline-Frame-Rate": str(analysis['frame_rate']),
+        "X-Timeline-Features": ",".join(metadata['features']),
+        "X-Timeline-Scale": str(metadata['scale']),
+        "X-Timeline-Fft-Bins": str(metadata['fft_bins']),
+        "Access-Control-Expose-Headers": "X-Timeline-Format, X-Timeline-Frames, X-Timeline-Frame-Rate, "
+                                         "X-Timeline-Features, X-Timeline-Scale, X-Timeline-Fft-Bins",
+    })
 
 @app.post("/process")
 async def process_video(request: Request):
     """Process video with shader effects and instrument audio"""
+    return await submit_render(request)
+
+@app.post("/process/batch")
+async def process_batch(request: Request):
+    """
+    Render one video/audio pair with several shaders in a single job.
+
+    Takes the same fields as /process, but instead of shader a "variants"
+    JSON list of {"shader": ..., "uniforms": {...}}; uniform_* fields apply
+    to every variant. Each variant's video is at /download/{job_id}?variant=N.
+    """
+    return await submit_render(request, batch=True)
+
+def parse_shader_list(fields, field, limit):
+    """
+    Read a JSON list of shaders, e.g. a batch's variants or a chain's stages.
+    Entries are shader names or {"shader": ..., "uniforms": {...}} objects.
+
+    Returns:
+        (shaders, error): list of {"shader", "uniforms"} dicts, or an error message.
+    """
+    try:
+        entries = json.loads(fields.get(field) or '[]')
+    except json.JSONDecodeError:
+        return None, f"{field} must be a JSON list"
+    if not isinstance(entries, list) or not entries:
+        return None, f"{field} must be a non-empty JSON list"
+    if len(entries) > limit:
+        return None, f"{field} can list at most {limit} shaders"
+
+    parsed = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"shader": entry}
+        if not isinstance(entry, dict) or not isinstance(entry.get("shader"), str):
+            return None, f"Each entry in {field} needs a shader"
+        if not (SHADER_DIR / Path(entry["shader"]).name).is_file():
+            return None, f"Shader not found: {entry['shader']}"
+        compile_error = SHADER_INDEX.error(Path(entry["shader"]).name)
+        if compile_error:
+            return None, f"Shader {entry['shader']} doesn't compile: {compile_error}"
+        if not isinstance(entry.get("uniforms", {}), dict):
+            return None, f"Uniforms in {field} must be JSON objects"
+        parsed.append({"shader": Path(entry["shader"]).name, "uniforms": entry.get("uniforms", {})})
+    return parsed, None
+
+async def submit_render(request: Request, batch=False):
+    """Ingest, validate and queue a render job; batch jobs render several shader variants"""
+    blob_hashes, held_analysis = [], None
     try:
         # Generate unique job ID for progress tracking
         job_id = str(uuid.uuid4())
         tracker = ProgressTracker(job_id)
         tracker.start_time = asyncio.get_event_loop().time()
 
-        form = await request.form()
+        # Admission control: reject before reading the upload body
+        if scheduler.is_full():
+            return queue_full_response()
 
-        # Get required files
-        video = form.get('video')
-        audio = form.get('audio')
-        shader = form.get('shader')
+        # Stream uploads straight into the job's workspace
+        upload_dir = WORKSPACES.create(job_id) / "uploads"
+        upload_start = time.perf_counter()
+        try:
+            fields, files = await ingest_multipart(request, upload_dir)
+        except UploadError as e:
+            WORKSPACES.remove(job_id)
+            return JSONResponse({"error": str(e)}, status_code=400)
+        upload_seconds = time.perf_counter() - upload_start
 
-        if not video or not audio or not shader:
-            return JSONResponse(
-                {"error": "Missing required files: video, audio, or shader"},
-                status_code=400
-            )
+        # Let background probes finish before the uploads move
+        probes = {name: await upload.get_probe() for name, upload in files.items()}
 
-        # Return job ID immediately for progress tracking
-        response_data = {"job_id": job_id}
+        # Move uploads into the blob store; inputs sent as hashes reuse stored blobs.
+        # They're held until the job ends so eviction can't remove them.
+        inputs, missing = store_job_inputs(fields, files)
+        blob_hashes = [sha256 for sha256, _ in inputs.values()]
+        shutil.rmtree(upload_dir, ignore_errors=True)
 
-        # Start processing in background
-        asyncio.create_task(process_video_background(form, tracker))
+        shader = fields.get('shader')
+        analysis_id = fields.get('analysis_id')
+        if analysis_id and AUDIO_STORE.acquire(analysis_id):
+            held_analysis = analysis_id
+        await shader_index_ready()
+        variants, chain, list_error = None, None, None
+        if batch:
+            variants, list_error = parse_shader_list(fields, 'variants', MAX_BATCH_VARIANTS)
+        elif fields.get('chain'):
+            chain, list_error = parse_shader_list(fields, 'chain', MAX_CHAIN_STAGES)
+        options, option_error = parse_render_options(fields)
 
-        return JSONResponse(response_data)
+        # A stored analysis ID can stand in for the audio upload
+        error = None
+        if missing:
+            error = ({"error": "Inputs not found on server, upload them instead", "missing": missing}, 404)
+        elif list_error or option_error:
+            error = ({"error": list_error or option_error}, 400)
+        elif 'video' not in inputs or not (shader or batch or chain) or not ('audio' in inputs or analysis_id):
+            error = ({"error": "Missing required files: video, audio (or analysis_id), or shader"}, 400)
+        elif not (batch or chain) and not (SHADER_DIR / Path(shader).name).is_file():
+            error = ({"error": "Shader not found"}, 404)
+        elif not (batch or chain) and SHADER_INDEX.error(Path(shader).name):
+            error = ({"error": "Shader doesn't compile", "details": SHADER_INDEX.error(Path(shader).name)}, 400)
+        elif analysis_id and not held_analysis:
+            error = ({"error": "Audio analysis not found"}, 404)
+        elif fields.get('output_mode', 'frames') not in ('frames',) + OUTPUT_MODES:
+            error = ({"error": f"output_mode must be one of: frames, {', '.join(OUTPUT_MODES)}"}, 400)
+        elif fields.get('priority', 'interactive') not in JOB_PRIORITIES:
+            error = ({"error": f"priority must be one of: {', '.join(JOB_PRIORITIES)}"}, 400)
+        else:
+            video_info = probes['video'] if 'video' in files else await probe_media(inputs['video'][1])
+            if video_info is not None and not video_info.get("width"):
+                error = ({"error": "Uploaded video file contains no video stream"}, 400)
+
+        if error:
+            release_inputs(blob_hashes, held_analysis)
+            WORKSPACES.remove(job_id)
+            return JSONResponse(error[0], status_code=error[1])
+
+        # Labelled only once the shader is known to exist, so clients can't add series at will
+        metrics.STAGE_SECONDS.observe(upload_seconds, stage="upload",
+                                      shader="batch" if batch else "chain" if chain else Path(shader).name)
+
+        spec = prepare_job_spec(fields, inputs, tracker, options, video_info, variants, chain)
+        job_registry.update(job_id, {"output_mode": spec["output_mode"]})
+
+        # An identical render already finished, hand out its output; profiling needs a real render
+        result_key = None
+        if not batch and not spec["profile"]:
+            result_key = render_cache_key(spec, inputs)
+            cached_path = RESULT_CACHE.get(result_key)
+            if cached_path is not None and complete_cached_job(tracker, cached_path, spec):
+                release_inputs(blob_hashes, held_analysis)
+                return JSONResponse({"job_id": job_id, "queue_position": 0, "cached": True})
+
+        # Previews are interactive and may pause full renders; anything else is batch work
+        default_priority = 'interactive' if fields.get('preview_mode') == 'true' else 'batch'
+        priority = JOB_PRIORITIES[fields.get('priority', default_priority)]
+
+        try:
+            queue_position = scheduler.submit(
+                job_id, spec, tracker,
+                on_complete=lambda result: complete_job(tracker, result, result_key),
+                on_finish=lambda: finish_job(job_id, blob_hashes, held_analysis),
+                priority=priority
+            )
+        except QueueFullError:
+            release_inputs(blob_hashes, held_analysis)
+            WORKSPACES.remove(job_id)
+            job_registry.remove(job_id)
+            return queue_full_response()
+
+        # Return job ID immediately for progress tracking
+        return JSONResponse({"job_id": job_id, "queue_position": queue_position})
 
     except Exception as e:
         logger.error(f"Error processing video: {str(e)}")
+        # Nothing was queued: don't leave the job or its files behind
+        release_inputs(blob_hashes, held_analysis)
+        WORKSPACES.remove(job_id)
+        job_registry.remove(job_id)
         return JSONResponse(
             {"error": f"Processing failed: {str(e)}"},
             status_code=500
         )
 
-async def process_video_background(form, tracker: ProgressTracker):
-    """Background video processing with progress tracking"""
-    try:
-        # Get form data
-        video = form.get('video')
-        audio = form.get('audio')
-        shader = form.get('shader')
+def store_job_inputs(fields, files):
+    """
+    Resolve the job's video, audio and texture inputs to blobs.
 
-        tracker.update(progress=5, stage="initializing", message="Initializing video stream...",
-                      details="Setting up direct video streaming pipeline")
+    Each input is either an uploaded file, which is moved into the blob
+    store, or a "<name>_sha256" field naming a blob the server already has.
+    Every resolved blob is acquired right away, so eviction can't remove it
+    while the job is validated; the caller must release them.
 
-        logger.info(f"Processing with shader: {shader}")
+    Returns:
+        (inputs, missing): dict of input name -> (sha256, blob path), and a
+        list of input names whose hashes aren't in the store.
+    """
+    names = {'video', 'audio'}
+    names.update(name for name in files if TEXTURE_FIELD.match(name))
+    names.update(name[:-len('_sha256')] for name in fields
+                 if name.endswith('_sha256') and TEXTURE_FIELD.match(name[:-len('_sha256')]))
 
-        # Parse uniforms
-        uniforms = {}
-        for k, v in form.items():
-            if k.startswith("uniform_"):
-                name = k[8:]  # Remove "uniform_" prefix
-                try:
-                    # Try to parse as JSON first (for arrays/objects)
-                    uniforms[name] = json.loads(v)
-                except (json.JSONDecodeError, TypeError):
-                    try:
-                        # Try to parse as float
-                        uniforms[name] = float(v)
-                    except (ValueError, TypeError):
-                        # Keep as string if all else fails
-                        uniforms[name] = str(v)
-
-        logger.info(f"Parsed uniforms: {uniforms}")
-
-        tracker.update(progress=15, stage="analyzing", message="Analyzing audio...",
-                      details="Processing audio for beat detection and frequency analysis")
-
-        # Save main files to temp
-        video_path = TEMP_DIR / f"input_video_{video.filename}"
-        audio_path = TEMP_DIR / f"input_audio_{audio.filename}"
-        output_path = TEMP_DIR / "output_disco.mp4"
-
-        with open(video_path, "wb") as f:
-            shutil.copyfileobj(video.file, f)
-        with open(audio_path, "wb") as f:
-            shutil.copyfileobj(audio.file, f)
-
-        logger.info(f"Saved input files: video={video_path}, audio={audio_path}")
-
-        tracker.update(progress=25, stage="streaming", message="Streaming video through shader...",
-                      details="Applying trippy visual effects in real-time")
-
-        # Parse audio settings from form
-        audio_settings = {}
-        if form.get('reactivity_preset'):
-            audio_settings['reactivity_preset'] = form.get('reactivity_preset')
-        if form.get('beat_sensitivity'):
-            audio_settings['beat_sensitivity'] = float(form.get('beat_sensitivity'))
-        if form.get('bass_response'):
-            audio_settings['bass_response'] = float(form.get('bass_response'))
-        if form.get('mid_response'):
-            audio_settings['mid_response'] = float(form.get('mid_response'))
-        if form.get('treble_response'):
-            audio_settings['treble_response'] = float(form.get('treble_response'))
-
-        # Handle preview mode
-        max_frames = None
-        if form.get('preview_mode') == 'true':
-            max_frames = int(form.get('max_frames', 240))
-            logger.info(f"Preview mode enabled: {max_frames} frames")
-
-        # Process video with progress tracking and audio settings
-        if USE_STREAMING:
-            logger.info("Using new streaming video processor")
-            processor = StreamingVideoProcessor(
-                video_path=video_path,
-                audio_path=audio_path,
-                shader_path=SHADER_DIR / shader,
-                output_path=output_path,
-                extra_uniforms=uniforms,
-                progress_tracker=tracker,
-                audio_settings=audio_settings,
-                max_frames=max_frames
-            )
+    inputs, missing = {}, []
+    for name in sorted(names):
+        upload = files.get(name)
+        if upload is not None:
+            inputs[name] = (upload.sha256, BLOB_STORE.put(upload.path, upload.sha256, acquire=True))
+        elif fields.get(f'{name}_sha256'):
+            sha256 = fields[f'{name}_sha256'].strip().lower()
+            blob_path = BLOB_STORE.acquire(sha256)
+            if blob_path is None:
+                missing.append(name)
+            else:
+                inputs[name] = (sha256, blob_path)
+    return inputs, missing
+
+def release_inputs(blob_hashes, analysis_id=None):
+    """Release a job's input blobs and the stored audio analysis it holds"""
+    for sha256 in blob_hashes:
+        BLOB_STORE.release(sha256)
+    if analysis_id:
+        AUDIO_STORE.release(analysis_id)
+
+def finish_job(job_id, blob_hashes, analysis_id=None):
+    """Release a job's inputs and start its workspace TTL, whether it succeeded or not"""
+    release_inputs(blob_hashes, analysis_id)
+    WORKSPACES.mark_finished(job_id)
+
+def queue_full_response():
+    stats = scheduler.stats()
+    return JSONResponse(
+        {"error": "Render queue is full, try again later", **stats},
+        status_code=429,
+        headers={"Retry-After": str(max(1, int(stats["avg_wait_seconds"])))}
+    )
+
+def parse_render_options(fields):
+    """
+    Parse the numeric form fields of a render: uniform_* values, audio
+    settings and the preview frame count.
+
+    Returns:
+        (options, error): dict with uniforms, audio_settings and max_frames
+        (None unless previewing), or an error message.
+    """
+    uniforms = {}
+    for key, value in fields.items():
+        if not key.startswith("uniform_"):
+            continue
+        try:
+            # JSON for arrays, plain numbers otherwise
+            parsed = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            parsed = value
+        if isinstance(parsed, list):
+            if not parsed or not all(isinstance(item, (int, float)) and not isinstance(item, bool)
+                                     for item in parsed):
+                return None, f"{key} must be a number or a list of numbers"
         else:
-            logger.info("Using legacy frame-based video processor")
-            processor = ShaderVideoProcessor(
-                video_path=video_path,
-                audio_path=audio_path,
-                shader_path=SHADER_DIR / shader,
-                output_path=output_path,
-                extra_uniforms=uniforms,
-                progress_tracker=tracker,
-                audio_settings=audio_settings,
-                max_frames=max_frames
-            )
+            try:
+                parsed = float(parsed)
+            except (ValueError, TypeError):
+                return None, f"{key} must be a number or a list of numbers"
+            if not math.isfinite(parsed):
+                return None, f"{key} must be a finite number"
+        uniforms[key[len("uniform_"):]] = parsed
 
-        processor.run()
+    audio_settings = {}
+    if fields.get('reactivity_preset'):
+        audio_settings['reactivity_preset'] = fields.get('reactivity_preset')
+    for name in ('beat_sensitivity', 'bass_response', 'mid_response', 'treble_response'):
+        if fields.get(name):
+            try:
+                audio_settings[name] = float(fields[name])
+            except ValueError:
+                return None, f"{name} must be a number"
+            if not math.isfinite(audio_settings[name]):
+                return None, f"{name} must be a finite number"
 
-        if not output_path.exists():
-            raise Exception("Output video was not created")
+    max_frames = None
+    if fields.get('preview_mode') == 'true':
+        try:
+            max_frames = int(fields.get('max_frames', 240))
+        except ValueError:
+            return None, "max_frames must be an integer"
+        if max_frames < 1:
+            return None, "max_frames must be at least 1"
 
-        tracker.update(progress=100, stage="complete", message="Processing complete!",
-                      details="Your trippy video is ready!")
+    return {"uniforms": uniforms, "audio_settings": audio_settings, "max_frames": max_frames}, None
 
-        logger.info("Video processing completed successfully")
+def prepare_job_spec(fields, inputs, tracker: ProgressTracker, options, video_info=None, variants=None, chain=None):
+    """Turn the resolved inputs and parsed options into a picklable job spec for render_worker"""
+    shader = fields.get('shader')
+    if variants:
+        shader = variants[0]['shader']
+    elif chain:
+        shader = chain[-1]['shader']
+    analysis_id = fields.get('analysis_id')
 
-        # Store the output path for download
-        progress_store[tracker.job_id]["output_path"] = str(output_path)
+    details = "Preparing files for rendering"
+    if video_info:
+        details = (f"Video: {video_info['width']}x{video_info['height']} @ "
+                   f"{video_info.get('fps', 0):.2f}fps, {video_info['duration']:.1f}s")
+    tracker.update(progress=5, stage="queued", message="Upload complete", details=details)
 
-    except Exception as e:
-        logger.error(f"Error in background processing: {str(e)}")
-        tracker.update(progress=0, stage="error", message="Processing failed",
-                      details=f"Error: {str(e)}")
+    logger.info(f"Processing with shader: {shader}")
+    uniforms = options["uniforms"]
+    logger.info(f"Parsed uniforms: {uniforms}")
+
+    video_path = inputs['video'][1]
+    workspace = WORKSPACES.path(tracker.job_id)
+    output_path = workspace / "output.mp4"
+
+    # Reuse the stored track and analysis when an analysis ID was given
+    if analysis_id:
+        audio_path = AUDIO_STORE.get_audio_path(analysis_id)
+    else:
+        audio_path = inputs['audio'][1]
+
+    textures = {TEXTURE_FIELD.match(name).group(1): str(blob_path)
+                for name, (_, blob_path) in inputs.items() if TEXTURE_FIELD.match(name)}
+
+    logger.info(f"Saved input files: video={video_path}, audio={audio_path}")
+
+    audio_settings = options["audio_settings"]
+
+    # Handle preview mode
+    max_frames = options["max_frames"]
+    quality = {}
+    if max_frames is not None:
+        # Previews render a low-res proxy unless full quality is asked for;
+        # max_frames counts full-rate frames, keep the same duration
+        if fields.get('preview_quality', 'proxy') == 'proxy':
+            quality = PROXY_QUALITY
+            max_frames = max(1, round(max_frames * PROXY_FRAME_RATE / FULL_FRAME_RATE))
+        logger.info(f"Preview mode enabled: {max_frames} frames, {quality or 'full quality'}")
+
+    # Batches pipe every variant into its own plain MP4 encoder
+    output_mode = fields.get('output_mode', 'frames')
+    batch_variants = None
+    if variants:
+        output_mode = 'mp4'
+        batch_variants = [
+            {
+                "shader_path": str(SHADER_DIR / variant['shader']),
+                "uniforms": {**uniforms, **variant['uniforms']},
+                "output_path": str(workspace / f"output_{index}.mp4"),
+                "textures": textures,
+            }
+            for index, variant in enumerate(variants)
+        ]
+        output_path = batch_variants[0]['output_path']
+        logger.info(f"Batch of {len(variants)} shaders: {[variant['shader'] for variant in variants]}")
+
+    # Chain stages are applied in order within one render; uniform_* fields apply to every stage
+    chain_stages = None
+    if chain:
+        chain_stages = [
+            {
+                "shader_path": str(SHADER_DIR / stage['shader']),
+                "uniforms": {**uniforms, **stage['uniforms']},
+                "textures": textures,
+            }
+            for stage in chain
+        ]
+        logger.info(f"Shader chain: {' -> '.join(stage['shader'] for stage in chain)}")
+
+    return {
+        "video_path": str(video_path),
+        "audio_path": str(audio_path),
+        "shader_path": str(SHADER_DIR / Path(shader).name),
+        "output_path": str(output_path),
+        "work_dir": str(workspace),
+        "output_mode": output_mode,
+        "variants": batch_variants,
+        "chain": chain_stages,
+        "uniforms": uniforms,
+        "audio_settings": audio_settings,
+        "max_frames": max_frames,
+        "quality": quality,
+        "textures": textures,
+        "analysis_id": analysis_id,
+        "audio_store_root": str(AUDIO_STORE.root),
+        "use_streaming": USE_STREAMING,
+        "profile": fields.get('profile') == 'true',
+    }
+
+def shader_source_hash(shader_path):
+    """sha256 of a shader's source together with the buffer pass sources it declares"""
+    shader_path = Path(shader_path)
+    digest = hashlib.sha256(shader_path.read_bytes())
+    for buffer_path in buffer_shader_paths(SHADER_CONFIG.get(shader_path.name, {})):
+        digest.update(buffer_path.read_bytes())
+    return digest.hexdigest()
+
+def texture_fingerprints(shader_name):
+    """Modification time and size of each Textures/ file a shader's config names, by channel"""
+    fingerprints = {}
+    for channel, filename in sorted(SHADER_CONFIG.get(shader_name, {}).get('textures', {}).items()):
+        try:
+            stat = (TEXTURE_DIR / filename).stat()
+            fingerprints[channel] = [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            fingerprints[channel] = None
+    return fingerprints
+
+def render_cache_key(spec, inputs):
+    """
+    Result cache key for a job spec.
+
+    Covers the input contents, the shader source, its config entry and the
+    texture files it names, and every setting that changes the rendered
+    output; paths are left out since they differ per job.
+    """
+    shader_path = Path(spec["shader_path"])
+    return cache_key({
+        "inputs": {name: sha256 for name, (sha256, _) in inputs.items()},
+        "analysis_id": spec["analysis_id"],
+        "shader": shader_source_hash(shader_path),
+        "shader_config": SHADER_CONFIG.get(shader_path.name),
+        "textures": texture_fingerprints(shader_path.name),
+        "uniforms": spec["uniforms"],
+        "audio_settings": spec["audio_settings"],
+        "max_frames": spec["max_frames"],
+        "quality": spec["quality"],
+        "output_mode": spec["output_mode"],
+        "use_streaming": spec["use_streaming"],
+        "chain": [(shader_source_hash(stage["shader_path"]), stage["uniforms"],
+                   texture_fingerprints(Path(stage["shader_path"]).name))
+                  for stage in spec["chain"] or []],
+    })
+
+def complete_job(tracker: ProgressTracker, result, result_key=None):
+    """Mark a job done once its worker returns"""
+    tracker.update(progress=100, stage="complete", message="Processing complete!",
+                  details="Your trippy video is ready!")
+
+    logger.info("Video processing completed successfully")
+
+    # Store the output path for download
+    job_registry.update(tracker.job_id, {"output_path": result["output_path"]})
+    if result.get("outputs"):
+        job_registry.update(tracker.job_id, {"outputs": result["outputs"]})
+    if result.get("profile"):
+        job_registry.update(tracker.job_id, {"profile": result["profile"]})
+
+    # HLS segments aren't cached, so those renders can't be answered from the cache
+    if result_key and job_registry.get(tracker.job_id).get("output_mode") != "hls":
+        try:
+            RESULT_CACHE.put(result_key, result["output_path"])
+        except OSError as e:
+            logger.warning(f"Failed to cache render result: {e}")
+
+def complete_cached_job(tracker: ProgressTracker, cached_path, spec):
+    """
+    Finish a job straight away with a cached output.
+
+    Returns:
+        False if the entry was evicted since the lookup, so the job has to be rendered.
+    """
+    output_path = Path(spec["output_path"])
+    try:
+        link_or_copy(cached_path, output_path)
+    except OSError as e:
+        logger.warning(f"Cached output for job {tracker.job_id} is gone, rendering it instead: {e}")
+        return False
+    WORKSPACES.mark_finished(tracker.job_id)
+
+    logger.info(f"Job {tracker.job_id} served from the result cache")
+    tracker.update(progress=100, stage="complete", message="Processing complete!",
+                   details="Reused an identical earlier render")
+    job_registry.update(tracker.job_id, {"output_path": str(output_path), "cached": True})
+    metrics.JOBS.inc(status="cached")
+    return True
+
+@app.post("/blobs/check")
+async def check_blobs(request: Request):
+    """Report which of the given sha256 hashes the server already stores"""
+    try:
+        hashes = (await request.json()).get("hashes", [])
+    except (json.JSONDecodeError, AttributeError):
+        return JSONResponse({"error": "Expected a JSON body with a hashes list"}, status_code=400)
+    return JSONResponse({"present": [h for h in hashes if isinstance(h, str) and BLOB_STORE.has(h.lower())]})
+
+@app.head("/blobs/{sha256}")
+async def head_blob(sha256: str):
+    """200 if a blob with this hash is stored, 404 otherwise"""
+    return Response(status_code=200 if BLOB_STORE.has(sha256.lower()) else 404)
+
+@app.get("/blobs/stats")
+async def get_blob_stats():
+    """Blob count, total size and blobs in use by jobs"""
+    return JSONResponse(BLOB_STORE.stats())
+
+@app.get("/workspaces/stats")
+async def get_workspace_stats():
+    """Job workspace count, total size and the disk budget"""
+    loop = asyncio.get_event_loop()
+    return JSONResponse(await loop.run_in_executor(None, WORKSPACES.stats))
+
+@app.get("/jobs/{job_id}/workspace")
+async def get_job_workspace(job_id: str):
+    """Disk usage of one job's workspace"""
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+
+    loop = asyncio.get_event_loop()
+    usage = await loop.run_in_executor(None, WORKSPACES.usage, job_id)
+    if usage is None:
+        return JSONResponse({"error": "Workspace not found"}, status_code=404)
+    return JSONResponse({"job_id": job_id, **usage})
+
+async def flush_job_registry():
+    """Write batched job state changes to disk"""
+    while True:
+        await asyncio.sleep(JOB_FLUSH_INTERVAL_SECONDS)
+        try:
+            job_registry.flush()
+        except Exception as e:
+            logger.error(f"Failed to persist job state: {e}")
+
+async def collect_garbage():
+    """Periodically enforce blob, audio analysis and workspace TTLs and the disk budget"""
+    loop = asyncio.get_event_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, BLOB_STORE.evict_expired)
+            await loop.run_in_executor(None, AUDIO_STORE.evict_expired)
+            await loop.run_in_executor(None, WORKSPACES.collect, scheduler.job_ids(), BLOB_STORE, AUDIO_STORE)
+            job_registry.prune(OUTPUT_TTL_HOURS * 3600)
+        except Exception as e:
+            logger.error(f"Garbage collection failed: {e}")
+        await asyncio.sleep(GC_INTERVAL_SECONDS)
+
+@app.get("/jobs/{job_id}/profile")
+async def get_job_profile(job_id: str):
+    """p50/p95 stage timings per shader of a job rendered with profile=true"""
+    job = job_registry.get(job_id)
+    if job is None or not job.get("profile"):
+        return JSONResponse({"error": "No profile for this job"}, status_code=404)
+    return JSONResponse({"job_id": job_id, "summary": job["profile"]["summary"],
+                         "trace_url": f"/jobs/{job_id}/profile/trace"})
+
+@app.get("/jobs/{job_id}/profile/trace")
+async def get_job_profile_trace(job_id: str):
+    """Chrome trace of a profiled job, for chrome://tracing or ui.perfetto.dev"""
+    job = job_registry.get(job_id)
+    if job is None or not job.get("profile") or not Path(job["profile"]["trace_path"]).exists():
+        return JSONResponse({"error": "No profile for this job"}, status_code=404)
+    return FileResponse(job["profile"]["trace_path"], media_type="application/json",
+                        filename=f"disco_profile_{job_id}.json")
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; a running render stops at the next frame and its ffmpeg is killed"""
+    if scheduler.cancel(job_id):
+        return JSONResponse({"job_id": job_id, "cancelled": True})
+
+    job = job_registry.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return JSONResponse({"error": f"Job already finished ({job.get('stage')})"}, status_code=409)
+
+@app.get("/jobs/stats")
+async def get_job_stats():
+    """Render queue depth, active jobs and wait times"""
+    return JSONResponse({**scheduler.stats(), "registry": job_registry.stats()})
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Cached render count, size and hit rate"""
+    return JSONResponse(RESULT_CACHE.stats())
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: per-stage timings, queue, cache, GL memory and ffmpeg processes"""
+    stats = scheduler.stats()
+    metrics.QUEUE_DEPTH.set(stats["queue_depth"])
+    metrics.ACTIVE_JOBS.set(stats["active_jobs"])
+    metrics.PAUSED_JOBS.set(stats["paused_jobs"])
+
+    cache = RESULT_CACHE.stats()
+    metrics.CACHE_ENTRIES.set(cache["entries"])
+    metrics.CACHE_BYTES.set(cache["total_bytes"])
+    metrics.CACHE_HIT_RATIO.set(cache["hit_rate"])
+
+    return PlainTextResponse(metrics.REGISTRY.exposition(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stream/{job_id}")
+async def stream_output(job_id: str, request: Request):
+    """
+    Serve a fragmented MP4 output (output_mode=fmp4) while it is still rendering.
+
+    The response follows the file as the encoder appends fragments and ends
+    once the job has finished, so a <video> element can start playing the
+    first seconds of a long render right away.
+    """
+    job = job_registry.get(job_id)
+    if job is None or job.get("output_mode") != "fmp4":
+        return JSONResponse({"error": "No streamable output for this job"}, status_code=404)
+
+    output_path = WORKSPACES.path(job_id) / "output.mp4"
+    if job.get("stage") == "complete" and output_path.exists():
+        return FileResponse(output_path, media_type="video/mp4")
+
+    async def generate():
+        position = 0
+        while not await request.is_disconnected():
+            finished = (job_registry.get(job_id) or {}).get("stage", "complete") in FINISHED_STAGES
+            if output_path.exists():
+                async with aiofiles.open(output_path, "rb") as f:
+                    await f.seek(position)
+                    while chunk := await f.read(STREAM_CHUNK_BYTES):
+                        position += len(chunk)
+                        yield chunk
+            if finished:
+                break
+            await asyncio.sleep(STREAM_POLL_SECONDS)
+
+    return StreamingResponse(generate(), media_type="video/mp4", headers={"Cache-Control": "no-cache"})
+
+@app.get("/hls/{job_id}/{filename}")
+async def get_hls_file(job_id: str, filename: str):
+    """Serve the HLS playlist and segments of a job rendered with output_mode=hls"""
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+
+    hls_path = WORKSPACES.path(job_id) / "hls" / Path(filename).name
+    if hls_path.suffix not in (".m3u8", ".ts") or not hls_path.is_file():
+        return JSONResponse({"error": "Not found"}, status_code=404)
+
+    if hls_path.name == HLS_PLAYLIST:
+        # The playlist grows while rendering, clients must re-fetch it
+        return FileResponse(hls_path, media_type="application/vnd.apple.mpegurl",
+                            headers={"Cache-Control": "no-cache"})
+    return FileResponse(hls_path, media_type="video/mp2t")
 
 @app.get("/download/{job_id}")
-async def download_result(job_id: str):
-    """Download the processed video"""
-    if job_id in progress_store and "output_path" in progress_store[job_id]:
-        output_path = Path(progress_store[job_id]["output_path"])
+async def download_result(job_id: str, variant: int = None):
+    """
+    Download the processed video; Range requests are supported for seeking and resuming.
+    For batch jobs, variant selects which shader's video (default: the first).
+    """
+    job = job_registry.get(job_id)
+    if job is not None and variant is not None:
+        outputs = job.get("outputs") or []
+        if not 0 <= variant < len(outputs) or not outputs[variant]["output_path"]:
+            return JSONResponse({"error": "Variant not found or failed to render"}, status_code=404)
+        output_path = Path(outputs[variant]["output_path"])
+        if output_path.exists():
+            return FileResponse(output_path, filename=f"disco_{Path(outputs[variant]['shader']).stem}.mp4",
+                                media_type="video/mp4")
+    elif job is not None and "output_path" in job:
+        output_path = Path(job["output_path"])
         if output_path.exists():
             return FileResponse(
                 output_path,
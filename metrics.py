@@ -0,0 +1,266 @@
+# metrics.py
+"""
+Prometheus-style metrics for the render service, served at /metrics.
+
+Counters, gauges and histograms live in a module-level registry. Renders
+run in worker processes, so a worker calls forward_to() at the start of a
+job: from then on its observations are batched and handed to a sink (the
+scheduler's progress queue) instead of being recorded locally, and the
+API process applies them to its own registry with apply(). Gauges that
+describe API process state (queue depth, cache hit rate) are set just
+before each scrape.
+"""
+
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a per-frame readback (~1 ms) up to a full-length encode
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    metric_type = None
+
+    def __init__(self, registry, name, help_text, label_names=()):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def remove(self, **labels):
+        """Drop one labelled series (e.g. for a job that has finished)"""
+        with self.registry.lock:
+            self.values.pop(self._key(labels), None)
+
+    def samples(self):
+        """(suffix, label values, extra labels, value) for every series"""
+        return [("", key, (), value) for key, value in sorted(self.values.items())]
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        self.registry.record(self.name, "inc", self._key(labels), amount)
+
+    def _apply(self, op, key, value):
+        self.values[key] = self.values.get(key, 0.0) + value
+
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def set(self, value, **labels):
+        self.registry.record(self.name, "set", self._key(labels), value)
+
+    def inc(self, amount=1.0, **labels):
+        self.registry.record(self.name, "inc", self._key(labels), amount)
+
+    def dec(self, amount=1.0, **labels):
+        self.registry.record(self.name, "inc", self._key(labels), -amount)
+
+    def _apply(self, op, key, value):
+        if op == "set":
+            self.values[key] = value
+        else:
+            self.values[key] = self.values.get(key, 0.0) + value
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, registry, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, label_names)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        self.registry.record(self.name, "observe", self._key(labels), value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent in the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _apply(self, op, key, value):
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][index] += 1
+                break
+        series["sum"] += value
+        series["count"] += 1
+
+    def samples(self):
+        samples = []
+        for key, series in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                samples.append(("_bucket", key, (("le", _format_value(bound)),), cumulative))
+            samples.append(("_sum", key, (), series["sum"]))
+            samples.append(("_count", key, (), series["count"]))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.sink = None
+        self.pending = []
+        self.flush_interval = 0.5
+        self.last_flush = 0.0
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter(self, name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._register(Gauge(self, name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, help_text, label_names, buckets))
+
+    def record(self, name, op, key, value):
+        """Apply one operation here, or queue it for the sink when forwarding"""
+        if self.sink is None:
+            self.apply([(name, op, key, value)])
+            return
+
+        self.pending.append((name, op, key, value))
+        now = time.monotonic()
+        if now - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def apply(self, ops):
+        """Apply operations recorded by another process"""
+        with self.lock:
+            for name, op, key, value in ops:
+                metric = self.metrics.get(name)
+                if metric is not None:
+                    metric._apply(op, tuple(key), value)
+
+    def forward_to(self, sink, flush_interval=0.5):
+        """
+        Send observations to sink(ops) in batches instead of recording them,
+        or record locally again with sink=None.
+        """
+        self.flush()
+        self.sink = sink
+        self.flush_interval = flush_interval
+
+    def flush(self):
+        if self.sink is not None and self.pending:
+            ops, self.pending = self.pending, []
+            try:
+                self.sink(ops)
+            except Exception as e:
+                logger.warning(f"Failed to forward {len(ops)} metric updates: {e}")
+        self.last_flush = time.monotonic()
+
+    def exposition(self):
+        """All metrics in the Prometheus text format"""
+        lines = []
+        with self.lock:
+            for metric in self.metrics.values():
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+                lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+                for suffix, key, extra, value in metric.samples():
+                    labels = _format_labels(metric.label_names, key, extra)
+                    lines.append(f"{metric.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Pipeline stages: upload, audio_analysis, decode, frame_load, texture_upload,
+# render, readback, encode, mux
+STAGE_SECONDS = REGISTRY.histogram(
+    "disco_stage_seconds", "Time spent in each pipeline stage; per frame stages are observed per frame",
+    ("stage", "shader"))
+FRAMES_RENDERED = REGISTRY.counter(
+    "disco_frames_rendered_total", "Frames rendered", ("shader",))
+JOBS = REGISTRY.counter(
+    "disco_jobs_total", "Render jobs finished, by outcome", ("status",))
+
+QUEUE_DEPTH = REGISTRY.gauge("disco_queue_depth", "Jobs waiting for a render worker")
+ACTIVE_JOBS = REGISTRY.gauge("disco_active_jobs", "Jobs holding a render worker, including paused ones")
+PAUSED_JOBS = REGISTRY.gauge("disco_paused_jobs", "Batch jobs paused for interactive work")
+
+CACHE_ENTRIES = REGISTRY.gauge("disco_result_cache_entries", "Renders in the result cache")
+CACHE_BYTES = REGISTRY.gauge("disco_result_cache_bytes", "Disk space used by the result cache")
+CACHE_LOOKUPS = REGISTRY.counter("disco_result_cache_lookups_total", "Result cache lookups", ("result",))
+CACHE_HIT_RATIO = REGISTRY.gauge("disco_result_cache_hit_ratio", "Share of result cache lookups that hit")
+
+GL_TEXTURE_BYTES = REGISTRY.gauge(
+    "disco_gl_texture_bytes", "GL texture memory held by renders, summed over the worker processes")
+
+FFMPEG_PROCESSES = REGISTRY.counter(
+    "disco_ffmpeg_processes_total", "ffmpeg/ffprobe processes started", ("kind",))
+FFMPEG_RUNNING = REGISTRY.gauge(
+    "disco_ffmpeg_processes_running", "ffmpeg/ffprobe processes currently running", ("kind",))
+
+
+# This process's share of GL_TEXTURE_BYTES
+_texture_bytes = 0
+
+
+def set_texture_bytes(value):
+    """
+    Report the GL texture memory this process's render holds. Workers send
+    the change rather than the value, so the API process sums them into one
+    series without one per worker process.
+    """
+    global _texture_bytes
+    if value != _texture_bytes:
+        GL_TEXTURE_BYTES.inc(value - _texture_bytes)
+        _texture_bytes = value
+
+
+@contextmanager
+def ffmpeg_process(kind):
+    """Count an ffmpeg/ffprobe process while the with block runs it"""
+    FFMPEG_PROCESSES.inc(kind=kind)
+    FFMPEG_RUNNING.inc(kind=kind)
+    try:
+        yield
+    finally:
+        FFMPEG_RUNNING.dec(kind=kind)
@@ -0,0 +1,177 @@
+# render_profiler.py
+"""
+Opt-in per-frame profiling of render jobs.
+
+Every pipeline stage is timed on the CPU, and the GL work of each frame is
+additionally measured with timer queries (ctx.query(time=True)), so a slow
+job can be attributed to decode, uniform/texture setup, the shader itself
+or readback. Results are written as a Chrome trace (open it in
+chrome://tracing or ui.perfetto.dev) and as a per-shader summary of
+p50/p95 milliseconds per stage.
+
+GPU spans are drawn on their own track starting when their query began;
+the GPU clock isn't synchronised with the CPU's, only the durations are
+exact. With a software renderer (llvmpipe) drawing happens when the
+result is read back, so the GPU spans are short and readback carries the
+render cost.
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+CPU_TRACK = 1
+GPU_TRACK = 2
+
+# Returned by some drivers for a query without a result
+INVALID_QUERY_RESULT = 0xFFFFFFFF
+
+# Resolve timer queries this many frames late, when the GPU is done with them
+QUERY_LATENCY = 3
+
+
+class RenderProfiler:
+    def __init__(self, name="render"):
+        """
+        Args:
+            name: Process name shown in the trace (e.g. the job ID)
+        """
+        self.name = name
+        self.origin = time.perf_counter()
+        self.spans = []  # (track, stage, shader, frame, start seconds, duration seconds)
+        self.pending_queries = []  # (query, stage, shader, frame, start seconds)
+        self.free_queries = {}  # context -> resolved queries for reuse (queries can't be released)
+
+    def add_span(self, stage, start, duration, shader=None, frame=None):
+        """Record a CPU span that began at time.perf_counter() value start"""
+        self.spans.append((CPU_TRACK, stage, shader, frame, start - self.origin, duration))
+
+    @contextmanager
+    def cpu(self, stage, shader=None, frame=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(stage, start, time.perf_counter() - start, shader, frame)
+
+    @contextmanager
+    def gpu(self, ctx, stage, shader=None, frame=None):
+        """Measure the GL commands issued in the with block with a timer query"""
+        free = self.free_queries.setdefault(ctx, [])
+        query = free.pop() if free else ctx.query(time=True)
+        start = time.perf_counter()
+        with query:
+            yield
+        self.pending_queries.append((query, stage, shader, frame, start - self.origin))
+        if len(self.pending_queries) > QUERY_LATENCY:
+            self._resolve(self.pending_queries[:-QUERY_LATENCY])
+            self.pending_queries = self.pending_queries[-QUERY_LATENCY:]
+
+    def _resolve(self, queries):
+        for query, stage, shader, frame, start in queries:
+            elapsed = query.elapsed
+            self.free_queries.setdefault(query.ctx, []).append(query)
+            if elapsed != INVALID_QUERY_RESULT:
+                self.spans.append((GPU_TRACK, stage, shader, frame, start, elapsed / 1e9))
+
+    def finish(self):
+        """Read back the outstanding timer queries; call before the GL context goes away"""
+        self._resolve(self.pending_queries)
+        self.pending_queries = []
+
+    def chrome_trace(self):
+        """The recorded spans in the Chrome trace event format"""
+        pid = os.getpid()
+        events = [
+            {"ph": "M", "name": "process_name", "pid": pid, "args": {"name": self.name}},
+            {"ph": "M", "name": "thread_name", "pid": pid, "tid": CPU_TRACK, "args": {"name": "CPU"}},
+            {"ph": "M", "name": "thread_name", "pid": pid, "tid": GPU_TRACK, "args": {"name": "GPU"}},
+        ]
+        for track, stage, shader, frame, start, duration in self.spans:
+            args = {"shader": shader}
+            if frame is not None:
+                args["frame"] = frame
+            events.append({"ph": "X", "name": stage, "cat": "gpu" if track == GPU_TRACK else "cpu",
+                           "pid": pid, "tid": track, "ts": start * 1e6, "dur": duration * 1e6,
+                           "args": args})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self):
+        """
+        Per shader and stage: count, total, p50 and p95 in milliseconds.
+        GPU measurements are listed as "gpu_<stage>".
+        """
+        durations = {}
+        for track, stage, shader, frame, start, duration in self.spans:
+            name = f"gpu_{stage}" if track == GPU_TRACK else stage
+            durations.setdefault(shader or "job", {}).setdefault(name, []).append(duration * 1000)
+
+        return {
+            shader: {
+                stage: {
+                    "count": len(values),
+                    "total_ms": round(float(np.sum(values)), 3),
+                    "p50_ms": round(float(np.percentile(values, 50)), 3),
+                    "p95_ms": round(float(np.percentile(values, 95)), 3),
+                }
+                for stage, values in sorted(stages.items())
+            }
+            for shader, stages in sorted(durations.items())
+        }
+
+    def write(self, output_dir, prefix="profile"):
+        """
+        Write <prefix>_trace.json and <prefix>_summary.json to output_dir.
+
+        Returns:
+            (trace_path, summary)
+        """
+        self.finish()
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        trace_path = output_dir / f"{prefix}_trace.json"
+        with open(trace_path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+        summary = self.summary()
+        with open(output_dir / f"{prefix}_summary.json", 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        logger.info(f"Wrote profile of {len(self.spans)} spans to {trace_path}")
+        return trace_path, summary
+
+
+def record_stage(profiler, stage, shader, start, frame=None):
+    """Report a stage that began at time.perf_counter() value start to /metrics and the profiler, if any"""
+    duration = time.perf_counter() - start
+    STAGE_SECONDS.observe(duration, stage=stage, shader=shader)
+    if profiler is not None:
+        profiler.add_span(stage, start, duration, shader, frame)
+
+
+@contextmanager
+def timed_stage(profiler, stage, shader, frame=None):
+    """Time the with block as a pipeline stage, see record_stage()"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(profiler, stage, shader, start, frame)
+
+
+def format_summary(summary):
+    """Summary as a text table, one line per shader and stage"""
+    lines = [f"{'shader':<28} {'stage':<20} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'total ms':>10}"]
+    for shader, stages in summary.items():
+        for stage, row in stages.items():
+            lines.append(f"{shader:<28} {stage:<20} {row['count']:>6} {row['p50_ms']:>9.2f} "
+                         f"{row['p95_ms']:>9.2f} {row['total_ms']:>10.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,161 @@
+# render_worker.py
+"""
+Render job entry point for scheduler worker processes.
+
+Everything here runs inside a process pool worker, so the heavy processor
+imports (librosa, moderngl, cv2) and the render itself stay out of the API
+process. Progress updates are sent back over a queue and applied to the
+job's ProgressTracker by the scheduler.
+"""
+
+import logging
+import time
+from pathlib import Path
+
+import metrics
+from gl_backend import configure_worker
+from job_control import JobControl
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedProgressTracker:
+    """
+    Progress tracker stand-in that forwards updates to the API process.
+
+    Updates are coalesced so at most one is sent per min_interval, except
+    stage changes which go out immediately with everything pending.
+    """
+    def __init__(self, job_id, progress_queue, min_interval=0.25):
+        self.job_id = job_id
+        self.progress_queue = progress_queue
+        self.min_interval = min_interval
+        self.pending = {}
+        self.last_sent = 0.0
+
+    def update(self, **kwargs):
+        # The API process marks jobs complete or failed once the result is back
+        if kwargs.get('stage') in ('complete', 'error', 'cancelled'):
+            return
+
+        self.pending.update(kwargs)
+        now = time.monotonic()
+        if 'stage' in kwargs or now - self.last_sent >= self.min_interval:
+            self.progress_queue.put((self.job_id, self.pending))
+            self.pending = {}
+            self.last_sent = now
+
+
+def init_worker(concurrent_workers=1):
+    """Process pool initializer; concurrent_workers is how many jobs render at once"""
+    logging.basicConfig(level=logging.INFO)
+    configure_worker(concurrent_workers)
+
+
+def run_render_job(job_id, spec, progress_queue, controls):
+    """
+    Run one render job described by spec (see main.process_video).
+
+    controls is the scheduler's shared dict of pause/cancel requests.
+
+    Returns:
+        Dict with the output_path of the rendered video.
+    """
+    tracker = QueuedProgressTracker(job_id, progress_queue)
+    job_control = JobControl(job_id, controls, tracker)
+
+    # Stage timings and counters reach /metrics in the API process along with progress
+    metrics.REGISTRY.forward_to(lambda ops: progress_queue.put((job_id, {"metrics": ops})))
+    try:
+        return _render(spec, tracker, job_control)
+    finally:
+        metrics.set_texture_bytes(0)
+        metrics.REGISTRY.flush()
+
+
+def _render(spec, tracker, job_control):
+    from shader_video_processor import ShaderVideoProcessor
+    from audio_analysis import AudioAnalysisStore
+    from render_profiler import RenderProfiler
+
+    profiler = RenderProfiler(name=f"job {tracker.job_id}") if spec.get('profile') else None
+
+    audio_analysis = None
+    if spec.get('analysis_id'):
+        audio_analysis = AudioAnalysisStore(spec['audio_store_root']).load(spec['analysis_id'])
+
+    processor_args = dict(
+        video_path=spec['video_path'],
+        audio_path=spec['audio_path'],
+        shader_path=spec['shader_path'],
+        output_path=spec['output_path'],
+        extra_uniforms=spec['uniforms'],
+        progress_tracker=tracker,
+        audio_settings=spec['audio_settings'],
+        max_frames=spec['max_frames'],
+        audio_analysis=audio_analysis,
+        texture_overrides=spec.get('textures')
+    )
+
+    if spec.get('variants'):
+        from batch_video_processor import BatchVideoProcessor
+        logger.info(f"Rendering a batch of {len(spec['variants'])} shaders")
+        processor = BatchVideoProcessor(
+            video_path=spec['video_path'],
+            audio_path=spec['audio_path'],
+            variants=spec['variants'],
+            progress_tracker=tracker,
+            audio_settings=spec['audio_settings'],
+            max_frames=spec['max_frames'],
+            audio_analysis=audio_analysis,
+            work_dir=spec.get('work_dir'),
+            output_mode=spec['output_mode'],
+            job_control=job_control,
+            profiler=profiler,
+            **spec.get('quality', {})
+        )
+        outputs = processor.run()
+        output_path = next(output['output_path'] for output in outputs if output['output_path'])
+        return {"output_path": output_path, "outputs": outputs, **_write_profile(profiler, spec)}
+
+    if spec.get('chain'):
+        from chain_video_processor import ChainVideoProcessor
+        chain_args = {key: value for key, value in processor_args.items()
+                      if key not in ('shader_path', 'extra_uniforms', 'texture_overrides')}
+        processor = ChainVideoProcessor(stages=spec['chain'], **chain_args, work_dir=spec.get('work_dir'),
+                                        output_mode=spec.get('output_mode', 'frames'),
+                                        job_control=job_control, profiler=profiler,
+                                        **spec.get('quality', {}))
+    elif spec.get('use_streaming'):
+        from streaming_video_processor import StreamingVideoProcessor
+        logger.info("Using new streaming video processor")
+        processor = StreamingVideoProcessor(**processor_args)
+    else:
+        logger.info("Using legacy frame-based video processor")
+        processor = ShaderVideoProcessor(**processor_args, work_dir=spec.get('work_dir'),
+                                         output_mode=spec.get('output_mode', 'frames'),
+                                         job_control=job_control, profiler=profiler,
+                                         **spec.get('quality', {}))
+
+    try:
+        processor.run()
+    finally:
+        # Workers are reused, so free the GL context and everything in it
+        if hasattr(processor, 'ctx'):
+            if profiler:
+                profiler.finish()
+            processor.ctx.release()
+
+    output_path = Path(spec['output_path'])
+    if not output_path.exists():
+        raise Exception("Output video was not created")
+
+    return {"output_path": str(output_path), **_write_profile(profiler, spec)}
+
+
+def _write_profile(profiler, spec):
+    """Write a profiled job's trace into its workspace; result fields for the API process"""
+    if profiler is None:
+        return {}
+    trace_path, summary = profiler.write(spec['work_dir'])
+    return {"profile": {"trace_path": str(trace_path), "summary": summary}}
@@ -0,0 +1,130 @@
+# result_cache.py
+"""
+Cache of finished renders keyed by everything that determines the output.
+
+The key is a hash of the input content hashes, the shader source, the
+parsed uniforms, the audio settings and the frame/output settings, so
+submitting the same render again (a second click, a page refresh, a shared
+preset) is answered with the stored video instead of re-running the
+pipeline. The cache is bounded by size; least recently used entries are
+evicted first.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(parts):
+    """sha256 of a canonical JSON encoding of parts (key order doesn't matter)"""
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def link_or_copy(source_path, dest_path):
+    """Hard link when source and destination share a filesystem, copy otherwise"""
+    try:
+        os.link(source_path, dest_path)
+    except OSError:
+        shutil.copyfile(source_path, dest_path)
+
+
+class ResultCache:
+    def __init__(self, root, max_bytes=5 * 1024 ** 3):
+        """
+        Args:
+            root: Directory cached outputs are stored in
+            max_bytes: Total size of cached outputs before the least recently
+                       used ones are evicted
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / "index.json"
+        self.lock = threading.Lock()
+        self.index = self._load_index()
+        self.hits = 0
+        self.misses = 0
+
+    def _load_index(self):
+        index = {}
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            except Exception as e:
+                logger.warning(f"Failed to load result cache index, starting empty: {e}")
+        return {key: entry for key, entry in index.items() if self._entry_path(key).exists()}
+
+    def _save_index(self):
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        tmp_path.replace(self.index_path)
+
+    def _entry_path(self, key):
+        return self.root / f"{key}.mp4"
+
+    def get(self, key):
+        """Path of the cached output for key, or None; counts a hit or a miss"""
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(result="miss")
+                return None
+            self.hits += 1
+            CACHE_LOOKUPS.inc(result="hit")
+            entry['hits'] += 1
+            entry['last_used'] = time.time()
+            return self._entry_path(key)
+
+    def put(self, key, output_path):
+        """Store a finished output under key, evicting old entries to stay within max_bytes"""
+        size = Path(output_path).stat().st_size
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.index:
+                return
+            entry_path = self._entry_path(key)
+            link_or_copy(output_path, entry_path)
+            self.index[key] = {'size': size, 'hits': 0, 'created': time.time(), 'last_used': time.time()}
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        total = sum(entry['size'] for entry in self.index.values())
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key in sorted(self.index, key=lambda k: self.index[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            entry = self.index.pop(key)
+            self._entry_path(key).unlink(missing_ok=True)
+            total -= entry['size']
+            evicted += 1
+        logger.info(f"Evicted {evicted} cached renders to stay within {self.max_bytes / 1024 ** 2:.0f} MB")
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.index),
+                "total_bytes": sum(entry['size'] for entry in self.index.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
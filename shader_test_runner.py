@@ -7,10 +7,25 @@ Renders 250-frame previews of each shader with random video/audio inputs
 import json
 import random
 import logging
+import logging.handlers
+import multiprocessing
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import time
 import sys
+import numpy as np
+from PIL import Image
+import gl_backend
+from gl_backend import configure_worker
+from audio_analysis import analyze_audio
 from shader_video_processor import ShaderVideoProcessor
+from batch_video_processor import BatchVideoProcessor
+from render_profiler import RenderProfiler, format_summary, timed_stage
+from synthetic_inputs import SyntheticAudio, SyntheticVideo
+from golden_frames import (GOLDEN_DIR, DEFAULT_GOLDEN_TIMES, DEFAULT_TOLERANCE,
+                           compare_frame, save_golden)
 
 # Set up logging
 logging.basicConfig(
@@ -23,6 +38,97 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Frame rate of synthetic inputs, the processors' default output rate
+SYNTHETIC_FRAME_RATE = 30
+
+# Benchmark metrics, and whether a higher value is better
+BENCHMARK_METRICS = {
+    'render_fps': True,
+    'gpu_ms_per_frame': False,
+    'analysis_seconds': False,
+    'encode_seconds': False,
+}
+# How much worse than the baseline (percent) a metric may get before the run fails
+DEFAULT_REGRESSION_THRESHOLDS = {
+    'render_fps': 15.0,
+    'gpu_ms_per_frame': 20.0,
+    'analysis_seconds': 25.0,
+    'encode_seconds': 25.0,
+}
+# Absolute changes below these are timer noise, never regressions
+BENCHMARK_NOISE_FLOOR = {
+    'render_fps': 0.5,
+    'gpu_ms_per_frame': 0.25,
+    'analysis_seconds': 0.1,
+    'encode_seconds': 0.1,
+}
+
+
+def parse_resolutions(text):
+    """'640x360,1280x720' -> [(640, 360), (1280, 720)]"""
+    resolutions = []
+    for item in text.split(','):
+        width, _, height = item.strip().lower().partition('x')
+        resolutions.append((int(width), int(height)))
+    return resolutions
+
+
+def parse_thresholds(text):
+    """'render_fps=10,encode_seconds=30' -> the default thresholds with those overridden"""
+    thresholds = dict(DEFAULT_REGRESSION_THRESHOLDS)
+    for item in filter(None, (text or '').split(',')):
+        name, _, value = item.partition('=')
+        if name.strip() not in BENCHMARK_METRICS:
+            raise ValueError(f"Unknown benchmark metric: {name} (expected one of {', '.join(BENCHMARK_METRICS)})")
+        thresholds[name.strip()] = float(value)
+    return thresholds
+
+
+def benchmark_metrics(summary, wall_seconds):
+    """Benchmark metrics of one render from its RenderProfiler summary"""
+    stages = {}
+    for shader_stages in summary.values():
+        for stage, row in shader_stages.items():
+            stages[stage] = stages.get(stage, 0.0) + row['total_ms']
+    frames = max(row.get('render', {}).get('count', 0) for row in summary.values())
+
+    gpu_ms = sum(total for stage, total in stages.items() if stage.startswith('gpu_'))
+    pipeline_ms = stages.get('texture_upload', 0.0) + stages.get('render', 0.0) + stages.get('readback', 0.0)
+    return {
+        'frames': frames,
+        'render_fps': round(frames / (pipeline_ms / 1000), 2) if pipeline_ms else None,
+        'gpu_ms_per_frame': round(gpu_ms / frames, 3) if frames and gpu_ms else None,
+        'analysis_seconds': round(stages.get('audio_analysis', 0.0) / 1000, 3),
+        'encode_seconds': round((stages.get('encode', 0.0) + stages.get('mux', 0.0)) / 1000, 3),
+        'decode_seconds': round(stages.get('decode', 0.0) / 1000, 3),
+        'end_to_end_fps': round(frames / wall_seconds, 2) if wall_seconds else None,
+    }
+
+
+def compare_to_baseline(results, baseline, thresholds):
+    """
+    Regressions of results against baseline results (both keyed like run_benchmarks()).
+
+    Returns:
+        List of dicts with key, metric, baseline, current and change_percent
+        (positive means worse).
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous or 'error' in current or 'error' in previous:
+            continue
+        for metric, higher_is_better in BENCHMARK_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) / old * 100 if higher_is_better else (new - old) / old * 100
+            if change > thresholds[metric] and abs(new - old) > BENCHMARK_NOISE_FLOOR[metric]:
+                regressions.append({'key': key, 'metric': metric, 'baseline': old, 'current': new,
+                                    'change_percent': round(change, 1)})
+    return regressions
+
+
 class ShaderTestRunner:
     def __init__(self):
         """Initialize the shader test runner"""
@@ -34,6 +140,11 @@ class ShaderTestRunner:
         # Test settings
         self.preview_frames = 240
         self.test_resolution = (1280, 720)
+        self.profile = False
+        self.synthetic = False
+        self.profiles_dir = self.outputs_dir / "profiles"
+        self.golden_dir = GOLDEN_DIR
+        self.golden_diffs_dir = self.outputs_dir / "golden_diffs"
         
         # Create outputs directory
         self.outputs_dir.mkdir(exist_ok=True)
@@ -103,6 +214,23 @@ class ShaderTestRunner:
         
         return video_file, audio_file
 
+    def _use_synthetic_inputs(self):
+        """Whether to test with synthetic inputs: when asked to, or when Videos/ lacks a video or audio file"""
+        if not self.synthetic and (not self.video_files or not self.audio_files):
+            logger.warning("No video/audio pair in the Videos directory, using synthetic inputs")
+            self.synthetic = True
+        return self.synthetic
+
+    def _get_synthetic_inputs(self, resolution, frame_count):
+        """Inputs for test_shader() generated in memory: test pattern frames and a click track's analysis"""
+        audio = SyntheticAudio(duration=frame_count / SYNTHETIC_FRAME_RATE + 1.0)
+        return {
+            'video_file': None,
+            'audio_file': None,
+            'frames': SyntheticVideo(resolution, SYNTHETIC_FRAME_RATE, frame_count=frame_count),
+            'audio_analysis': audio.analysis(SYNTHETIC_FRAME_RATE),
+        }
+
     def _get_shader_defaults(self, shader_name):
         """Get default uniform values for a shader"""
         if shader_name not in self.shader_config:
@@ -134,17 +262,26 @@ class ShaderTestRunner:
         else:
             return {'reactivity_preset': 'none'}
 
-    def test_shader(self, shader_name):
-        """Test a single shader with random inputs"""
+    def test_shader(self, shader_name, inputs=None):
+        """
+        Test a single shader with random (or synthetic) inputs, or with inputs
+        prepared by _prepare_shared_inputs() or _get_synthetic_inputs()
+        """
+        processor = None
         try:
             logger.info(f"\n{'='*60}")
             logger.info(f"TESTING SHADER: {shader_name}")
             logger.info(f"{'='*60}")
             
             # Get random input files
-            video_file, audio_file = self._get_random_inputs()
-            logger.info(f"Video input: {video_file.name}")
-            logger.info(f"Audio input: {audio_file.name}")
+            if not inputs and self._use_synthetic_inputs():
+                inputs = self._get_synthetic_inputs(self.test_resolution, self.preview_frames)
+            elif not inputs:
+                video_file, audio_file = self._get_random_inputs()
+                inputs = {'video_file': video_file, 'audio_file': audio_file}
+            video_file, audio_file = inputs['video_file'], inputs['audio_file']
+            logger.info(f"Video input: {video_file.name if video_file else 'synthetic'}")
+            logger.info(f"Audio input: {audio_file.name if audio_file else 'synthetic'}")
             
             # Get shader defaults and audio settings
             uniforms = self._get_shader_defaults(shader_name)
@@ -156,7 +293,8 @@ class ShaderTestRunner:
             
             # Create progress tracker for this test
             progress_tracker = TestProgressTracker(shader_name)
-            
+            profiler = RenderProfiler(name=shader_name) if self.profile else None
+
             # Create processor
             processor = ShaderVideoProcessor(
                 video_path=video_file,
@@ -166,7 +304,11 @@ class ShaderTestRunner:
                 extra_uniforms=uniforms,
                 progress_tracker=progress_tracker,
                 audio_settings=audio_settings,
-                max_frames=self.preview_frames
+                max_frames=self.preview_frames,
+                audio_analysis=inputs.get('audio_analysis'),
+                profiler=profiler,
+                frames_dir=inputs.get('frames_dir'),
+                frames=inputs.get('frames')
             )
             
             # Run the test
@@ -177,7 +319,10 @@ class ShaderTestRunner:
             
             end_time = time.time()
             duration = end_time - start_time
-            
+
+            if profiler:
+                self._write_profile(profiler, shader_base_name)
+
             # Check if output was created
             if output_file.exists():
                 file_size = output_file.stat().st_size / (1024 * 1024)  # MB
@@ -193,6 +338,10 @@ class ShaderTestRunner:
         except Exception as e:
             logger.error(f"❌ ERROR: {shader_name} - {str(e)}")
             return False
+        finally:
+            # Worker processes run many tests; don't keep a GL context per test
+            if processor is not None and hasattr(processor, 'ctx'):
+                processor.ctx.release()
 
     def run_all_tests(self):
         """Run tests for all shaders"""
@@ -218,6 +367,330 @@ class ShaderTestRunner:
         
         return results
 
+    def _prepare_shared_inputs(self, assignments, work_dir):
+        """
+        Decode each input video once per render resolution and analyze each
+        audio track once, for all the tests assigned to them.
+
+        Args:
+            assignments: Dict of shader name -> (video_file, audio_file)
+            work_dir: Directory for the decoded frames
+
+        Returns:
+            Dict of shader name -> inputs for test_shader()
+        """
+        frames_dirs = {}
+        analyses = {}
+        inputs = {}
+        for shader_name, (video_file, audio_file) in assignments.items():
+            # Shake shaders render oversized, so their frames are decoded at another size
+            processor = ShaderVideoProcessor(video_file, audio_file, self.shader_dir / shader_name,
+                                             self.outputs_dir / f"{shader_name}.mp4",
+                                             max_frames=self.preview_frames, work_dir=work_dir)
+            frames_key = (video_file, processor.resolution)
+            if frames_key not in frames_dirs:
+                logger.info(f"Decoding {video_file.name} at {processor.resolution[0]}x{processor.resolution[1]}")
+                _, frames_dirs[frames_key] = processor.extract_frames()
+
+            if audio_file not in analyses:
+                try:
+                    features, _ = analyze_audio(audio_file, processor.frame_rate,
+                                                duration=processor._audio_duration())
+                    analyses[audio_file] = {'frame_rate': processor.frame_rate, 'features': features}
+                except Exception as e:
+                    # Each test then analyzes (and falls back) on its own
+                    logger.warning(f"Shared audio analysis of {audio_file.name} failed: {e}")
+                    analyses[audio_file] = None
+
+            inputs[shader_name] = {
+                'video_file': video_file,
+                'audio_file': audio_file,
+                'audio_analysis': analyses[audio_file],
+                'frames_dir': frames_dirs[frames_key],
+            }
+        return inputs
+
+    def run_parallel_tests(self, jobs):
+        """Run the tests for all shaders in jobs worker processes, sharing decoded frames and audio analysis"""
+        logger.info(f"\n🚀 STARTING PARALLEL SHADER TEST SUITE")
+        logger.info(f"Testing {len(self.shader_config)} shaders in {jobs} processes")
+        logger.info(f"Preview frames: {self.preview_frames}")
+        logger.info(f"Output directory: {self.outputs_dir}")
+
+        start_time = time.time()
+        settings = {'preview_frames': self.preview_frames, 'profile': self.profile, 'jobs': jobs}
+        work_dir = Path(tempfile.mkdtemp(prefix="disco_test_"))
+        results = {}
+        log_listener = None
+
+        try:
+            if self._use_synthetic_inputs():
+                shared = self._get_synthetic_inputs(self.test_resolution, self.preview_frames)
+                inputs = {shader_name: shared for shader_name in self.shader_config}
+            else:
+                assignments = {shader_name: self._get_random_inputs() for shader_name in self.shader_config}
+                inputs = self._prepare_shared_inputs(assignments, work_dir)
+
+            # Spawn rather than fork: GL contexts don't survive fork
+            mp_context = multiprocessing.get_context("spawn")
+            # Workers log through this process, so their lines reach the log file whole and in order
+            log_queue = mp_context.Queue()
+            log_listener = logging.handlers.QueueListener(log_queue, *logging.getLogger().handlers,
+                                                          respect_handler_level=True)
+            log_listener.start()
+            with ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context,
+                                     initializer=_init_test_worker, initargs=(settings, log_queue)) as pool:
+                futures = {pool.submit(_run_worker_test, shader_name, shader_inputs): shader_name
+                           for shader_name, shader_inputs in inputs.items()}
+                for done, future in enumerate(as_completed(futures), 1):
+                    shader_name = futures[future]
+                    try:
+                        results[shader_name] = future.result()
+                    except Exception as e:
+                        logger.error(f"❌ ERROR: {shader_name} - worker failed: {e}")
+                        results[shader_name] = False
+                    logger.info(f"[{done}/{len(futures)}] {shader_name}: "
+                                f"{'passed' if results[shader_name] else 'failed'}")
+        finally:
+            if log_listener is not None:
+                log_listener.stop()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        # Report in config order, whatever order the workers finished in
+        results = {shader_name: results.get(shader_name, False) for shader_name in self.shader_config}
+        self._generate_summary_report(results, time.time() - start_time)
+        return results
+
+    def run_batch_tests(self):
+        """Render all shaders in one pass over a single random input pair"""
+        logger.info(f"\n🚀 STARTING BATCH SHADER TEST")
+        logger.info(f"Testing {len(self.shader_config)} shaders in one batch")
+
+        start_time = time.time()
+        if self._use_synthetic_inputs():
+            inputs = self._get_synthetic_inputs(self.test_resolution, self.preview_frames)
+        else:
+            video_file, audio_file = self._get_random_inputs()
+            inputs = {'video_file': video_file, 'audio_file': audio_file}
+        video_file, audio_file = inputs['video_file'], inputs['audio_file']
+        logger.info(f"Video input: {video_file.name if video_file else 'synthetic'}")
+        logger.info(f"Audio input: {audio_file.name if audio_file else 'synthetic'}")
+
+        profiler = RenderProfiler(name="batch") if self.profile else None
+        variants = [
+            {
+                'shader_path': self.shader_dir / shader_name,
+                'output_path': self.outputs_dir / f"{shader_name.replace('.glsl', '')}.mp4",
+                'uniforms': self._get_shader_defaults(shader_name),
+            }
+            for shader_name in self.shader_config
+        ]
+        processor = BatchVideoProcessor(
+            video_path=video_file,
+            audio_path=audio_file,
+            variants=variants,
+            progress_tracker=TestProgressTracker("batch"),
+            audio_settings={'reactivity_preset': 'moderate'},
+            max_frames=self.preview_frames,
+            audio_analysis=inputs.get('audio_analysis'),
+            profiler=profiler,
+            frames=inputs.get('frames')
+        )
+
+        try:
+            outputs = processor.run()
+            results = {output['shader']: output['error'] is None for output in outputs}
+            for output in outputs:
+                if output['error']:
+                    logger.error(f"❌ FAILED: {output['shader']} - {output['error']}")
+        except Exception as e:
+            logger.error(f"❌ Batch failed: {e}")
+            results = {shader_name: False for shader_name in self.shader_config}
+
+        if profiler:
+            self._write_profile(profiler, "batch")
+
+        self._generate_summary_report(results, time.time() - start_time)
+        return results
+
+    def benchmark_shader(self, shader_name, resolution, frames):
+        """Render one shader at one resolution and frame count from synthetic inputs; returns benchmark_metrics()"""
+        width, height = resolution
+        output_file = self.outputs_dir / "benchmarks" / f"{shader_name.replace('.glsl', '')}_{width}x{height}_{frames}.mp4"
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+
+        profiler = RenderProfiler(name=shader_name)
+        start_time = time.perf_counter()
+        # The click track is analysed here rather than by the processor, timed as its stage
+        with timed_stage(profiler, "audio_analysis", shader_name):
+            audio_analysis = SyntheticAudio(duration=frames / SYNTHETIC_FRAME_RATE + 1.0).analysis(SYNTHETIC_FRAME_RATE)
+        processor = ShaderVideoProcessor(
+            video_path=None,
+            audio_path=None,
+            shader_path=self.shader_dir / shader_name,
+            output_path=output_file,
+            extra_uniforms=self._get_shader_defaults(shader_name),
+            audio_settings=self._get_audio_settings(shader_name),
+            max_frames=frames,
+            output_mode="mp4",
+            base_resolution=resolution,
+            audio_analysis=audio_analysis,
+            profiler=profiler,
+            frames=SyntheticVideo(resolution, SYNTHETIC_FRAME_RATE, frame_count=frames)
+        )
+        try:
+            processor.run()
+            wall_seconds = time.perf_counter() - start_time
+            profiler.finish()
+        finally:
+            if hasattr(processor, 'ctx'):
+                processor.ctx.release()
+        return benchmark_metrics(profiler.summary(), wall_seconds)
+
+    def run_benchmarks(self, resolutions, frame_counts, baseline_path, thresholds, save_baseline=False):
+        """
+        Benchmark every shader at every resolution and frame count, write
+        Outputs/benchmark.json and compare against the baseline.
+
+        Returns:
+            True if every render succeeded and nothing regressed.
+        """
+        logger.info(f"\n🚀 STARTING SHADER BENCHMARK")
+        logger.info(f"Inputs: synthetic test pattern and click track at {SYNTHETIC_FRAME_RATE} fps")
+        logger.info(f"Resolutions: {resolutions}, frame counts: {frame_counts}")
+
+        results = {}
+        for shader_name in self.shader_config:
+            for width, height in resolutions:
+                for frames in frame_counts:
+                    key = f"{shader_name}@{width}x{height}/{frames}"
+                    try:
+                        results[key] = self.benchmark_shader(shader_name, (width, height), frames)
+                        row = results[key]
+                        logger.info(f"⏱️  {key}: {row['render_fps']} fps, {row['gpu_ms_per_frame']} GPU ms/frame, "
+                                    f"analysis {row['analysis_seconds']}s, encode {row['encode_seconds']}s")
+                    except Exception as e:
+                        logger.error(f"❌ {key}: {e}")
+                        results[key] = {'error': str(e)}
+
+        report = {
+            'generated': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'renderer': gl_backend.renderer(),
+            'inputs': {'video': 'synthetic', 'audio': 'synthetic', 'frame_rate': SYNTHETIC_FRAME_RATE},
+            'resolutions': [f"{width}x{height}" for width, height in resolutions],
+            'frame_counts': frame_counts,
+            'thresholds': thresholds,
+            'results': results,
+            'regressions': [],
+        }
+        failures = [key for key, row in results.items() if 'error' in row]
+
+        baseline_path = Path(baseline_path)
+        if save_baseline:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(baseline_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            logger.info(f"Saved benchmark baseline to {baseline_path}")
+        elif baseline_path.exists():
+            with open(baseline_path, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            report['regressions'] = compare_to_baseline(results, baseline.get('results', {}), thresholds)
+            for regression in report['regressions']:
+                logger.error(f"📉 REGRESSION {regression['key']} {regression['metric']}: "
+                             f"{regression['baseline']} -> {regression['current']} "
+                             f"({regression['change_percent']}% worse)")
+            if not report['regressions']:
+                logger.info(f"No regressions against {baseline_path}")
+        else:
+            logger.warning(f"No baseline at {baseline_path}; run with --save-baseline to create one")
+
+        report_file = self.outputs_dir / "benchmark.json"
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Benchmark results saved to: {report_file}")
+        return not failures and not report['regressions']
+
+    def golden_test_shader(self, shader_name, frames, inputs, resolution, update=False,
+                           tolerance=DEFAULT_TOLERANCE):
+        """
+        Render frames (indices into the synthetic inputs) of one shader to
+        arrays and compare them with the golden images, or store them as the
+        golden images when update is set.
+
+        Returns:
+            True if every frame matched (or was stored).
+        """
+        processor = ShaderVideoProcessor(
+            video_path=None,
+            audio_path=None,
+            shader_path=self.shader_dir / shader_name,
+            output_path=self.outputs_dir / f"{shader_name.replace('.glsl', '')}.mp4",
+            extra_uniforms=self._get_shader_defaults(shader_name),
+            audio_settings=self._get_audio_settings(shader_name),
+            audio_analysis=inputs['audio_analysis'],
+            base_resolution=resolution
+        )
+        try:
+            processor.setup_render(max(frames) + 1)
+            passed = True
+            for frame in frames:
+                data = processor.render_frame(frame, inputs['frames'][frame])
+                width, height = processor.resolution
+                actual = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)[::-1]
+                # Shake shaders render oversized; scale back as the encoder would
+                if processor.resolution != tuple(resolution):
+                    actual = np.asarray(Image.fromarray(actual).resize(resolution, Image.LANCZOS))
+
+                if update:
+                    save_golden(actual, shader_name, frame, self.golden_dir)
+                    continue
+                result = compare_frame(actual, shader_name, frame, self.golden_dir,
+                                       self.golden_diffs_dir, tolerance)
+                if not result['passed']:
+                    passed = False
+                    logger.error(f"❌ {shader_name} frame {frame}: similarity {result['similarity']} "
+                                 f"(tolerance {tolerance})")
+            return passed
+        except Exception as e:
+            logger.error(f"❌ ERROR: {shader_name} - {str(e)}")
+            return False
+        finally:
+            if hasattr(processor, 'ctx'):
+                processor.ctx.release()
+
+    def run_golden_tests(self, times=DEFAULT_GOLDEN_TIMES, resolution=(320, 180), update=False,
+                         tolerance=DEFAULT_TOLERANCE):
+        """Check a few frames of every shader against its golden images, or store new ones"""
+        frames = sorted({int(round(t * SYNTHETIC_FRAME_RATE)) for t in times})
+        logger.info(f"\n🚀 {'UPDATING' if update else 'CHECKING'} GOLDEN FRAMES")
+        logger.info(f"{len(self.shader_config)} shaders, frames {frames} at {resolution[0]}x{resolution[1]}")
+
+        start_time = time.time()
+        # Diffs from an earlier run would look like failures of this one
+        shutil.rmtree(self.golden_diffs_dir, ignore_errors=True)
+        inputs = self._get_synthetic_inputs(resolution, max(frames) + 1)
+
+        results = {}
+        for shader_name in self.shader_config:
+            results[shader_name] = self.golden_test_shader(shader_name, frames, inputs, resolution,
+                                                           update, tolerance)
+            if results[shader_name]:
+                logger.info(f"✅ {shader_name}: {'stored' if update else 'matches'}")
+
+        if update:
+            logger.info(f"Golden images written to {self.golden_dir}")
+        elif not all(results.values()):
+            logger.info(f"Diff images for failed frames: {self.golden_diffs_dir}")
+        self._generate_summary_report(results, time.time() - start_time)
+        return results
+
+    def _write_profile(self, profiler, name):
+        """Save a test's Chrome trace and stage summary under Outputs/profiles"""
+        trace_path, summary = profiler.write(self.profiles_dir, prefix=name)
+        logger.info(f"   Profile: {trace_path}")
+        for line in format_summary(summary).splitlines():
+            logger.info(f"   {line}")
+
     def _generate_summary_report(self, results, total_duration):
         """Generate a summary report of all test results"""
         successful = [name for name, success in results.items() if success]
@@ -263,6 +736,30 @@ class ShaderTestRunner:
         
         logger.info(f"\nDetailed report saved to: {report_file}")
 
+# Runner of a run_parallel_tests() worker process
+_worker_runner = None
+
+
+def _init_test_worker(settings, log_queue):
+    """Process pool initializer for run_parallel_tests(); log records go to the parent through log_queue"""
+    global _worker_runner
+    # Importing this module configured its own handlers, shader_test_log.txt included; replace them
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    configure_worker(settings['jobs'])
+    _worker_runner = ShaderTestRunner()
+    _worker_runner.preview_frames = settings['preview_frames']
+    _worker_runner.profile = settings['profile']
+
+
+def _run_worker_test(shader_name, inputs):
+    """Test one shader in a worker process, with that process's own GL context"""
+    return _worker_runner.test_shader(shader_name, inputs)
+
+
 class TestProgressTracker:
     """Simple progress tracker for individual shader tests"""
     def __init__(self, shader_name):
@@ -283,13 +780,48 @@ def main():
     parser.add_argument('--frames', '-f', type=int, default=250, help='Number of frames to render (default: 250)')
     parser.add_argument('--list', '-l', action='store_true', help='List available shaders and exit')
     parser.add_argument('--category', '-c', type=str, help='Test only shaders from specific category')
+    parser.add_argument('--batch', '-b', action='store_true',
+                        help='Render all shaders in one pass over a single input pair (decode and analyze once)')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Run tests in N processes, decoding and analyzing each input once (default: 1)')
+    parser.add_argument('--profile', '-p', action='store_true',
+                        help='Record per-frame CPU/GPU stage timings; writes Chrome traces to Outputs/profiles')
+    parser.add_argument('--synthetic', action='store_true',
+                        help='Test with generated inputs instead of random files from Videos/')
+    parser.add_argument('--golden', '-g', action='store_true',
+                        help='Render a few frames per shader without encoding and compare them with golden images')
+    parser.add_argument('--update-golden', action='store_true',
+                        help='Store the rendered frames as the new golden images')
+    parser.add_argument('--golden-times', type=str, default=','.join(str(t) for t in DEFAULT_GOLDEN_TIMES),
+                        help=f'Seconds of the synthetic inputs to render in golden mode (default: '
+                             f'{",".join(str(t) for t in DEFAULT_GOLDEN_TIMES)})')
+    parser.add_argument('--golden-resolution', type=str, default='320x180',
+                        help='Golden frame resolution (default: 320x180)')
+    parser.add_argument('--golden-tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Minimum SSIM similarity to a golden image (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Measure render fps, GPU ms/frame, analysis and encode time; writes Outputs/benchmark.json')
+    parser.add_argument('--resolutions', type=str, default='640x360,1280x720',
+                        help='Benchmark resolutions (default: 640x360,1280x720)')
+    parser.add_argument('--frame-counts', type=str, default='120',
+                        help='Benchmark frame counts, comma separated (default: 120)')
+    parser.add_argument('--baseline', type=str, default='Outputs/benchmark_baseline.json',
+                        help='Benchmark baseline to compare against (default: Outputs/benchmark_baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Save this benchmark run as the baseline instead of comparing')
+    parser.add_argument('--thresholds', type=str, default='',
+                        help='Allowed regression in percent per metric, e.g. render_fps=10,encode_seconds=30 '
+                             f'(defaults: {DEFAULT_REGRESSION_THRESHOLDS})')
 
     args = parser.parse_args()
+    golden = args.golden or args.update_golden
 
     try:
         # Create test runner
         runner = ShaderTestRunner()
         runner.preview_frames = args.frames
+        runner.profile = args.profile
+        runner.synthetic = args.synthetic
 
         # Handle list command
         if args.list:
@@ -312,14 +844,18 @@ def main():
                 logger.info("Use --list to see available shaders")
                 return
 
-            logger.info(f"Testing single shader: {shader_name}")
-            success = runner.test_shader(shader_name)
+            if not (args.benchmark or golden):
+                logger.info(f"Testing single shader: {shader_name}")
+                success = runner.test_shader(shader_name)
 
-            if success:
-                logger.info(f"✅ Test completed successfully!")
-            else:
-                logger.error(f"❌ Test failed!")
-            return
+                if success:
+                    logger.info(f"✅ Test completed successfully!")
+                else:
+                    logger.error(f"❌ Test failed!")
+                return
+
+            # Benchmark and golden modes run below, over just this shader
+            runner.shader_config = {shader_name: runner.shader_config[shader_name]}
 
         # Handle category filter
         if args.category:
@@ -337,8 +873,24 @@ def main():
             logger.info(f"Testing {len(filtered_config)} shaders from category: {args.category}")
             runner.shader_config = filtered_config
 
+        if args.benchmark:
+            passed = runner.run_benchmarks(parse_resolutions(args.resolutions),
+                                           [int(n) for n in args.frame_counts.split(',')],
+                                           args.baseline, parse_thresholds(args.thresholds),
+                                           args.save_baseline)
+            sys.exit(0 if passed else 1)
+
         # Run all tests
-        results = runner.run_all_tests()
+        if golden:
+            results = runner.run_golden_tests([float(t) for t in args.golden_times.split(',')],
+                                              parse_resolutions(args.golden_resolution)[0],
+                                              args.update_golden, args.golden_tolerance)
+        elif args.batch:
+            results = runner.run_batch_tests()
+        elif args.jobs > 1:
+            results = runner.run_parallel_tests(args.jobs)
+        else:
+            results = runner.run_all_tests()
 
         # Exit with appropriate code
         failed_count = sum(1 for success in results.values() if not success)
@@ -0,0 +1,266 @@
+# shader_validation.py
+"""
+Compile-check the shader library ahead of any render.
+
+Every .glsl in Shaders/ is compiled, together with the buffer passes its
+config declares, in worker processes on headless GL contexts. The results
+form the shader index: whether each shader compiles, the error if not, the
+compile time and the active uniforms and samplers. The server builds the
+index at startup, so broken shaders are left out of /shaders/list and
+rejected by /process instead of failing inside a render. Entries are
+cached by source hash and GL renderer, so a restart only recompiles
+shaders that changed, and a different driver recompiles everything.
+With Mesa's on-disk shader cache enabled, the startup compile also warms
+it for the render workers.
+
+Check the library from the command line with:
+
+    python shader_validation.py [--workers N] [--json]
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import gl_backend
+from buffer_passes import BUFFER_SHADER_DIR, read_shader_source
+from gl_backend import configure_worker, create_context
+
+logger = logging.getLogger(__name__)
+
+# GL_SAMPLER_1D, _2D, _3D, _CUBE and _2D_ARRAY
+SAMPLER_GL_TYPES = {0x8B5D, 0x8B5E, 0x8B5F, 0x8B60, 0x8DC1}
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+# Size of the frame drawn with each compiled shader
+PROBE_SIZE = (16, 16)
+
+# GL context, quad and framebuffer of a validation worker process
+_worker_ctx = None
+_worker_vbo = None
+_worker_fbo = None
+
+
+def shader_sources(shader_dir, shader_name, shader_config):
+    """
+    Source of a shader's image pass and of its buffer passes.
+
+    Returns:
+        Dict of pass name ("image", "BufferA", ...) -> GLSL source.
+
+    Raises:
+        OSError: if a source can't be read.
+    """
+    sources = {"image": read_shader_source(Path(shader_dir) / shader_name)}
+    for name, buffer in sorted(shader_config.get('buffers', {}).items()):
+        sources[name] = read_shader_source(Path(shader_dir) / BUFFER_SHADER_DIR.name / buffer['shader'])
+    return sources
+
+
+def cache_key(sources, renderer):
+    """Key of a validation result: it depends on the driver as much as on the sources"""
+    digest = hashlib.sha256(renderer.encode())
+    for name, source in sorted(sources.items()):
+        digest.update(name.encode())
+        digest.update(source.encode())
+    return digest.hexdigest()
+
+
+def _init_validation_worker(workers):
+    """Process pool initializer: one headless context per worker"""
+    global _worker_ctx, _worker_vbo, _worker_fbo
+    import numpy as np
+    logging.basicConfig(level=logging.INFO)
+    configure_worker(workers)
+    _worker_ctx = create_context()
+    _worker_vbo = _worker_ctx.buffer(np.array([-1.0, -1.0, 1.0, -1.0, -1.0, 1.0,
+                                               -1.0, 1.0, 1.0, -1.0, 1.0, 1.0], dtype='f4'))
+    _worker_fbo = _worker_ctx.simple_framebuffer(PROBE_SIZE)
+
+
+def _worker_renderer():
+    """GL_RENDERER of this worker's context"""
+    return gl_backend.renderer()
+
+
+def _compile_shader(sources):
+    """
+    Compile every pass of one shader in this worker; returns the index fields.
+
+    Each pass also draws one small frame: drivers like llvmpipe only
+    generate code on first use, so this is what compile_ms measures.
+    """
+    from shader_video_processor import QUAD_VERTEX_SHADER
+
+    start = time.perf_counter()
+    passes = {}
+    try:
+        for name, source in sources.items():
+            # Released whatever fails: the worker validates many shaders on one context
+            program = vao = None
+            try:
+                program = _worker_ctx.program(vertex_shader=QUAD_VERTEX_SHADER, fragment_shader=source)
+                uniforms = {member: program[member].fmt for member in program
+                            if hasattr(program[member], 'fmt') and program[member].fmt is not None}
+                samplers = sorted(member for member in uniforms if program[member].gl_type in SAMPLER_GL_TYPES)
+                vao = _worker_ctx.simple_vertex_array(program, _worker_vbo, 'in_vert')
+                _worker_fbo.use()
+                vao.render()
+                _worker_ctx.finish()
+            finally:
+                if vao is not None:
+                    vao.release()
+                if program is not None:
+                    program.release()
+            passes[name] = {"uniforms": {member: fmt for member, fmt in sorted(uniforms.items())
+                                         if member not in samplers},
+                            "samplers": samplers}
+        error = None
+    except Exception as e:
+        error = f"{name}: {str(e).strip()}"
+
+    image = passes.get("image", {})
+    return {
+        "ok": error is None,
+        "error": error,
+        "compile_ms": round((time.perf_counter() - start) * 1000, 1),
+        "uniforms": image.get("uniforms", {}),
+        "samplers": image.get("samplers", []),
+        "buffers": {name: fields for name, fields in passes.items() if name != "image"},
+    }
+
+
+class ShaderIndex:
+    def __init__(self, shader_dir, cache_path=None, workers=DEFAULT_WORKERS):
+        """
+        Args:
+            shader_dir: Directory with the .glsl files (and buffers/)
+            cache_path: Optional JSON file keeping entries between runs
+            workers: Number of compile processes
+        """
+        self.shader_dir = Path(shader_dir)
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.workers = workers
+        self.entries = {}
+        self.ready = threading.Event()
+
+    def _load_cache(self):
+        if self.cache_path is None or not self.cache_path.exists():
+            return {}
+        try:
+            return json.loads(self.cache_path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable shader index cache {self.cache_path}: {e}")
+            return {}
+
+    def _save_cache(self, cache):
+        if self.cache_path is None:
+            return
+        try:
+            tmp_path = self.cache_path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(cache))
+            tmp_path.replace(self.cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to write shader index cache: {e}")
+
+    def build(self, shader_config):
+        """
+        Validate every shader in shader_dir, compiling only those not in the cache.
+
+        Returns:
+            Dict of shader name -> index entry.
+
+        Raises:
+            BrokenProcessPool: if the workers can't create a GL context.
+        """
+        start = time.perf_counter()
+        cached = self._load_cache()
+        entries, hits = {}, 0
+
+        # Spawn rather than fork: GL contexts don't survive fork
+        mp_context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=mp_context,
+                                 initializer=_init_validation_worker, initargs=(self.workers,)) as pool:
+            renderer = pool.submit(_worker_renderer).result()
+
+            pending = {}
+            for path in sorted(self.shader_dir.glob("*.glsl")):
+                try:
+                    sources = shader_sources(self.shader_dir, path.name, shader_config.get(path.name, {}))
+                except OSError as e:
+                    entries[path.name] = {"ok": False, "error": f"Can't read shader: {e}", "compile_ms": 0.0,
+                                          "uniforms": {}, "samplers": [], "buffers": {},
+                                          "renderer": renderer, "sha256": None}
+                    continue
+                key = cache_key(sources, renderer)
+                if key in cached:
+                    entries[path.name] = {**cached[key], "renderer": renderer, "sha256": key}
+                    hits += 1
+                else:
+                    pending[path.name] = (key, pool.submit(_compile_shader, sources))
+
+            for name, (key, future) in pending.items():
+                entries[name] = {**future.result(), "renderer": renderer, "sha256": key}
+
+        self._save_cache({entry["sha256"]: {field: value for field, value in entry.items()
+                                            if field not in ("renderer", "sha256")}
+                          for entry in entries.values() if entry["sha256"]})
+        self.entries = dict(sorted(entries.items()))
+        self.ready.set()
+
+        broken = [name for name, entry in self.entries.items() if not entry["ok"]]
+        logger.info(f"Validated {len(self.entries)} shaders on {renderer} in {time.perf_counter() - start:.1f}s "
+                    f"({len(pending)} compiled, {hits} cached)")
+        for name in broken:
+            logger.error(f"Broken shader {name}: {self.entries[name]['error']}")
+        return self.entries
+
+    def error(self, shader_name):
+        """Why a shader can't be rendered, or None if it compiled or hasn't been validated"""
+        entry = self.entries.get(shader_name)
+        if entry is None or entry["ok"]:
+            return None
+        return entry["error"]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compile every shader in Shaders/ and report broken ones')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                        help=f'Compile processes (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--json', action='store_true', help='Print the shader index as JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    shader_dir = Path("Shaders")
+    config_file = shader_dir / "shader_config.json"
+    shader_config = json.loads(config_file.read_text(encoding='utf-8')) if config_file.exists() else {}
+
+    try:
+        entries = ShaderIndex(shader_dir, workers=args.workers).build(shader_config)
+    except Exception as e:
+        print(f"❌ Could not validate shaders: {e}")
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(entries, indent=2))
+    else:
+        for name, entry in entries.items():
+            status = "✅" if entry["ok"] else "❌"
+            print(f"{status} {name:<32} {entry['compile_ms']:>8.1f} ms  "
+                  f"{len(entry['uniforms'])} uniforms, {len(entry['samplers'])} samplers")
+            if entry["error"]:
+                print(f"   {entry['error']}")
+    sys.exit(0 if all(entry["ok"] for entry in entries.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,43 +2,107 @@
 import librosa
 import numpy as np
 from pathlib import Path
-import moderngl
 from PIL import Image
 import tempfile
 import subprocess
 import shutil
 import logging
 import json
+import contextlib
+import time
 from scipy.interpolate import interp1d
+from audio_analysis import (AUDIO_FEATURE_NAMES, analyze_audio, apply_audio_settings, compute_fft_rows,
+                            resample_features, match_video_length)
+from video_encoder import FfmpegPipeEncoder
+from gl_backend import create_context
+from buffer_passes import VIDEO_CHANNEL, create_buffer_passes, read_shader_source
+from metrics import FRAMES_RENDERED, ffmpeg_process, set_texture_bytes
+from render_profiler import record_stage, timed_stage
 
 logger = logging.getLogger(__name__)
 
+# Full-screen quad; fragment shaders get v_text in 0..1
+QUAD_VERTEX_SHADER = """#version 330
+in vec2 in_vert;
+out vec2 v_text;
+void main() {
+    v_text = in_vert * 0.5 + 0.5;
+    gl_Position = vec4(in_vert, 0.0, 1.0);
+}"""
+
+# Bytes per component of moderngl texture dtypes
+TEXTURE_DTYPE_BYTES = {'f1': 1, 'u1': 1, 'i1': 1, 'f2': 2, 'u2': 2, 'i2': 2, 'f4': 4, 'u4': 4, 'i4': 4}
+
+
+def texture_size(texture):
+    """Bytes of GL memory a moderngl texture holds"""
+    return texture.width * texture.height * texture.components * TEXTURE_DTYPE_BYTES.get(texture.dtype, 1)
+
+
 class ShaderVideoProcessor:
     def __init__(self, video_path, audio_path, shader_path, output_path,
                  extra_uniforms={}, progress_tracker=None, audio_settings=None,
-                 max_frames=None):
+                 max_frames=None, audio_analysis=None, texture_overrides=None,
+                 work_dir=None, output_mode="frames", base_resolution=(1280, 720), frame_rate=30,
+                 encoder_preset=None, crf=18, job_control=None, profiler=None, frames_dir=None,
+                 frames=None):
         """
         Initialize the shader video processor.
 
         Args:
-            video_path: Path to input video file
-            audio_path: Path to main audio file
+            video_path: Path to input video file (None when frames are given)
+            audio_path: Path to main audio file, or None for a silent output
+                        analysed from audio_analysis
             shader_path: Path to GLSL shader file
             output_path: Path for output video
             extra_uniforms: Dict of uniform name -> value for shader
             progress_tracker: Optional progress tracker for real-time updates
             audio_settings: Dict with audio reactivity settings
             max_frames: Optional limit on number of frames to process (for preview mode)
+            audio_analysis: Optional stored analysis from AudioAnalysisStore.load()
+            texture_overrides: Optional dict of channel -> texture path replacing configured textures
+            work_dir: Optional directory for intermediate frames (defaults to the system temp dir)
+            output_mode: "frames" to write PNGs and encode at the end, or a
+                         video_encoder.OUTPUT_MODES value to pipe rendered frames
+                         to ffmpeg as they are produced
+            base_resolution: Output (width, height); lower for fast proxy previews
+            frame_rate: Output frames per second
+            encoder_preset: Optional x264 preset (e.g. "ultrafast" for previews)
+            crf: x264 quality (lower is better)
+            job_control: Optional job_control.JobControl checked between frames
+                         so the job can be paused or cancelled
+            profiler: Optional render_profiler.RenderProfiler recording
+                      per-frame CPU and GPU timings
+            frames_dir: Optional directory of frames already extracted at this
+                        processor's resolution (see extract_frames()), shared by
+                        several renders of one input; used instead of decoding
+                        the video and left in place
+            frames: Optional sequence of input frames as RGB PIL images
+                    (e.g. synthetic_inputs.SyntheticVideo), used instead of
+                    decoding video_path
         """
-        self.video_path = Path(video_path)
-        self.audio_path = Path(audio_path)
+        self.video_path = Path(video_path) if video_path is not None else None
+        self.audio_path = Path(audio_path) if audio_path is not None else None
         self.shader_path = Path(shader_path)
         self.output_path = Path(output_path)
         self.extra_uniforms = extra_uniforms
         self.progress_tracker = progress_tracker
         self.max_frames = max_frames  # For preview mode
-        self.base_resolution = (1280, 720)
-        self.frame_rate = 30
+        self.audio_analysis = audio_analysis
+        self.work_dir = work_dir
+        self.output_mode = output_mode
+        self.encoder = None
+        self.prog = None  # Set by compile_programs()
+        self.base_resolution = tuple(base_resolution)
+        self.frame_rate = frame_rate
+        self.encoder_preset = encoder_preset
+        self.crf = crf
+        self.job_control = job_control
+        self.profiler = profiler
+        self.frames_dir = Path(frames_dir) if frames_dir is not None else None
+        self.frames = frames
+        # Pixel-sized uniforms are authored for 720p output
+        self.resolution_scale = self.base_resolution[1] / 720
 
         # Screen shake settings for EasyBeats shader (define first)
         self.enable_screen_shake = True
@@ -55,6 +119,10 @@ class ShaderVideoProcessor:
 
         # Load shader configuration for texture support
         self.shader_config = self._load_shader_config()
+        # Uploaded textures replace the configured ones channel by channel
+        if texture_overrides:
+            textures = {**self.shader_config.get('textures', {}), **texture_overrides}
+            self.shader_config = {**self.shader_config, 'textures': textures}
 
         # Initialize texture cache for static textures
         self.texture_cache = {}
@@ -88,6 +156,29 @@ class ShaderVideoProcessor:
             logger.warning(f"Failed to load shader configuration: {e}")
         return {}
 
+    def _audio_duration(self):
+        """Seconds of audio a preview needs, or None to analyze the whole track"""
+        if self.max_frames:
+            return self.max_frames / self.frame_rate + 1.0
+        return None
+
+    def _run_ffmpeg(self, cmd):
+        """Run an ffmpeg command, killing it if the job gets cancelled"""
+        with ffmpeg_process("ffmpeg"):
+            if self.job_control:
+                return self.job_control.run_subprocess(cmd)
+            return subprocess.run(cmd, capture_output=True, text=True, check=True)
+
+    def _timed(self, stage, frame=None):
+        """Time a pipeline stage for /metrics and, when profiling, the job's trace"""
+        return timed_stage(self.profiler, stage, self.shader_path.name, frame)
+
+    def _gpu_timed(self, stage, frame):
+        """Measure the GL work of a stage with a timer query when profiling"""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.gpu(self.ctx, stage, self.shader_path.name, frame)
+
     def _check_if_shake_shader(self):
         """Check if the current shader needs oversized rendering for screen shake"""
         shader_name = self.shader_path.name
@@ -97,174 +188,44 @@ class ShaderVideoProcessor:
     def _init_opengl_context(self):
         """Initialize OpenGL context"""
         try:
-            self.ctx = moderngl.create_standalone_context()
+            self.ctx = create_context()
             logger.info("Created OpenGL context successfully")
         except Exception as e:
             logger.error(f"Failed to create OpenGL context: {e}")
             raise
 
-    def get_advanced_audio_analysis(self, audio_file, total_frames):
-        """Extract comprehensive audio features for each frame"""
-        try:
-            logger.info(f"Performing advanced audio analysis: {audio_file}")
-            y, sr = librosa.load(str(audio_file), sr=None)
-
-            # Calculate hop length to match video frame rate
-            hop_length = int(sr / self.frame_rate)
-
-            # 1. FREQUENCY BAND SEPARATION
-            # Define frequency bands (in Hz)
-            bass_freq = (20, 250)      # Bass frequencies
-            mid_freq = (250, 4000)     # Mid frequencies
-            treble_freq = (4000, sr//2) # Treble frequencies (up to Nyquist)
-
-            # Create bandpass filters for each frequency range
-            def extract_frequency_band(audio, sr, freq_range, hop_length):
-                # Use librosa's bandpass filter
-                filtered = librosa.effects.preemphasis(audio)
-
-                # Get spectral centroid and RMS for the band
-                stft = librosa.stft(filtered, hop_length=hop_length)
-                freqs = librosa.fft_frequencies(sr=sr)
-
-                # Find frequency bin indices for our band
-                freq_mask = (freqs >= freq_range[0]) & (freqs <= freq_range[1])
-
-                # Extract energy in this frequency band
-                band_stft = stft[freq_mask, :]
-                band_energy = np.mean(np.abs(band_stft) ** 2, axis=0)
-
-                return band_energy
-
-            # Extract frequency bands
-            bass_energy = extract_frequency_band(y, sr, bass_freq, hop_length)
-            mid_energy = extract_frequency_band(y, sr, mid_freq, hop_length)
-            treble_energy = extract_frequency_band(y, sr, treble_freq, hop_length)
-
-            # 2. BEAT DETECTION
-            # Use onset detection for beat/kick detection
-            onset_frames = librosa.onset.onset_detect(
-                y=y, sr=sr, hop_length=hop_length,
-                units='frames', backtrack=True
-            )
-
-            # Create beat strength array
-            beat_strength = np.zeros(len(bass_energy))
-            for onset_frame in onset_frames:
-                if onset_frame < len(beat_strength):
-                    # Create beat pulse with decay
-                    for i in range(min(10, len(beat_strength) - onset_frame)):
-                        decay = np.exp(-i * 0.3)  # Exponential decay
-                        beat_strength[onset_frame + i] = max(
-                            beat_strength[onset_frame + i],
-                            decay
-                        )
+    @staticmethod
+    def used_audio_features(programs):
+        """
+        Audio feature uniforms active in any of programs. The GLSL compiler
+        drops uniforms a shader never reads, so declared but unused features
+        don't count.
+        """
+        return {name for name in AUDIO_FEATURE_NAMES for program in programs if name in program}
 
-            # 3. ENHANCED BEAT DETECTION FOR LOW FREQUENCIES
-            # Focus on bass frequencies for kick detection
-            bass_onset_frames = librosa.onset.onset_detect(
-                y=librosa.effects.preemphasis(y), sr=sr,
-                hop_length=hop_length, units='frames',
-                pre_max=3, post_max=3, pre_avg=3, post_avg=5, delta=0.1, wait=10
-            )
+    def get_advanced_audio_analysis(self, audio_file, total_frames, feature_names=None):
+        """
+        Extract comprehensive audio features for each frame; feature_names
+        optionally limits a fresh analysis to some of AUDIO_FEATURE_NAMES
+        """
+        try:
+            if self.audio_analysis is not None:
+                # Reuse a stored analysis (see /audio/analyze) instead of re-analyzing
+                logger.info("Using precomputed audio analysis")
+                features = resample_features(self.audio_analysis['features'],
+                                             self.audio_analysis['frame_rate'], self.frame_rate)
+            else:
+                features, _ = analyze_audio(audio_file, self.frame_rate, duration=self._audio_duration(),
+                                            features=feature_names)
 
-            kick_strength = np.zeros(len(bass_energy))
-            for kick_frame in bass_onset_frames:
-                if kick_frame < len(kick_strength):
-                    # Stronger, shorter kick pulses
-                    for i in range(min(5, len(kick_strength) - kick_frame)):
-                        decay = np.exp(-i * 0.5)  # Faster decay for kicks
-                        kick_strength[kick_frame + i] = max(
-                            kick_strength[kick_frame + i],
-                            decay
-                        )
+            # Apply user audio reactivity settings, then pad or trim to match video length
+            features = apply_audio_settings(features, self.audio_settings)
+            audio_features = {name: match_video_length(features[name], total_frames)
+                              for name in AUDIO_FEATURE_NAMES}
 
-            # 4. NORMALIZE ALL FEATURES
-            def safe_normalize(arr):
-                if arr.max() > arr.min():
-                    return np.interp(arr, (arr.min(), arr.max()), (0, 1))
-                else:
-                    return np.zeros_like(arr)
-
-            bass_levels = safe_normalize(bass_energy)
-            mid_levels = safe_normalize(mid_energy)
-            treble_levels = safe_normalize(treble_energy)
-            beat_levels = safe_normalize(beat_strength)
-            kick_levels = safe_normalize(kick_strength)
-
-            # 5. APPLY USER AUDIO REACTIVITY SETTINGS
-            # Scale audio levels based on user preferences
-            bass_response = self.audio_settings.get('bass_response', 1.0)
-            mid_response = self.audio_settings.get('mid_response', 1.0)
-            treble_response = self.audio_settings.get('treble_response', 1.0)
-            beat_sensitivity = self.audio_settings.get('beat_sensitivity', 1.0)
-
-            # Apply scaling (clamp to reasonable ranges)
-            bass_levels = np.clip(bass_levels * bass_response, 0, 2.0)
-            mid_levels = np.clip(mid_levels * mid_response, 0, 2.0)
-            treble_levels = np.clip(treble_levels * treble_response, 0, 2.0)
-            beat_levels = np.clip(beat_levels * beat_sensitivity, 0, 2.0)
-            kick_levels = np.clip(kick_levels * beat_sensitivity, 0, 2.0)
-
-            # 6. ADDITIONAL SPECTRAL FEATURES
-            # Spectral centroid (brightness)
-            spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr, hop_length=hop_length)[0]
-            brightness_levels = safe_normalize(spectral_centroids)
-
-            # Spectral rolloff (energy distribution)
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr, hop_length=hop_length)[0]
-            energy_levels = safe_normalize(spectral_rolloff)
-
-            # Zero crossing rate (percussiveness)
-            zcr = librosa.feature.zero_crossing_rate(y, hop_length=hop_length)[0]
-            percussive_levels = safe_normalize(zcr)
-
-            # 7. OVERALL RMS FOR COMPATIBILITY
-            rms = librosa.feature.rms(y=y, hop_length=hop_length)[0]
-            rms_levels = safe_normalize(rms)
-
-            # 8. ENHANCED BEAT FEATURES
-            # Tempo and beat tracking
-            tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr, hop_length=hop_length, units='frames')
-
-            # Create tempo-synced beat array
-            tempo_beats = np.zeros(len(bass_energy))
-            for beat_frame in beat_frames:
-                if beat_frame < len(tempo_beats):
-                    # Create beat pulse with decay
-                    for i in range(min(8, len(tempo_beats) - beat_frame)):
-                        decay = np.exp(-i * 0.4)
-                        tempo_beats[beat_frame + i] = max(tempo_beats[beat_frame + i], decay)
-
-            tempo_beat_levels = safe_normalize(tempo_beats)
-
-            # 9. PAD OR TRIM TO MATCH VIDEO LENGTH
-            def match_video_length(arr, target_frames):
-                if len(arr) < target_frames:
-                    return np.pad(arr, (0, target_frames - len(arr)), constant_values=0)
-                elif len(arr) > target_frames:
-                    return arr[:target_frames]
-                return arr
-
-            audio_features = {
-                'bassLevel': match_video_length(bass_levels, total_frames),
-                'midLevel': match_video_length(mid_levels, total_frames),
-                'trebleLevel': match_video_length(treble_levels, total_frames),
-                'beatLevel': match_video_length(beat_levels, total_frames),
-                'kickLevel': match_video_length(kick_levels, total_frames),
-                'rmsLevel': match_video_length(rms_levels, total_frames),
-                'brightnessLevel': match_video_length(brightness_levels, total_frames),
-                'energyLevel': match_video_length(energy_levels, total_frames),
-                'percussiveLevel': match_video_length(percussive_levels, total_frames),
-                'tempoBeatLevel': match_video_length(tempo_beat_levels, total_frames),
-            }
-
-            logger.info(f"Extracted advanced audio features: {list(audio_features.keys())}")
-            logger.info(f"Bass range: {float(bass_levels.min()):.3f} - {float(bass_levels.max()):.3f}")
-            logger.info(f"Mid range: {float(mid_levels.min()):.3f} - {float(mid_levels.max()):.3f}")
-            logger.info(f"Treble range: {float(treble_levels.min()):.3f} - {float(treble_levels.max()):.3f}")
-            logger.info(f"Detected {len(onset_frames)} beats, {len(bass_onset_frames)} kicks")
-            logger.info(f"Estimated tempo: {float(tempo):.1f} BPM, {len(beat_frames)} tempo beats")
+            logger.info(f"Bass range: {float(audio_features['bassLevel'].min()):.3f} - {float(audio_features['bassLevel'].max()):.3f}")
+            logger.info(f"Mid range: {float(audio_features['midLevel'].min()):.3f} - {float(audio_features['midLevel'].max()):.3f}")
+            logger.info(f"Treble range: {float(audio_features['trebleLevel'].min()):.3f} - {float(audio_features['trebleLevel'].max()):.3f}")
             logger.info(f"Audio reactivity settings: {self.audio_settings}")
 
             return audio_features
@@ -275,7 +236,7 @@ class ShaderVideoProcessor:
 
             # Try basic RMS analysis as fallback
             try:
-                y, sr = librosa.load(str(audio_file), sr=None)
+                y, sr = librosa.load(str(audio_file), sr=None, duration=self._audio_duration())
                 hop_length = int(sr / self.frame_rate)
                 rms = librosa.feature.rms(y=y, hop_length=hop_length)[0]
 
@@ -322,9 +283,10 @@ class ShaderVideoProcessor:
                     'tempoBeatLevel': np.zeros(total_frames),
                 }
 
-    def extract_frames(self):
-        """Extract frames from input video using FFmpeg"""
-        temp_dir = Path(tempfile.mkdtemp(prefix="disco_frames_"))
+    def extract_frames(self, resolution=None):
+        """Extract frames from input video using FFmpeg, at the render resolution unless given"""
+        resolution = resolution or self.resolution
+        temp_dir = Path(tempfile.mkdtemp(prefix="disco_frames_", dir=self.work_dir))
         output_pattern = temp_dir / "frame_%05d.png"
 
         try:
@@ -332,7 +294,7 @@ class ShaderVideoProcessor:
 
             cmd = [
                 "ffmpeg", "-y", "-i", str(self.video_path),
-                "-vf", f"scale={self.resolution[0]}:{self.resolution[1]}",
+                "-vf", f"scale={resolution[0]}:{resolution[1]}",
                 "-r", str(self.frame_rate),  # Set output frame rate
             ]
 
@@ -342,8 +304,9 @@ class ShaderVideoProcessor:
                 logger.info(f"Preview mode: limiting to {self.max_frames} frames")
 
             cmd.append(str(output_pattern))
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+
+            with self._timed("decode"):
+                result = self._run_ffmpeg(cmd)
             
             frames = sorted(temp_dir.glob("frame_*.png"))
             logger.info(f"Extracted {len(frames)} frames")
@@ -359,224 +322,37 @@ class ShaderVideoProcessor:
 
     def render_frames(self, input_frames):
         """Render frames with shader effects and audio-reactive features"""
-        temp_out = Path(tempfile.mkdtemp(prefix="disco_render_"))
+        temp_out = Path(tempfile.mkdtemp(prefix="disco_render_", dir=self.work_dir))
 
         try:
-            # Initialize OpenGL context if not already done
-            if not hasattr(self, 'ctx'):
-                self._init_opengl_context()
-
-            logger.info(f"Loading shader: {self.shader_path}")
-            shader_code = self.shader_path.read_text()
-
-            # Perform advanced audio analysis only if shader is audio-reactive
             total_frames = len(input_frames)
-            is_audio_reactive = self.shader_config.get('audioReactive', True)  # Default to True for backward compatibility
-
-            if is_audio_reactive:
-                logger.info("Performing advanced audio analysis for audio-reactive shader...")
-                if self.progress_tracker:
-                    self.progress_tracker.update(
-                        progress=20, stage="analyzing",
-                        message="Analyzing audio frequencies...",
-                        details="Extracting bass, mid, treble, and beat information"
-                    )
-                audio_features = self.get_advanced_audio_analysis(self.audio_path, total_frames)
-            else:
-                logger.info("Skipping audio analysis for non-audio-reactive shader")
-                if self.progress_tracker:
-                    self.progress_tracker.update(
-                        progress=20, stage="analyzing",
-                        message="Skipping audio analysis...",
-                        details="Shader is not audio-reactive"
-                    )
-                # Create minimal audio features for non-reactive shaders
-                audio_features = {
-                    'bassLevel': np.zeros(total_frames),
-                    'midLevel': np.zeros(total_frames),
-                    'trebleLevel': np.zeros(total_frames),
-                    'beatLevel': np.zeros(total_frames),
-                    'kickLevel': np.zeros(total_frames),
-                    'rmsLevel': np.zeros(total_frames),
-                    'brightnessLevel': np.zeros(total_frames),
-                    'energyLevel': np.zeros(total_frames),
-                    'percussiveLevel': np.zeros(total_frames),
-                    'tempoBeatLevel': np.zeros(total_frames),
-                }
-
-            # Create shader program
-            vertex_shader = """#version 330
-in vec2 in_vert;
-out vec2 v_text;
-void main() {
-    v_text = in_vert * 0.5 + 0.5;
-    gl_Position = vec4(in_vert, 0.0, 1.0);
-}"""
-
-            try:
-                prog = self.ctx.program(
-                    vertex_shader=vertex_shader,
-                    fragment_shader=shader_code
-                )
-                logger.info("Shader compiled successfully")
-            except Exception as e:
-                logger.error(f"Shader compilation error: {e}")
-                raise
-
-            # Create vertex buffer for full-screen quad
-            vbo = self.ctx.buffer(np.array([
-                -1.0, -1.0,
-                 1.0, -1.0,
-                -1.0,  1.0,
-                -1.0,  1.0,
-                 1.0, -1.0,
-                 1.0,  1.0,
-            ], dtype='f4'))
-
-            vao = self.ctx.simple_vertex_array(prog, vbo, 'in_vert')
-            fbo = self.ctx.simple_framebuffer(self.resolution)
-            fbo.use()
-
-            # Check if shader needs audio texture instead of video texture
-            needs_audio_texture = self.shader_config.get('needsAudioTexture', False)
-
-            # Create audio texture if needed
-            audio_texture = None
-            fft_data = None
-            if needs_audio_texture:
-                # For RayBalls5, get real FFT data
-                if 'RayBalls5' in str(self.shader_path):
-                    logger.info(f"Creating real FFT data for {self.shader_path.name}")
-                    fft_data = self.get_real_fft_audio_analysis(self.audio_path, total_frames)
-                elif audio_features:
-                    audio_texture = self._create_audio_texture(audio_features, total_frames)
+            self.setup_render(total_frames)
 
             # Render each frame with audio-reactive features
             for i, frame_path in enumerate(input_frames):
+                # Frame boundary: the job may be paused here or cancelled
+                if self.job_control:
+                    self.job_control.checkpoint(i)
+
                 try:
                     # Load user input video frame
-                    img = Image.open(frame_path).convert("RGB")
-
-                    # Special handling for shaders that use different video channels
-                    if 'VagasDome' in str(self.shader_path):
-                        # VagasDome: user video goes to iChannel2 (Y-flipped)
-                        img_flipped = img.transpose(Image.FLIP_TOP_BOTTOM)
-                        user_video_tex = self.ctx.texture(self.resolution, 3, img_flipped.tobytes())
-                        user_video_tex.use(2)
-                        texture_units = {2: user_video_tex}
-                        if i == 0:
-                            logger.info(f"VagasDome: User input video (Y-flipped) assigned to iChannel2 ({img.size})")
-                    elif 'TVZoom' in str(self.shader_path):
-                        # TVZoom: user video goes to iChannel2 (no flip)
-                        user_video_tex = self.ctx.texture(self.resolution, 3, img.tobytes())
-                        user_video_tex.use(2)
-                        texture_units = {2: user_video_tex}
-                        if i == 0:
-                            logger.info(f"TVZoom: User input video assigned to iChannel2 ({img.size})")
-                    else:
-                        # For other shaders: user video goes to iChannel0 as usual (no flip)
-                        user_video_tex = self.ctx.texture(self.resolution, 3, img.tobytes())
-                        user_video_tex.use(0)
-                        texture_units = {0: user_video_tex}
-                        if i == 0:
-                            logger.info(f"Texture assignment for {self.shader_path.name}: iChannel0 = video ({img.size})")
-
-                    # Add audio texture to iChannel1 if needed
-                    if needs_audio_texture:
-                        if fft_data is not None:
-                            # For RayBalls5 shader: FFT data goes to iChannel1
-                            audio_tex = self._create_fft_texture(fft_data, i)
-                            audio_tex.use(1)
-                            texture_units[1] = audio_tex  # iChannel1 is FFT audio data
-                            if i == 0:  # Log on first frame
-                                logger.info(f"Texture assignment: iChannel1 = FFT audio data ({fft_data.shape[0]}x1)")
-                        elif audio_texture:
-                            # For other audio shaders: simplified audio data in iChannel1
-                            audio_data = self._get_audio_frame_data(audio_features, i)
-                            audio_tex = self._create_frame_audio_texture(audio_data)
-                            audio_tex.use(1)
-                            texture_units[1] = audio_tex  # iChannel1 is audio data
-                            logger.debug(f"Frame {i}: Video in iChannel0, simple audio in iChannel1")
-
-                    # Load additional textures if specified in shader config (with caching)
-                    if hasattr(self, 'shader_config') and 'textures' in self.shader_config:
-                        for channel, filename in self.shader_config['textures'].items():
-                            channel_num = int(channel.replace('iChannel', ''))
-
-                            # Special handling for VagasDome ping-pong video
-                            if 'VagasDome' in str(self.shader_path) and channel == 'iChannel0':
-                                # Load ping-pong video texture
-                                video_tex = self._load_pingpong_video_texture(filename, i)
-                                if video_tex:
-                                    video_tex.use(channel_num)
-                                    texture_units[channel_num] = video_tex
-                                    if i == 0:
-                                        logger.info(f"Loaded ping-pong video texture {filename} for {channel}")
-                            elif channel != 'iChannel0' or 'VagasDome' not in str(self.shader_path):
-                                # Regular texture loading for non-video channels or non-VagasDome shaders
-                                texture_path = Path("Textures") / filename
-
-                                # Check cache first
-                                cache_key = f"{channel}_{filename}"
-                                if cache_key in self.texture_cache:
-                                    tex_obj = self.texture_cache[cache_key]
-                                    tex_obj.use(channel_num)
-                                    texture_units[channel_num] = tex_obj
-                                elif texture_path.exists():
-                                    try:
-                                        tex_img = Image.open(texture_path).convert("RGB")
-                                        tex_obj = self.ctx.texture(tex_img.size, 3, tex_img.tobytes())
-                                        tex_obj.use(channel_num)
-                                        texture_units[channel_num] = tex_obj
-                                        # Cache the texture for future frames
-                                        self.texture_cache[cache_key] = tex_obj
-                                        logger.info(f"Loaded and cached texture {filename} for {channel}")
-                                    except Exception as e:
-                                        logger.warning(f"Failed to load texture {filename}: {e}")
-                                else:
-                                    logger.warning(f"Texture file not found: {texture_path}")
-
-
-
-
-
-                    # Set standard uniforms
-                    if 'iResolution' in prog:
-                        prog['iResolution'].value = tuple(self.resolution)
-                    if 'iTime' in prog:
-                        prog['iTime'].value = i / self.frame_rate
-
-                    # Set texture channel uniforms
-                    for channel_num in texture_units.keys():
-                        channel_name = f'iChannel{channel_num}'
-                        if channel_name in prog:
-                            prog[channel_name].value = channel_num
-
-                    # Set audio-reactive uniforms (automatically provide audio data)
-                    for audio_name, audio_data in audio_features.items():
-                        if audio_name in prog and i < len(audio_data):
-                            prog[audio_name].value = float(audio_data[i])
-
-                    # Set extra uniforms from config (these can override audio uniforms)
-                    for name, val in self.extra_uniforms.items():
-                        if name in prog:
-                            if isinstance(val, (list, tuple)):
-                                prog[name].value = tuple(val)
-                            else:
-                                prog[name].value = float(val)
-
-                    # Render the frame
-                    vao.render()
-
-                    # Read back the rendered frame
-                    data = fbo.read(components=3)
-                    rendered_img = Image.frombytes('RGB', self.resolution, data)
-                    # Flip vertically because OpenGL has origin at bottom-left
-                    rendered_img = rendered_img.transpose(Image.FLIP_TOP_BOTTOM)
-                    rendered_img.save(temp_out / f"frame_{i:05d}.png")
+                    with self._timed("frame_load", i):
+                        img = self._load_frame(frame_path)
+                    data = self.render_frame(i, img)
+
+                    with self._timed("encode", i):
+                        if self.encoder is not None:
+                            # The encoder flips and scales on its side
+                            self.encoder.write(data)
+                        else:
+                            rendered_img = Image.frombytes('RGB', self.resolution, data)
+                            # Flip vertically because OpenGL has origin at bottom-left
+                            rendered_img = rendered_img.transpose(Image.FLIP_TOP_BOTTOM)
+                            rendered_img.save(temp_out / f"frame_{i:05d}.png")
+                    FRAMES_RENDERED.inc(shader=self.shader_path.name)
 
                     # Update progress tracker
-                    if self.progress_tracker and i % 10 == 0:  # Update every 10 frames
+                    if self.progress_tracker and (i % 10 == 0 or i == total_frames - 1):  # Update every 10 frames
                         # Progress from 25% to 85% during rendering
                         render_progress = 25 + (60 * (i + 1) / total_frames)
                         self.progress_tracker.update(
@@ -585,6 +361,7 @@ void main() {
                             total_frames=total_frames,
                             details=f"Rendering frame {i+1} of {total_frames}"
                         )
+                        set_texture_bytes(self.texture_memory())
 
                     if i % 30 == 0:  # Log progress every second
                         logger.info(f"Rendered frame {i+1}/{total_frames}")
@@ -592,7 +369,13 @@ void main() {
                 except Exception as e:
                     logger.error(f"Error rendering frame {i}: {e}")
                     # Copy original frame if rendering fails
-                    shutil.copy2(frame_path, temp_out / f"frame_{i:05d}.png")
+                    if self.encoder is not None:
+                        original = self._load_frame(frame_path).resize(self.resolution)
+                        self.encoder.write(original.transpose(Image.FLIP_TOP_BOTTOM).tobytes())
+                    elif isinstance(frame_path, Image.Image):
+                        frame_path.resize(self.resolution).save(temp_out / f"frame_{i:05d}.png")
+                    else:
+                        shutil.copy2(frame_path, temp_out / f"frame_{i:05d}.png")
 
             logger.info(f"Rendering complete: {len(input_frames)} frames")
             return temp_out
@@ -601,6 +384,340 @@ void main() {
             logger.error(f"Error in render_frames: {e}")
             raise
 
+    def compile_programs(self, render_to_texture=False):
+        """
+        Compile the shader and its buffer passes and create the framebuffer.
+
+        setup_render() does this when it hasn't been done yet; batches and
+        chains call it for every shader first, so a single audio analysis
+        covers the features all of them read (see used_features).
+
+        Args:
+            render_to_texture: Render into self.color_texture so the result
+                               can be sampled on the GPU (e.g. by a chain's
+                               next stage)
+        """
+        # Initialize OpenGL context if not already done
+        if not hasattr(self, 'ctx'):
+            self._init_opengl_context()
+
+        logger.info(f"Loading shader: {self.shader_path}")
+        shader_code = read_shader_source(self.shader_path)
+        self.pixel_uniforms = set(self.shader_config.get('pixelUniforms', []))
+
+        # Create shader program
+        try:
+            prog = self.ctx.program(
+                vertex_shader=QUAD_VERTEX_SHADER,
+                fragment_shader=shader_code
+            )
+            logger.info("Shader compiled successfully")
+        except Exception as e:
+            logger.error(f"Shader compilation error: {e}")
+            raise
+
+        # Create vertex buffer for full-screen quad
+        vbo = self.ctx.buffer(np.array([
+            -1.0, -1.0,
+             1.0, -1.0,
+            -1.0,  1.0,
+            -1.0,  1.0,
+             1.0, -1.0,
+             1.0,  1.0,
+        ], dtype='f4'))
+
+        vao = self.ctx.simple_vertex_array(prog, vbo, 'in_vert')
+        self.buffer_passes = create_buffer_passes(self.ctx, self.shader_config, self.resolution,
+                                                  QUAD_VERTEX_SHADER, vbo)
+        if render_to_texture:
+            self.color_texture = self.ctx.texture(self.resolution, 3)
+            fbo = self.ctx.framebuffer(color_attachments=[self.color_texture])
+        else:
+            fbo = self.ctx.simple_framebuffer(self.resolution)
+
+        # The audio texture goes to iChannel1, only worth building if the shader samples it
+        needs_audio_texture = self.shader_config.get('needsAudioTexture', False) and 'iChannel1' in prog
+        self.uses_fft = needs_audio_texture and 'RayBalls5' in str(self.shader_path)
+
+        # Audio features the programs actually read; only these are analyzed
+        used_features = self.used_audio_features([prog] + [p.program for p in self.buffer_passes])
+        if needs_audio_texture and not self.uses_fft:
+            # The simple audio texture is built from the band levels
+            used_features |= {'bassLevel', 'midLevel', 'trebleLevel'}
+        if not self.shader_config.get('audioReactive', True):  # Default to True for backward compatibility
+            used_features = set()
+
+        self.prog, self.vao, self.fbo = prog, vao, fbo
+        self.needs_audio_texture = needs_audio_texture
+        self.used_features = used_features
+
+    def setup_render(self, total_frames, audio_features=None, render_to_texture=False):
+        """
+        Compile the shader (unless compile_programs() already did) and prepare
+        the audio data for render_frame().
+
+        Args:
+            total_frames: Number of frames that will be rendered
+            audio_features: Per-frame audio features already computed for
+                            these inputs (e.g. shared by a batch); analysed
+                            here when not given
+            render_to_texture: Render into self.color_texture so the result
+                               can be sampled on the GPU (e.g. by a chain's
+                               next stage)
+        """
+        if self.prog is None:
+            self.compile_programs(render_to_texture)
+        needs_audio_texture, uses_fft = self.needs_audio_texture, self.uses_fft
+        used_features = self.used_features
+
+        # Perform advanced audio analysis only if shader is audio-reactive, and only
+        # for the features its programs actually read
+        is_audio_reactive = self.shader_config.get('audioReactive', True)
+        if is_audio_reactive and audio_features is not None:
+            logger.info("Using shared audio analysis")
+        elif is_audio_reactive and used_features:
+            logger.info(f"Performing advanced audio analysis for audio-reactive shader: {sorted(used_features)}")
+            if self.progress_tracker:
+                self.progress_tracker.update(
+                    progress=20, stage="analyzing",
+                    message="Analyzing audio frequencies...",
+                    details="Extracting bass, mid, treble, and beat information"
+                )
+            with self._timed("audio_analysis"):
+                audio_features = self.get_advanced_audio_analysis(self.audio_path, total_frames,
+                                                                  used_features)
+        else:
+            reason = "non-audio-reactive shader" if not is_audio_reactive else "shader without active audio uniforms"
+            logger.info(f"Skipping audio analysis for {reason}")
+            if self.progress_tracker:
+                self.progress_tracker.update(
+                    progress=20, stage="analyzing",
+                    message="Skipping audio analysis...",
+                    details="Shader is not audio-reactive"
+                )
+            # Create minimal audio features for non-reactive shaders
+            audio_features = {name: np.zeros(total_frames) for name in AUDIO_FEATURE_NAMES}
+
+        if self.progress_tracker:
+            self.progress_tracker.update(progress=25, stage="rendering",
+                                       message="Rendering shader effects...",
+                                       details="Applying visual effects to each frame")
+
+        # Create audio texture if needed
+        audio_texture = None
+        fft_data = None
+        if uses_fft:
+            # For RayBalls5, get real FFT data
+            logger.info(f"Creating real FFT data for {self.shader_path.name}")
+            fft_data = self.get_real_fft_audio_analysis(self.audio_path, total_frames)
+        elif needs_audio_texture and audio_features:
+            audio_texture = self._create_audio_texture(audio_features, total_frames)
+
+        self.audio_features = audio_features
+        self.audio_texture = audio_texture
+        self.fft_data = fft_data
+
+    @staticmethod
+    def _load_frame(frame):
+        """An input frame as an RGB image, from an extracted file or an in-memory frame source"""
+        if isinstance(frame, Image.Image):
+            return frame
+        return Image.open(frame).convert("RGB")
+
+    def needs_frame_image(self):
+        """Whether draw_frame() needs the input frame as an image rather than just a texture"""
+        return 'VagasDome' in str(self.shader_path) or 'TVZoom' in str(self.shader_path)
+
+    def render_frame(self, i, img, frame_texture=None):
+        """
+        Render frame i and read it back; see draw_frame().
+
+        Returns:
+            Raw RGB bytes of the rendered frame, bottom row first.
+        """
+        self.draw_frame(i, img, frame_texture)
+        with self._timed("readback", i):
+            return self.fbo.read(components=3)
+
+    def texture_memory(self):
+        """Bytes of GL texture memory this processor keeps allocated between frames"""
+        textures = list(self.texture_cache.values())
+        textures += [texture for buffer_pass in getattr(self, 'buffer_passes', [])
+                     for texture in buffer_pass.textures]
+        for name in ('color_texture', 'audio_texture'):
+            if getattr(self, name, None) is not None:
+                textures.append(getattr(self, name))
+        return sum(texture_size(texture) for texture in textures)
+
+    def draw_frame(self, i, img, frame_texture=None):
+        """
+        Render frame i into self.fbo; setup_render() must have been called.
+
+        Args:
+            i: Frame index
+            img: Input video frame as an RGB PIL image; may be None when
+                 frame_texture matches the render resolution and
+                 needs_frame_image() is False
+            frame_texture: Optional texture already holding img, shared
+                           between processors rendering the same frame
+        """
+        prog, vao = self.prog, self.vao
+        if img is not None and img.size != tuple(self.resolution):
+            img = img.resize(self.resolution)
+
+        # Textures created for this frame only, released once it is drawn
+        frame_textures = []
+        upload_start = time.perf_counter()
+
+        # Special handling for shaders that use different video channels
+        if 'VagasDome' in str(self.shader_path):
+            # VagasDome: user video goes to iChannel2 (Y-flipped)
+            img_flipped = img.transpose(Image.FLIP_TOP_BOTTOM)
+            user_video_tex = self.ctx.texture(self.resolution, 3, img_flipped.tobytes())
+            frame_textures.append(user_video_tex)
+            user_video_tex.use(2)
+            texture_units = {2: user_video_tex}
+            if i == 0:
+                logger.info(f"VagasDome: User input video (Y-flipped) assigned to iChannel2 ({img.size})")
+        elif 'TVZoom' in str(self.shader_path):
+            # TVZoom: user video goes to iChannel2 (no flip)
+            user_video_tex = self.ctx.texture(self.resolution, 3, img.tobytes())
+            frame_textures.append(user_video_tex)
+            user_video_tex.use(2)
+            texture_units = {2: user_video_tex}
+            if i == 0:
+                logger.info(f"TVZoom: User input video assigned to iChannel2 ({img.size})")
+        else:
+            # For other shaders: user video goes to iChannel0 as usual (no flip)
+            if frame_texture is not None and frame_texture.size == tuple(self.resolution):
+                user_video_tex = frame_texture
+            else:
+                user_video_tex = self.ctx.texture(self.resolution, 3, img.tobytes())
+                frame_textures.append(user_video_tex)
+            user_video_tex.use(0)
+            texture_units = {0: user_video_tex}
+            if i == 0:
+                logger.info(f"Texture assignment for {self.shader_path.name}: iChannel0 = video ({user_video_tex.size})")
+        record_stage(self.profiler, "texture_upload", self.shader_path.name, upload_start, i)
+        render_start = time.perf_counter()
+
+        # Add audio texture to iChannel1 if needed
+        if self.needs_audio_texture:
+            if self.fft_data is not None:
+                # For RayBalls5 shader: FFT data goes to iChannel1
+                audio_tex = self._create_fft_texture(self.fft_data, i)
+                frame_textures.append(audio_tex)
+                audio_tex.use(1)
+                texture_units[1] = audio_tex  # iChannel1 is FFT audio data
+                if i == 0:  # Log on first frame
+                    logger.info(f"Texture assignment: iChannel1 = FFT audio data ({self.fft_data.shape[0]}x1)")
+            elif self.audio_texture:
+                # For other audio shaders: simplified audio data in iChannel1
+                audio_data = self._get_audio_frame_data(self.audio_features, i)
+                audio_tex = self._create_frame_audio_texture(audio_data)
+                frame_textures.append(audio_tex)
+                audio_tex.use(1)
+                texture_units[1] = audio_tex  # iChannel1 is audio data
+                logger.debug(f"Frame {i}: Video in iChannel0, simple audio in iChannel1")
+
+        # Load additional textures if specified in shader config (with caching)
+        if hasattr(self, 'shader_config') and 'textures' in self.shader_config:
+            for channel, filename in self.shader_config['textures'].items():
+                channel_num = int(channel.replace('iChannel', ''))
+
+                # Special handling for VagasDome ping-pong video
+                if 'VagasDome' in str(self.shader_path) and channel == 'iChannel0':
+                    # Load ping-pong video texture
+                    video_tex = self._load_pingpong_video_texture(filename, i)
+                    if video_tex:
+                        frame_textures.append(video_tex)
+                        video_tex.use(channel_num)
+                        texture_units[channel_num] = video_tex
+                        if i == 0:
+                            logger.info(f"Loaded ping-pong video texture {filename} for {channel}")
+                elif channel != 'iChannel0' or 'VagasDome' not in str(self.shader_path):
+                    # Regular texture loading for non-video channels or non-VagasDome shaders
+                    texture_path = Path("Textures") / filename
+
+                    # Check cache first
+                    cache_key = f"{channel}_{filename}"
+                    if cache_key in self.texture_cache:
+                        tex_obj = self.texture_cache[cache_key]
+                        tex_obj.use(channel_num)
+                        texture_units[channel_num] = tex_obj
+                    elif texture_path.exists():
+                        try:
+                            tex_img = Image.open(texture_path).convert("RGB")
+                            tex_obj = self.ctx.texture(tex_img.size, 3, tex_img.tobytes())
+                            tex_obj.use(channel_num)
+                            texture_units[channel_num] = tex_obj
+                            # Cache the texture for future frames
+                            self.texture_cache[cache_key] = tex_obj
+                            logger.info(f"Loaded and cached texture {filename} for {channel}")
+                        except Exception as e:
+                            logger.warning(f"Failed to load texture {filename}: {e}")
+                    else:
+                        logger.warning(f"Texture file not found: {texture_path}")
+
+        # Buffer passes render before the image pass and may feed its channels
+        if self.buffer_passes:
+            for buffer_pass in self.buffer_passes:
+                sources = {VIDEO_CHANNEL: user_video_tex,
+                           **{other.name: other.texture for other in self.buffer_passes}}
+                with self._gpu_timed(f"render_{buffer_pass.name}", i):
+                    buffer_pass.render(sources, lambda program: self._set_frame_uniforms(program, i))
+            for channel, name in self.shader_config.get('bufferChannels', {}).items():
+                buffer_pass = next(other for other in self.buffer_passes if other.name == name)
+                texture_units[int(channel.replace('iChannel', ''))] = buffer_pass.texture
+            # The buffer passes rebound the texture units
+            for channel_num, texture in texture_units.items():
+                texture.use(channel_num)
+
+        # Set texture channel uniforms
+        for channel_num in texture_units.keys():
+            channel_name = f'iChannel{channel_num}'
+            if channel_name in prog:
+                prog[channel_name].value = channel_num
+
+        self._set_frame_uniforms(prog, i)
+
+        # Render the frame
+        self.fbo.use()
+        with self._gpu_timed("render", i):
+            vao.render()
+        record_stage(self.profiler, "render", self.shader_path.name, render_start, i)
+
+        # GL keeps the textures alive until the draw that uses them is done
+        for texture in frame_textures:
+            if texture is not None:
+                texture.release()
+
+    def _set_frame_uniforms(self, prog, i):
+        """Set the standard, audio-reactive and user uniforms for frame i on prog"""
+        if 'iResolution' in prog:
+            prog['iResolution'].value = tuple(self.resolution)
+        if 'iTime' in prog:
+            prog['iTime'].value = i / self.frame_rate
+        if 'iTimeDelta' in prog:
+            prog['iTimeDelta'].value = 1.0 / self.frame_rate
+        if 'iFrame' in prog:
+            prog['iFrame'].value = i
+
+        # Set audio-reactive uniforms (automatically provide audio data)
+        for audio_name, audio_data in self.audio_features.items():
+            if audio_name in prog and i < len(audio_data):
+                prog[audio_name].value = float(audio_data[i])
+
+        # Set extra uniforms from config (these can override audio uniforms)
+        for name, val in self.extra_uniforms.items():
+            if name in prog:
+                if isinstance(val, (list, tuple)):
+                    prog[name].value = tuple(val)
+                elif name in self.pixel_uniforms:
+                    prog[name].value = float(val) * self.resolution_scale
+                else:
+                    prog[name].value = float(val)
+
     def _create_audio_texture(self, audio_features, total_frames):
         """Create a texture containing audio frequency data for shaders that need it"""
         try:
@@ -680,28 +797,22 @@ void main() {
             return self.ctx.texture((256, 1), 1, empty_data)
 
     def get_real_fft_audio_analysis(self, audio_file, total_frames):
-        """Extract real FFT frequency data for Waveform shader"""
+        """
+        Extract real FFT frequency data for Waveform shader, from the FFT rows
+        of the given audio_analysis when it has them (e.g. synthetic audio,
+        which has no file), otherwise from audio_file
+        """
         try:
-            logger.info(f"Performing FFT audio analysis for Waveform: {audio_file}")
-            y, sr = librosa.load(str(audio_file), sr=None)
-
-            # Calculate hop length to match video frame rate
-            hop_length = int(sr / self.frame_rate)
-
-            # Perform STFT to get frequency data
-            stft = librosa.stft(y, hop_length=hop_length, n_fft=512)  # 512 FFT size gives us 256 frequency bins
-            magnitude = np.abs(stft)
-
-            # Get frequency bins (we'll use first 256 bins)
-            freq_bins = min(256, magnitude.shape[0])
-            magnitude = magnitude[:freq_bins, :]
-
-            # Normalize each frequency bin across time with safety checks
-            for i in range(freq_bins):
-                if magnitude[i].max() > 0:
-                    magnitude[i] = magnitude[i] / magnitude[i].max()
-                    # Extra safety: ensure all values are in 0-1 range
-                    magnitude[i] = np.clip(magnitude[i], 0.0, 1.0)
+            fft_rows = self.audio_analysis.get('fft') if self.audio_analysis is not None else None
+            if fft_rows is not None:
+                logger.info("Using FFT rows of the given audio analysis")
+                # Only the rows covering the video, at the analysis frame rate
+                rows_needed = int(np.ceil(total_frames * self.audio_analysis['frame_rate'] / self.frame_rate))
+                magnitude = np.asarray(fft_rows, dtype=np.float64)[:rows_needed].T
+            else:
+                logger.info(f"Performing FFT audio analysis for Waveform: {audio_file}")
+                magnitude = compute_fft_rows(audio_file, self.frame_rate, duration=self._audio_duration()).T
+            freq_bins = magnitude.shape[0]
 
             # Resize to match total frames
             if magnitude.shape[1] != total_frames:
@@ -777,7 +888,7 @@ void main() {
                 logger.info(f"Extracting ping-pong video frames: {video_path}")
 
                 # Create temporary directory for video frames
-                temp_dir = Path(tempfile.mkdtemp(prefix="disco_pingpong_"))
+                temp_dir = Path(tempfile.mkdtemp(prefix="disco_pingpong_", dir=self.work_dir))
 
                 try:
                     # Extract all frames from the video
@@ -787,7 +898,7 @@ void main() {
                         str(temp_dir / "frame_%05d.png")
                     ]
 
-                    subprocess.run(cmd, capture_output=True, text=True, check=True)
+                    self._run_ffmpeg(cmd)
 
                     # Load all frames into memory
                     frame_files = sorted(temp_dir.glob("frame_*.png"))
@@ -847,8 +958,9 @@ void main() {
                 "ffmpeg", "-y",
                 "-framerate", str(self.frame_rate),
                 "-i", str(frames_folder / "frame_%05d.png"),
-                "-i", str(self.audio_path),
             ]
+            if self.audio_path is not None:
+                cmd.extend(["-i", str(self.audio_path)])
 
             # If we used oversized rendering, scale back to target resolution
             if self.needs_oversized_rendering:
@@ -859,13 +971,15 @@ void main() {
                 logger.info(f"Scaling oversized frames back to {target_w}x{target_h}")
 
             # Add encoding settings
-            cmd.extend([
-                "-c:v", "libx264", "-crf", "18", "-pix_fmt", "yuv420p",
-                "-c:a", "aac", "-shortest",
-                str(self.output_path)
-            ])
+            cmd.extend(["-c:v", "libx264", "-crf", str(self.crf), "-pix_fmt", "yuv420p"])
+            if self.encoder_preset:
+                cmd.extend(["-preset", self.encoder_preset])
+            if self.audio_path is not None:
+                cmd.extend(["-c:a", "aac", "-shortest"])
+            cmd.append(str(self.output_path))
             
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            with self._timed("mux"):
+                result = self._run_ffmpeg(cmd)
             logger.info("Video combination completed successfully")
             
         except subprocess.CalledProcessError as e:
@@ -884,9 +998,16 @@ void main() {
                                            message="Extracting video frames...",
                                            details="Breaking down video into individual frames")
 
-            # Step 1: Extract frames from input video
-            input_frames, temp_frames_dir = self.extract_frames()
-            temp_dirs.append(temp_frames_dir)
+            # Step 1: Extract frames from input video, unless another render already did
+            if self.frames is not None:
+                input_frames = self.frames[:self.max_frames]
+            elif self.frames_dir is not None:
+                input_frames = sorted(self.frames_dir.glob("frame_*.png"))[:self.max_frames]
+                if not input_frames:
+                    raise Exception(f"No frames found in {self.frames_dir}")
+            else:
+                input_frames, temp_frames_dir = self.extract_frames()
+                temp_dirs.append(temp_frames_dir)
 
             if self.progress_tracker:
                 self.progress_tracker.update(progress=25, stage="rendering",
@@ -894,17 +1015,40 @@ void main() {
                                            details="Applying visual effects to each frame",
                                            total_frames=len(input_frames))
 
-            # Step 2: Render frames with shader effects
-            rendered_frames_dir = self.render_frames(input_frames)
-            temp_dirs.append(rendered_frames_dir)
+            if self.output_mode != "frames":
+                # Step 2: Render frames straight into the encoder, the output grows as we go
+                self.encoder = FfmpegPipeEncoder(
+                    self.output_path, self.resolution, self.frame_rate, self.audio_path,
+                    mode=self.output_mode, output_size=self.base_resolution,
+                    preset=self.encoder_preset, crf=self.crf
+                ).start()
+                try:
+                    rendered_frames_dir = self.render_frames(input_frames)
+                    temp_dirs.append(rendered_frames_dir)
+                except Exception:
+                    self.encoder.abort()
+                    raise
 
-            if self.progress_tracker:
-                self.progress_tracker.update(progress=85, stage="combining",
-                                           message="Combining final video...",
-                                           details="Merging processed frames with audio")
+                if self.progress_tracker:
+                    self.progress_tracker.update(progress=95, stage="combining",
+                                               message="Finishing video...",
+                                               details="Flushing the last encoded frames")
+
+                # Step 3: Finalize the encode
+                with self._timed("mux"):
+                    self.encoder.close()
+            else:
+                # Step 2: Render frames with shader effects
+                rendered_frames_dir = self.render_frames(input_frames)
+                temp_dirs.append(rendered_frames_dir)
+
+                if self.progress_tracker:
+                    self.progress_tracker.update(progress=85, stage="combining",
+                                               message="Combining final video...",
+                                               details="Merging processed frames with audio")
 
-            # Step 3: Combine frames with audio
-            self.combine_video(rendered_frames_dir)
+                # Step 3: Combine frames with audio
+                self.combine_video(rendered_frames_dir)
 
             if self.progress_tracker:
                 self.progress_tracker.update(progress=100, stage="complete",
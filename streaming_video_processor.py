@@ -2,20 +2,23 @@
 import cv2
 import numpy as np
 from pathlib import Path
-import moderngl
 import tempfile
 import logging
 import json
 import librosa
 import ffmpeg
 from PIL import Image
+from buffer_passes import read_shader_source
+from gl_backend import create_context
+from audio_analysis import (AUDIO_FEATURE_NAMES, apply_audio_settings,
+                            resample_features, match_video_length)
 
 logger = logging.getLogger(__name__)
 
 class StreamingVideoProcessor:
     def __init__(self, video_path, audio_path, shader_path, output_path,
                  extra_uniforms={}, progress_tracker=None, audio_settings=None,
-                 max_frames=None):
+                 max_frames=None, audio_analysis=None, texture_overrides=None):
         """
         Streamlined video processor that streams video directly to shaders without frame extraction.
         
@@ -28,6 +31,8 @@ class StreamingVideoProcessor:
             progress_tracker: Optional progress tracker for real-time updates
             audio_settings: Dict with audio reactivity settings
             max_frames: Optional limit on number of frames to process (for preview mode)
+            audio_analysis: Optional stored analysis from AudioAnalysisStore.load()
+            texture_overrides: Optional dict of channel -> texture path replacing configured textures
         """
         self.video_path = Path(video_path)
         self.audio_path = Path(audio_path)
@@ -36,6 +41,7 @@ class StreamingVideoProcessor:
         self.extra_uniforms = extra_uniforms
         self.progress_tracker = progress_tracker
         self.max_frames = max_frames
+        self.audio_analysis = audio_analysis
         self.base_resolution = (1280, 720)
         self.frame_rate = 30
 
@@ -54,6 +60,10 @@ class StreamingVideoProcessor:
 
         # Load shader configuration
         self.shader_config = self._load_shader_config()
+        # Uploaded textures replace the configured ones channel by channel
+        if texture_overrides:
+            textures = {**self.shader_config.get('textures', {}), **texture_overrides}
+            self.shader_config = {**self.shader_config, 'textures': textures}
         self.texture_cache = {}
 
         # Check if shader needs oversized rendering for screen shake
@@ -128,7 +138,7 @@ class StreamingVideoProcessor:
     def _init_opengl_context(self):
         """Initialize OpenGL context"""
         try:
-            self.ctx = moderngl.create_standalone_context()
+            self.ctx = create_context()
             logger.info("Created OpenGL context successfully")
         except Exception as e:
             logger.error(f"Failed to create OpenGL context: {e}")
@@ -139,6 +149,15 @@ class StreamingVideoProcessor:
         Perform advanced audio analysis for audio-reactive shaders.
         This is the same as the original but optimized for streaming.
         """
+        if self.audio_analysis is not None:
+            # Reuse a stored analysis (see /audio/analyze) instead of re-analyzing
+            logger.info("Using precomputed audio analysis")
+            features = resample_features(self.audio_analysis['features'],
+                                         self.audio_analysis['frame_rate'], self.frame_rate)
+            features = apply_audio_settings(features, self.audio_settings)
+            return {name: match_video_length(features[name], total_frames)
+                    for name in AUDIO_FEATURE_NAMES}
+
         try:
             logger.info("Loading audio for analysis...")
             y, sr = librosa.load(str(audio_path), sr=None)
@@ -254,7 +273,7 @@ class StreamingVideoProcessor:
 
             # Load and compile shader
             logger.info(f"Loading shader: {self.shader_path}")
-            shader_code = self.shader_path.read_text()
+            shader_code = read_shader_source(self.shader_path)
 
             # Check if shader is audio-reactive
             is_audio_reactive = self.shader_config.get('audioReactive', True)
@@ -0,0 +1,257 @@
+# synthetic_inputs.py
+"""
+Deterministic synthetic video and audio for tests and benchmarks.
+
+SyntheticVideo draws frames on demand: a colour gradient drifting over
+time, a bar sweeping across, a checker block orbiting the centre and the
+frame's timecode, so any frame of an output can be identified.
+SyntheticAudio is a click track at a known tempo over band-limited tones
+(one per analysis band) that switch on and off bar by bar, so detected
+beats and band levels can be checked against ground_truth().
+
+Both are computed from their parameters alone: the same settings give the
+same pixels and samples on every machine, and nothing is decoded from or
+written to disk. Pass a SyntheticVideo as a processor's frames and
+SyntheticAudio.analysis() as its audio_analysis, with no audio_path; the
+output is then a silent video.
+"""
+
+import copy
+import logging
+
+import numpy as np
+from PIL import Image
+
+from audio_analysis import FREQUENCY_BANDS, analyze_signal, fft_rows_from_signal
+
+logger = logging.getLogger(__name__)
+
+# Tone frequency (Hz) for each band in audio_analysis.FREQUENCY_BANDS
+DEFAULT_TONES = {'bass': 80.0, 'mid': 1000.0, 'treble': 6000.0}
+
+# Per band, whether its tone plays in each bar; the patterns repeat
+TONE_PATTERNS = {
+    'bass': (1, 0),
+    'mid': (1, 1, 0),
+    'treble': (0, 1, 1, 0),
+}
+
+BEATS_PER_BAR = 4
+
+# Segments lit for each digit of the timecode: a top, b/c right, d bottom,
+# e/f left, g middle
+DIGIT_SEGMENTS = {
+    '0': 'abcdef', '1': 'bc', '2': 'abdeg', '3': 'abcdg', '4': 'bcfg',
+    '5': 'acdfg', '6': 'acdefg', '7': 'abc', '8': 'abcdefg', '9': 'abcdfg',
+}
+
+
+def timecode(frame, frame_rate):
+    """HH:MM:SS:FF of a frame index"""
+    seconds, frames = divmod(frame, frame_rate)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}:{frames:02d}"
+
+
+def _draw_text(pixels, text, x, y, height, color=(255, 255, 255)):
+    """Draw digits and colons as seven-segment glyphs; no font, so identical everywhere"""
+    width = height // 2
+    stroke = max(1, height // 8)
+    half = height // 2
+    segments = {
+        'a': (0, 0, width, stroke),
+        'b': (width - stroke, 0, width, half),
+        'c': (width - stroke, half, width, height),
+        'd': (0, height - stroke, width, height),
+        'e': (0, half, stroke, height),
+        'f': (0, 0, stroke, half),
+        'g': (0, half - stroke // 2, width, half + (stroke + 1) // 2),
+    }
+    for char in text:
+        if char == ':':
+            for dot_y in (height // 3, 2 * height // 3):
+                pixels[y + dot_y:y + dot_y + stroke, x:x + stroke] = color
+            x += 3 * stroke
+            continue
+        for segment in DIGIT_SEGMENTS[char]:
+            left, top, right, bottom = segments[segment]
+            pixels[y + top:y + bottom, x + left:x + right] = color
+        x += width + 2 * stroke
+
+
+class SyntheticVideo:
+    def __init__(self, resolution=(1280, 720), frame_rate=30, duration=10.0, frame_count=None):
+        """
+        Args:
+            resolution: (width, height) of the frames
+            frame_rate: Frames per second, for motion and the timecode
+            duration: Length in seconds
+            frame_count: Number of frames, instead of duration
+        """
+        self.resolution = tuple(resolution)
+        self.frame_rate = frame_rate
+        if frame_count is None:
+            frame_count = int(round(duration * frame_rate))
+        self.indices = range(frame_count)
+
+        width, height = self.resolution
+        self._x = np.linspace(0.0, 1.0, width, dtype=np.float32)[None, :]
+        self._y = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None]
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, key):
+        """Frame as an RGB PIL image, or a shorter SyntheticVideo for a slice"""
+        if isinstance(key, slice):
+            clip = copy.copy(self)
+            clip.indices = self.indices[key]
+            return clip
+        return Image.fromarray(self.frame_array(self.indices[key]))
+
+    def frame_array(self, frame):
+        """Frame as a height x width x 3 uint8 array"""
+        width, height = self.resolution
+        t = frame / self.frame_rate
+        x, y = self._x, self._y
+
+        # Gradient background drifting sideways over time
+        red = 0.5 + 0.5 * np.sin(2 * np.pi * (x + 0.1 * t))
+        green = np.broadcast_to(y, (height, width))
+        blue = 0.5 + 0.5 * np.cos(2 * np.pi * (x * y + 0.05 * t))
+        pixels = (np.stack([np.broadcast_to(red, (height, width)), green,
+                            np.broadcast_to(blue, (height, width))], axis=-1) * 255).astype(np.uint8)
+
+        # Bar sweeping left to right every four seconds
+        bar_x = int(((t / 4.0) % 1.0) * width)
+        pixels[:, bar_x:bar_x + max(2, width // 50)] = 255
+
+        # Checker block orbiting the centre every eight seconds
+        size = max(8, height // 6)
+        cell = max(2, size // 8)
+        center_x = int(width * (0.5 + 0.3 * np.cos(2 * np.pi * t / 8.0)))
+        center_y = int(height * (0.5 + 0.3 * np.sin(2 * np.pi * t / 8.0)))
+        top, left = max(0, center_y - size // 2), max(0, center_x - size // 2)
+        block_y, block_x = np.mgrid[top:min(height, top + size), left:min(width, left + size)]
+        checker = ((block_y - top) // cell + (block_x - left) // cell) % 2
+        pixels[top:top + checker.shape[0], left:left + checker.shape[1]] = (checker * 255)[..., None]
+
+        # Timecode on a black box in the top left corner
+        text_height = max(10, height // 14)
+        margin = text_height // 3
+        pixels[:text_height + 2 * margin, :text_height * 7 + 2 * margin] = 0
+        _draw_text(pixels, timecode(frame, self.frame_rate), margin, margin, text_height)
+        return pixels
+
+
+class SyntheticAudio:
+    def __init__(self, duration=10.0, sample_rate=22050, bpm=120.0, tones=None, seed=0):
+        """
+        Args:
+            duration: Length in seconds
+            sample_rate: Samples per second
+            bpm: Tempo of the click track, four beats to the bar
+            tones: Dict of band name -> tone frequency in Hz (default DEFAULT_TONES)
+            seed: Seed of the click noise
+        """
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.bpm = bpm
+        self.tones = dict(tones or DEFAULT_TONES)
+        self.seed = seed
+
+        for band, frequency in self.tones.items():
+            low, high = FREQUENCY_BANDS[band]
+            if not low <= frequency <= (high or sample_rate / 2):
+                raise ValueError(f"{band} tone of {frequency} Hz is outside the {band} band")
+
+    @property
+    def beat_seconds(self):
+        return 60.0 / self.bpm
+
+    def beat_times(self):
+        """Start of every click, in seconds"""
+        return np.arange(0.0, self.duration, self.beat_seconds)
+
+    def band_active(self, band, times):
+        """Whether the tone of a band plays at each of times (seconds)"""
+        pattern = np.array(TONE_PATTERNS[band], dtype=bool)
+        bars = (np.asarray(times) // (self.beat_seconds * BEATS_PER_BAR)).astype(int)
+        return pattern[bars % len(pattern)]
+
+    def samples(self):
+        """Mono float32 samples in -1..1"""
+        t = np.arange(int(self.duration * self.sample_rate)) / self.sample_rate
+        signal = np.zeros_like(t)
+
+        # Tones fade in and out over 20 ms so switching them isn't a click of its own
+        fade = int(0.02 * self.sample_rate)
+        for band, frequency in self.tones.items():
+            gate = self.band_active(band, t).astype(np.float64)
+            gate = np.convolve(gate, np.ones(fade) / fade, mode='same')
+            signal += 0.2 * gate * np.sin(2 * np.pi * frequency * t)
+
+        # Clicks: 15 ms decaying noise bursts, accented on the first beat of each bar
+        rng = np.random.default_rng(self.seed)
+        click_length = int(0.015 * self.sample_rate)
+        envelope = np.exp(-np.arange(click_length) / (0.002 * self.sample_rate))
+        for beat, start in enumerate(self.beat_times()):
+            first = int(start * self.sample_rate)
+            burst = rng.uniform(-1.0, 1.0, click_length) * envelope
+            burst *= 0.8 if beat % BEATS_PER_BAR == 0 else 0.5
+            end = min(len(signal), first + click_length)
+            signal[first:end] += burst[:end - first]
+
+        return (0.9 * signal / np.abs(signal).max()).astype(np.float32)
+
+    def analysis(self, frame_rate=30):
+        """
+        Audio features in the form processors accept as audio_analysis, with
+        the per-frame FFT rows that FFT shaders would otherwise read from the
+        audio file.
+        """
+        samples = self.samples()
+        features, summary = analyze_signal(samples, self.sample_rate, frame_rate)
+        return {'frame_rate': frame_rate, 'features': features, 'summary': summary,
+                'fft': fft_rows_from_signal(samples, self.sample_rate, frame_rate)}
+
+    def ground_truth(self, frame_rate=30):
+        """
+        What analysis should find, per video frame.
+
+        Returns:
+            Dict with tempo, beat_frames (frame index of every click) and
+            bands (band name -> bool array, whether its tone plays).
+        """
+        frame_times = np.arange(int(self.duration * frame_rate)) / frame_rate
+        return {
+            'tempo': self.bpm,
+            'beat_frames': np.round(self.beat_times() * frame_rate).astype(int),
+            'bands': {band: self.band_active(band, frame_times) for band in self.tones},
+        }
+
+
+def feature_accuracy(features, truth, tolerance=2):
+    """
+    Compare analysed features with SyntheticAudio.ground_truth().
+
+    Returns:
+        Dict with beat_recall (share of clicks with a beatLevel pulse within
+        tolerance frames) and, per band, the correlation of its level with
+        whether its tone plays.
+    """
+    beat_level = np.asarray(features['beatLevel'])
+    found = [beat_level[max(0, frame - tolerance):frame + tolerance + 1].max(initial=0.0) > 0.5
+             for frame in truth['beat_frames'] if frame < len(beat_level)]
+
+    bands = {}
+    for band, active in truth['bands'].items():
+        level = np.asarray(features[f'{band}Level'])
+        length = min(len(level), len(active))
+        if length < 2 or level[:length].std() == 0 or active[:length].std() == 0:
+            bands[band] = 0.0
+        else:
+            bands[band] = round(float(np.corrcoef(level[:length], active[:length])[0, 1]), 3)
+
+    return {'beat_recall': round(float(np.mean(found)), 3) if found else 0.0, 'bands': bands}
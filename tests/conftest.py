@@ -0,0 +1,7 @@
+# tests/conftest.py
+"""The modules under test live in the repository root, next to main.py"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,78 @@
+# tests/test_synthetic_inputs.py
+"""
+Audio analysis checked against the known content of SyntheticAudio: the
+clicks it should find as beats, the band levels that should follow the
+tones, and the FFT rows FFT shaders render from when there is no audio file.
+"""
+
+import numpy as np
+import pytest
+
+from shader_video_processor import ShaderVideoProcessor
+from synthetic_inputs import DEFAULT_TONES, SyntheticAudio, feature_accuracy
+
+FRAME_RATE = 30
+
+# Share of clicks that must be detected, and minimum correlation of each
+# band's level with its tone; the analysis currently reaches about 0.94
+# and 0.98
+MIN_BEAT_RECALL = 0.9
+MIN_BAND_ACCURACY = 0.95
+
+# Minimum correlation of the FFT bin of each tone with whether it plays
+MIN_FFT_BIN_ACCURACY = 0.9
+
+
+def tone_bin(audio, band, bins=256):
+    """FFT row index of a band's tone, as audio_analysis.fft_rows_from_signal() bins it"""
+    return int(round(audio.tones[band] * bins * 2 / audio.sample_rate))
+
+
+def band_correlation(values, active):
+    length = min(len(values), len(active))
+    return float(np.corrcoef(values[:length], active[:length])[0, 1])
+
+
+@pytest.fixture(scope="module")
+def audio():
+    return SyntheticAudio(duration=10.0, bpm=120.0)
+
+
+@pytest.fixture(scope="module")
+def analysis(audio):
+    return audio.analysis(FRAME_RATE)
+
+
+def test_beat_recall(audio, analysis):
+    accuracy = feature_accuracy(analysis['features'], audio.ground_truth(FRAME_RATE))
+    assert accuracy['beat_recall'] >= MIN_BEAT_RECALL
+
+
+@pytest.mark.parametrize("band", sorted(DEFAULT_TONES))
+def test_band_accuracy(audio, analysis, band):
+    accuracy = feature_accuracy(analysis['features'], audio.ground_truth(FRAME_RATE))
+    assert accuracy['bands'][band] >= MIN_BAND_ACCURACY
+
+
+def test_fft_rows_cover_every_frame(audio, analysis):
+    fft_rows = analysis['fft']
+    assert fft_rows.shape == (len(analysis['features']['bassLevel']), 256)
+    assert 0.0 <= fft_rows.min() and fft_rows.max() <= 1.0
+
+
+@pytest.mark.parametrize("band", sorted(DEFAULT_TONES))
+def test_fft_rows_follow_tones(audio, analysis, band):
+    active = audio.ground_truth(FRAME_RATE)['bands'][band]
+    assert band_correlation(analysis['fft'][:, tone_bin(audio, band)], active) >= MIN_FFT_BIN_ACCURACY
+
+
+def test_processor_fft_without_audio_file(audio, analysis):
+    """FFT shaders rendering synthetic inputs get the analysis' FFT, not zeros from a missing file"""
+    processor = ShaderVideoProcessor(video_path=None, audio_path=None, shader_path="Shaders/RayBalls5.glsl",
+                                     output_path="unused.mp4", audio_analysis=analysis,
+                                     frame_rate=FRAME_RATE, max_frames=90)
+    fft_data = processor.get_real_fft_audio_analysis(processor.audio_path, 90)
+
+    assert fft_data.shape == (256, 90)
+    active = audio.ground_truth(FRAME_RATE)['bands']['bass'][:90]
+    assert band_correlation(fft_data[tone_bin(audio, 'bass')], active) >= MIN_FFT_BIN_ACCURACY
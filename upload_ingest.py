@@ -0,0 +1,254 @@
+# upload_ingest.py
+"""
+Streaming multipart upload ingestion.
+
+Parses the request body as it arrives and writes file parts straight to
+their destination directory in chunks with async file I/O, hashing the
+content on the way. Media files are probed with ffprobe in the background
+as soon as enough of the file has landed, so probing overlaps with the
+rest of the upload instead of following it.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from pathlib import Path
+
+import aiofiles
+from starlette.requests import ClientDisconnect
+
+try:
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from metrics import ffmpeg_process
+
+logger = logging.getLogger(__name__)
+
+# Probe once this much of a media file is on disk; most containers keep
+# stream headers at the front
+PROBE_HEAD_BYTES = 4 * 1024 * 1024
+MAX_FIELD_BYTES = 1024 * 1024
+MEDIA_FIELDS = ('video', 'audio')
+
+
+class UploadError(Exception):
+    """Raised for malformed uploads"""
+
+
+class IngestedFile:
+    """A file part that has been written to disk"""
+    def __init__(self, field_name, filename, path):
+        self.field_name = field_name
+        self.filename = filename
+        self.path = Path(path)
+        self.size = 0
+        self.sha256 = None
+        self.probe_task = None
+
+    async def get_probe(self):
+        """Media info from ffprobe (duration, fps, width, height), or None"""
+        if self.probe_task is None:
+            return None
+        return await self.probe_task
+
+
+async def probe_media(path):
+    """Run ffprobe without blocking the event loop"""
+    try:
+        with ffmpeg_process("ffprobe"):
+            proc = await asyncio.create_subprocess_exec(
+                "ffprobe", "-v", "error", "-print_format", "json",
+                "-show_format", "-show_streams", str(path),
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, _ = await proc.communicate()
+            except asyncio.CancelledError:
+                # The upload was aborted; don't leave ffprobe running
+                proc.kill()
+                await proc.wait()
+                raise
+        if proc.returncode != 0:
+            return None
+        info = json.loads(stdout)
+    except (OSError, ValueError) as e:
+        logger.warning(f"ffprobe failed for {path}: {e}")
+        return None
+
+    result = {"duration": float(info.get("format", {}).get("duration", 0) or 0)}
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == "video" and "width" not in result:
+            num, _, den = stream.get("avg_frame_rate", "0/1").partition("/")
+            result["fps"] = float(num) / float(den) if float(den or 0) else 0.0
+            result["width"] = stream.get("width")
+            result["height"] = stream.get("height")
+        elif stream.get("codec_type") == "audio" and "sample_rate" not in result:
+            result["sample_rate"] = int(stream.get("sample_rate", 0))
+    return result
+
+
+class _PartState:
+    def __init__(self):
+        self.headers = {}
+        self.header_name = b""
+        self.header_value = b""
+        self.field_name = None
+        self.file = None
+        self.handle = None
+        self.hasher = None
+        self.data = bytearray()
+
+
+async def ingest_multipart(request, dest_dir):
+    """
+    Stream a multipart/form-data request to disk.
+
+    File parts are written to dest_dir as "<field name><extension>" (with the
+    field name sanitized), so client-supplied filenames never become paths.
+
+    Returns:
+        (fields, files): dict of form field -> str, and dict of form
+        field -> IngestedFile.
+    """
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("Expected a multipart/form-data request")
+
+    fields, files = {}, {}
+    events = []
+    state = {"part": None, "complete": False}
+
+    # Parser callbacks run synchronously inside parser.write(); they only
+    # record events, which are then handled with async I/O below
+    def on_part_begin():
+        state["part"] = _PartState()
+
+    def on_header_field(data, start, end):
+        state["part"].header_name += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["part"].header_value += data[start:end]
+
+    def on_header_end():
+        part = state["part"]
+        part.headers[part.header_name.lower()] = part.header_value
+        part.header_name, part.header_value = b"", b""
+
+    def on_headers_finished():
+        events.append(("headers", state["part"], None))
+
+    def on_part_data(data, start, end):
+        events.append(("data", state["part"], bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", state["part"], None))
+
+    def on_end():
+        state["complete"] = True
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_end": on_end,
+    })
+
+    async def handle(kind, part, data):
+        if kind == "headers":
+            _, options = parse_options_header(part.headers.get(b"content-disposition", b""))
+            if b"name" not in options:
+                raise UploadError('The Content-Disposition header field "name" must be provided')
+            part.field_name = options[b"name"].decode("utf-8", "replace")
+            if b"filename" in options:
+                filename = options[b"filename"].decode("utf-8", "replace")
+                safe_name = re.sub(r'[^A-Za-z0-9_-]', '_', part.field_name)
+                path = dest_dir / f"{safe_name}{Path(filename).suffix.lower()}"
+                part.file = IngestedFile(part.field_name, filename, path)
+                part.handle = await aiofiles.open(path, "wb")
+                part.hasher = hashlib.sha256()
+                files[part.field_name] = part.file
+
+        elif kind == "data":
+            if part.file is None:
+                part.data.extend(data)
+                if len(part.data) > MAX_FIELD_BYTES:
+                    raise UploadError(f"Form field {part.field_name} is too large")
+                return
+            await part.handle.write(data)
+            part.hasher.update(data)
+            part.file.size += len(data)
+
+            # Start probing media as soon as its headers are on disk
+            if (part.field_name in MEDIA_FIELDS and part.file.probe_task is None
+                    and part.file.size >= PROBE_HEAD_BYTES):
+                await part.handle.flush()
+                part.file.probe_task = asyncio.create_task(probe_media(part.file.path))
+
+        elif kind == "end":
+            if part.file is None:
+                fields[part.field_name] = part.data.decode("utf-8", "replace")
+                return
+            await part.handle.close()
+            part.handle = None
+            part.file.sha256 = part.hasher.hexdigest()
+            if part.field_name in MEDIA_FIELDS:
+                early_probe = part.file.probe_task
+                part.file.probe_task = asyncio.create_task(_finish_probe(part.file.path, early_probe))
+            logger.info(f"Received {part.field_name}: {part.file.filename} "
+                        f"({part.file.size / (1024 * 1024):.1f} MB, sha256 {part.file.sha256[:12]})")
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for event in events:
+                await handle(*event)
+            events.clear()
+
+        parser.finalize()
+        for event in events:
+            await handle(*event)
+        # The parser doesn't check this itself
+        if not state["complete"]:
+            raise UploadError("The multipart body ended before its closing boundary")
+    except FormParserError as e:
+        await _abort(state["part"], files)
+        raise UploadError(f"Malformed multipart body: {e}") from e
+    except ClientDisconnect as e:
+        await _abort(state["part"], files)
+        raise UploadError("The client disconnected during the upload") from e
+    except Exception:
+        await _abort(state["part"], files)
+        raise
+
+    return fields, files
+
+
+async def _abort(part, files):
+    """Close the file being written and stop the probes of an upload that failed"""
+    if part is not None and part.handle is not None:
+        await part.handle.close()
+    for upload in files.values():
+        if upload.probe_task is not None:
+            upload.probe_task.cancel()
+
+
+async def _finish_probe(path, early_probe):
+    """Use the early probe if it found the streams, otherwise probe the whole file"""
+    if early_probe is not None:
+        result = await early_probe
+        if result and result.get("duration"):
+            return result
+    return await probe_media(path)
@@ -0,0 +1,153 @@
+# video_encoder.py
+"""
+FFmpeg encoder fed with raw frames straight from the render loop.
+
+Instead of writing every rendered frame as a PNG and encoding at the end,
+frames are piped to a running ffmpeg process, so the output grows while
+rendering proceeds:
+
+- mp4:  a regular MP4, finalized when the encoder closes
+- fmp4: a fragmented MP4 with one fragment per second, playable while it
+        is still being written
+- hls:  an HLS event playlist of short segments next to a regular MP4 for
+        download, both from a single encode
+"""
+
+import logging
+import subprocess
+import tempfile
+from pathlib import Path
+
+from metrics import FFMPEG_PROCESSES, FFMPEG_RUNNING
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_MODES = ('mp4', 'fmp4', 'hls')
+HLS_PLAYLIST = "index.m3u8"
+
+
+class FfmpegPipeEncoder:
+    def __init__(self, output_path, frame_size, frame_rate, audio_path,
+                 mode='fmp4', output_size=None, hls_dir=None, segment_seconds=2,
+                 preset=None, crf=18):
+        """
+        Args:
+            output_path: MP4 file to write
+            frame_size: (width, height) of the frames passed to write()
+            frame_rate: Frames per second
+            audio_path: Audio track to mux in, or None for a silent video
+            mode: One of OUTPUT_MODES
+            output_size: Optional (width, height) to scale frames to
+            hls_dir: Directory for the playlist and segments in hls mode
+            segment_seconds: Target HLS segment length
+            preset: Optional x264 preset
+            crf: x264 quality (lower is better)
+        """
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode: {mode}")
+
+        self.output_path = Path(output_path)
+        self.frame_size = frame_size
+        self.frame_rate = frame_rate
+        self.audio_path = Path(audio_path) if audio_path is not None else None
+        self.mode = mode
+        self.output_size = output_size
+        self.hls_dir = Path(hls_dir) if hls_dir else self.output_path.parent / "hls"
+        self.segment_seconds = segment_seconds
+        self.preset = preset
+        self.crf = crf
+        self.process = None
+        self.stderr = None
+        self.frames_written = 0
+
+    def _build_command(self):
+        width, height = self.frame_size
+        # Frames come straight from glReadPixels, bottom row first
+        filters = ["vflip"]
+        if self.output_size and tuple(self.output_size) != tuple(self.frame_size):
+            filters.append(f"scale={self.output_size[0]}:{self.output_size[1]}:flags=lanczos")
+
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+            "-r", str(self.frame_rate), "-i", "pipe:0",
+        ]
+        if self.audio_path is not None:
+            cmd.extend(["-i", str(self.audio_path), "-map", "0:v", "-map", "1:a"])
+        cmd.extend([
+            "-vf", ",".join(filters),
+            "-c:v", "libx264", "-crf", str(self.crf), "-pix_fmt", "yuv420p",
+            # A keyframe every second so fragments and segments can be cut often
+            "-g", str(self.frame_rate),
+        ])
+        if self.audio_path is not None:
+            cmd.extend(["-c:a", "aac", "-shortest"])
+        if self.preset:
+            cmd.extend(["-preset", self.preset])
+
+        if self.mode == 'mp4':
+            cmd.append(str(self.output_path))
+        elif self.mode == 'fmp4':
+            cmd.extend(["-movflags", "frag_keyframe+empty_moov+default_base_moof",
+                        "-f", "mp4", str(self.output_path)])
+        else:
+            self.hls_dir.mkdir(parents=True, exist_ok=True)
+            hls_output = (f"[f=hls:hls_time={self.segment_seconds}:hls_playlist_type=event:"
+                          f"hls_segment_filename={self.hls_dir / 'segment_%05d.ts'}]"
+                          f"{self.hls_dir / HLS_PLAYLIST}")
+            cmd.extend(["-f", "tee", f"{hls_output}|[f=mp4:movflags=+faststart]{self.output_path}"])
+        return cmd
+
+    def start(self):
+        cmd = self._build_command()
+        logger.info(f"Starting {self.mode} encoder: {self.output_path}")
+        # stderr goes to a file so a chatty ffmpeg can never block on a full pipe
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self.stderr)
+        FFMPEG_PROCESSES.inc(kind="encoder")
+        FFMPEG_RUNNING.inc(kind="encoder")
+        return self
+
+    def write(self, frame):
+        """Write one frame of raw RGB bytes (frame_size, bottom row first)"""
+        try:
+            self.process.stdin.write(frame)
+        except BrokenPipeError:
+            raise Exception(f"Encoder exited early: {self._read_stderr()}")
+        self.frames_written += 1
+
+    def end_input(self):
+        """Signal the last frame without waiting, so several encoders can finish in parallel"""
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    def close(self):
+        """Finish encoding and wait for ffmpeg to exit"""
+        if self.process is None:
+            return
+        self.end_input()
+        returncode = self.process.wait()
+        FFMPEG_RUNNING.dec(kind="encoder")
+        error = self._read_stderr()
+        self.stderr.close()
+        self.process = None
+
+        if returncode != 0:
+            logger.error(f"FFmpeg encode error: {error}")
+            raise Exception(f"Failed to encode video: {error}")
+        logger.info(f"Encoded {self.frames_written} frames to {self.output_path}")
+
+    def abort(self):
+        """Stop ffmpeg without finalizing the output"""
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            FFMPEG_RUNNING.dec(kind="encoder")
+            self.stderr.close()
+            self.process = None
+
+    def _read_stderr(self):
+        self.stderr.seek(0)
+        return self.stderr.read().decode("utf-8", "replace").strip()
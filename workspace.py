@@ -0,0 +1,161 @@
+# workspace.py
+"""
+Per-job workspace directories and their garbage collection.
+
+Each job gets its own directory for uploads in flight, intermediate frames
+and the rendered output, so concurrent jobs never share paths. Workspaces
+of finished jobs are kept for a TTL so results can be downloaded, and the
+collector evicts the oldest finished ones early when the disk budget is
+exceeded.
+"""
+
+import logging
+import shutil
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+FINISHED_MARKER = ".finished"
+
+
+def directory_size(path):
+    """Total size in bytes of the files under path"""
+    total = 0
+    for file_path in Path(path).rglob("*"):
+        try:
+            if file_path.is_file():
+                total += file_path.stat().st_size
+        except OSError:
+            pass  # Removed while we were walking
+    return total
+
+
+class WorkspaceManager:
+    def __init__(self, root, ttl_seconds=24 * 3600, disk_budget_bytes=20 * 1024 ** 3):
+        """
+        Args:
+            root: Directory holding one workspace per job
+            ttl_seconds: How long finished workspaces are kept
+            disk_budget_bytes: Total size workspaces (and unreferenced blobs,
+                               when a blob store is given to collect) may use
+        """
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self.disk_budget_bytes = disk_budget_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, job_id):
+        return self.root / job_id
+
+    def create(self, job_id):
+        workspace = self.path(job_id)
+        workspace.mkdir(parents=True, exist_ok=True)
+        return workspace
+
+    def remove(self, job_id):
+        shutil.rmtree(self.path(job_id), ignore_errors=True)
+
+    def mark_finished(self, job_id):
+        """Start the job's TTL; finished workspaces become eligible for eviction"""
+        workspace = self.path(job_id)
+        if workspace.exists():
+            (workspace / FINISHED_MARKER).touch()
+
+    def usage(self, job_id):
+        """Disk usage of one workspace, or None if it doesn't exist"""
+        workspace = self.path(job_id)
+        if not workspace.exists():
+            return None
+        marker = workspace / FINISHED_MARKER
+        return {
+            "bytes": directory_size(workspace),
+            "files": sum(1 for p in workspace.rglob("*") if p.is_file() and p.name != FINISHED_MARKER),
+            "finished": marker.exists(),
+        }
+
+    def _workspaces(self):
+        """(job_id, finished_at or None, last modified, size) for every workspace"""
+        entries = []
+        for workspace in self.root.iterdir():
+            if not workspace.is_dir():
+                continue
+            marker = workspace / FINISHED_MARKER
+            try:
+                finished_at = marker.stat().st_mtime if marker.exists() else None
+                modified_at = workspace.stat().st_mtime
+            except OSError:
+                continue
+            entries.append((workspace.name, finished_at, modified_at, directory_size(workspace)))
+        return entries
+
+    def collect(self, active_job_ids=(), blob_store=None, audio_store=None):
+        """
+        Enforce TTLs and the disk budget.
+
+        Finished workspaces past the TTL are removed, as are workspaces of
+        jobs that are no longer known (left behind by a crash or restart).
+        If usage is still over budget, the oldest finished workspaces go
+        first, then the least recently used unreferenced blobs, then the
+        least recently used audio analyses no job holds.
+
+        Returns:
+            Dict with the number of workspaces removed and bytes freed.
+        """
+        now = time.time()
+        removed, freed = 0, 0
+        finished = []
+        total = 0
+
+        for job_id, finished_at, modified_at, size in self._workspaces():
+            expired = (finished_at is not None and now - finished_at > self.ttl_seconds) or \
+                      (finished_at is None and job_id not in active_job_ids and
+                       now - modified_at > self.ttl_seconds)
+            if expired:
+                self.remove(job_id)
+                removed += 1
+                freed += size
+            else:
+                total += size
+                if finished_at is not None:
+                    finished.append((finished_at, job_id, size))
+
+        if blob_store is not None:
+            total += blob_store.stats()["total_bytes"]
+        if audio_store is not None:
+            total += audio_store.stats()["total_bytes"]
+
+        if total > self.disk_budget_bytes:
+            logger.warning(f"Disk usage {total / 1024 ** 2:.0f} MB is over budget "
+                           f"({self.disk_budget_bytes / 1024 ** 2:.0f} MB), evicting finished outputs")
+            for finished_at, job_id, size in sorted(finished):
+                if total <= self.disk_budget_bytes:
+                    break
+                self.remove(job_id)
+                removed += 1
+                freed += size
+                total -= size
+
+            if total > self.disk_budget_bytes and blob_store is not None:
+                blob_freed = blob_store.evict_unreferenced(total - self.disk_budget_bytes)
+                freed += blob_freed
+                total -= blob_freed
+
+            if total > self.disk_budget_bytes and audio_store is not None:
+                audio_freed = audio_store.evict_unreferenced(total - self.disk_budget_bytes)
+                freed += audio_freed
+                total -= audio_freed
+
+        if removed:
+            logger.info(f"Removed {removed} job workspaces, freed {freed / 1024 ** 2:.1f} MB")
+        return {"workspaces_removed": removed, "bytes_freed": freed, "bytes_used": total}
+
+    def stats(self):
+        entries = self._workspaces()
+        return {
+            "workspaces": len(entries),
+            "finished": sum(1 for entry in entries if entry[1] is not None),
+            "total_bytes": sum(entry[3] for entry in entries),
+            "disk_budget_bytes": self.disk_budget_bytes,
+            "ttl_seconds": self.ttl_seconds,
+        }